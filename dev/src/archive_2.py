@@ -183,8 +183,12 @@ class ArchiveDaemon(Daemon):
 		# data_stage_database = udp.udp_stage_database
 		# data_catalog_schema = udp.udp_catalog_schema
 
-		db = database.MSSQL(self.config(self.project.database))
+		# stat log updates re-use pooled connections across archived files
+		connection_pool = database.connection_pool(self.config(self.project.database))
+		with connection_pool.connection() as db:
+			self.insert_stat_log(db, source_file_name)
 
+	def insert_stat_log(self, db, source_file_name):
 		conn = db.conn
 		# cursor = conn.cursor()
 
@@ -216,7 +220,7 @@ class ArchiveDaemon(Daemon):
 			for row in last_job_log_json:
 				row['start_time'] = iso_to_datetime(row['start_time']).datetime
 				row['end_time'] = iso_to_datetime(row['end_time']).datetime
-				if row['stat_name'] in ('capture', 'compress', 'upload'):
+				if row['stat_name'] in ('capture', 'compress', 'package', 'upload'):
 					db_conn.insert_into_table('udp_catalog', 'stat_log', **row)
 
 
@@ -0,0 +1,352 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+batch_writer.py
+
+Streams captured rows to numbered <table>#NNNN.json batch files.
+
+Batch files are written to a folder or, when a CapturePackage is provided, streamed directly into
+the capture package as compressed members.
+
+Rows are serialized one at a time as they come off a cursor; no batch sized lists of rows are built.
+Each batch file is a compact json array with one row per line, so stage's json.load() contract is unchanged.
+
+When a hash method is specified, a running digest of each batch's bytes is maintained as rows are written
+so a table's file_hash (same scheme as common.hash_files) is known without re-reading its batch files.
+
+Adaptive batch sizing: When batch_bytes is specified, batch_size is re-sized after the first sample_rows rows
+so batches stay within a byte budget. When memory_limit is specified, writers check process memory (RSS) every
+sample_rows rows and close batches early (and reduce batch_size) while memory is over the limit. Closing a batch
+frees a columnar batch's buffered values and a spooled package member's in-memory buffer.
+
+Large object sidecars: Values of large object (LOB) columns, eg. text, jsonb, nvarchar(max), can be streamed to a
+<table>#NNNN.lob sidecar file per batch. Each value is UTF8 encoded (jsonb as json text) and replaced in its row
+by an [offset, length] reference into the batch's sidecar so batch files of ordinary columns stay small.
+
+Copy batches: CopyBatchWriter streams a PostgreSQL copy (<select>) to stdout text format result into
+<table>#NNNN.tsv batch files as received, without building Python rows.
+
+Concurrent writers for the same table (eg. partitioned extraction) share a batch_numbers counter
+(itertools.count) so their batch files are numbered as a single <table>#NNNN sequence.
+
+Usage:
+batch_writer = BatchWriter(work_folder_name, table_name, batch_size, package=None, hash_method_name=None)
+for row in cursor:
+	batch_writer.write(row)
+batch_writer.close()
+"""
+
+
+# standard lib
+import hashlib
+import json
+import logging
+
+
+# common lib
+from common import hash_str
+from common import json_serializer
+from common import process_memory_used
+
+
+# module level logger
+logger = logging.getLogger(__name__)
+
+
+# data types streamed to sidecar files; varchar(max), nvarchar(max) have a character_maximum_length of -1
+lob_data_types = {'text', 'ntext', 'jsonb', 'json', 'xml'}
+
+
+def lob_columns(table_schema):
+	"""Return indexes of a table schema's large object (text) columns."""
+	column_indexes = list()
+	for column_index, column in enumerate(table_schema.columns.values()):
+		if column.data_type.lower() in lob_data_types or column.character_maximum_length == -1:
+			column_indexes.append(column_index)
+	return column_indexes
+
+
+class BatchWriter:
+
+	"""Writes rows to <folder>/<table>#NNNN.json batch files, starting a new batch file every batch_size rows."""
+
+	file_ext = 'json'
+
+	# copy writers are written via write_copy() vs rows via write()
+	is_copy = False
+
+	# rows sampled before adaptive re-sizing and between memory checks
+	sample_rows = 1_000
+
+	def __init__(self, folder_name, table_name, batch_size, package=None, hash_method_name=None, batch_numbers=None,
+	             batch_bytes=0, memory_limit=0, lob_columns=None):
+		self.folder_name = folder_name
+		self.table_name = table_name
+		self.batch_size = batch_size
+		self.package = package
+		self.hash_method_name = hash_method_name
+		self.batch_numbers = batch_numbers
+
+		# adaptive batch sizing
+		self.batch_bytes = batch_bytes
+		self.memory_limit = memory_limit
+		self.is_batch_size_sampled = not batch_bytes
+
+		# column indexes of values streamed to batch sidecar files
+		self.lob_columns = lob_columns or list()
+
+		# compact encoder; rows are lists of column values so no key sorting or indentation required
+		self.encoder = json.JSONEncoder(separators=(',', ':'), default=json_serializer)
+
+		# current batch
+		self.batch_number = 0
+		self.batch_row_count = 0
+		self.batch_file_size = 0
+		self.batch_hash = None
+		self.output_stream = None
+		self.lob_stream = None
+		self.lob_offset = 0
+
+		# totals across all batches
+		self.file_names = list()
+		self.row_count = 0
+		self.file_size = 0
+		self.batch_hashes = list()
+		self.batch_sizes = list()
+		self.lob_file_names = list()
+
+	@property
+	def file_hash(self):
+		"""Return hash of all batch files or None if not hashing."""
+		if not self.hash_method_name:
+			return None
+		return hash_str(''.join(self.batch_hashes), self.hash_method_name)
+
+	def batch_file_name(self, batch_number, file_ext=None):
+		"""Return name of batch file (or package member) for batch_number."""
+		file_ext = file_ext or self.file_ext
+		if self.package:
+			return f'{self.table_name}#{batch_number:04}.{file_ext}'
+		else:
+			return f'{self.folder_name}/{self.table_name}#{batch_number:04}.{file_ext}'
+
+	def next_batch_number(self):
+		"""Return next batch number; from shared batch_numbers counter when writers share a table's batch sequence."""
+		if self.batch_numbers:
+			return next(self.batch_numbers)
+		else:
+			return self.batch_number + 1
+
+	def sample_row_size(self):
+		"""Return average bytes per row written to current batch."""
+		return self.batch_file_size / max(self.batch_row_count, 1)
+
+	def adapt_batch_size(self):
+		"""Re-size batches to batch_bytes budget and close current batch early when over memory_limit."""
+		if not self.is_batch_size_sampled:
+			self.is_batch_size_sampled = True
+			row_size = self.sample_row_size()
+			batch_size = max(self.sample_rows, int(self.batch_bytes / max(row_size, 1)))
+			if batch_size < self.batch_size:
+				self.batch_size = batch_size
+			logger.info(f'Table({self.table_name}): {row_size:,.0f} bytes/row; using batch size {self.batch_size:,}')
+
+		if self.memory_limit:
+			memory_used = process_memory_used()
+			if memory_used > self.memory_limit:
+				self.batch_size = max(self.sample_rows, self.batch_row_count // 2)
+				logger.info(
+					f'Table({self.table_name}): memory used {memory_used:,} > {self.memory_limit:,}; '
+					f'closing batch at {self.batch_row_count:,} rows, reducing batch size to {self.batch_size:,}'
+				)
+				self.close_batch()
+
+	def open_stream(self, file_name):
+		"""Return binary output stream for a batch file or package member."""
+		if self.package:
+			return self.package.open_member(file_name, 'wb')
+		else:
+			return open(file_name, 'wb')
+
+	def open_output(self, file_name):
+		"""Open binary output stream for a batch file or package member and start batch's running digest."""
+		if self.hash_method_name:
+			self.batch_hash = getattr(hashlib, self.hash_method_name)()
+		self.output_stream = self.open_stream(file_name)
+
+	def write_output(self, data):
+		"""Write bytes to current batch, updating batch's running digest."""
+		self.output_stream.write(data)
+		self.batch_file_size += len(data)
+		if self.batch_hash:
+			self.batch_hash.update(data)
+
+	def close_output(self):
+		"""Close current batch's output stream, saving its digest and size."""
+		self.output_stream.close()
+		self.output_stream = None
+		self.batch_sizes.append(self.batch_row_count)
+		if self.batch_hash:
+			self.batch_hashes.append(self.batch_hash.hexdigest())
+			self.batch_hash = None
+		self.file_size += self.batch_file_size
+
+	def open_lob_output(self):
+		"""Open current batch's sidecar file for large object values."""
+		file_name = self.batch_file_name(self.batch_number, 'lob')
+		self.lob_file_names.append(file_name)
+		self.lob_stream = self.open_stream(file_name)
+		self.lob_offset = 0
+
+	def close_lob_output(self):
+		"""Close current batch's sidecar file and track its size."""
+		self.lob_stream.close()
+		self.lob_stream = None
+		self.file_size += self.lob_offset
+
+	def write_lob_values(self, row):
+		"""Return row (list) with large object values written to batch's sidecar and replaced by [offset, length]."""
+		row = list(row)
+		for column_index in self.lob_columns:
+			value = row[column_index]
+			if value is None:
+				continue
+
+			if isinstance(value, str):
+				data = value.encode('UTF8')
+			else:
+				# jsonb values
+				data = json.dumps(value, default=json_serializer).encode('UTF8')
+			self.lob_stream.write(data)
+			if self.batch_hash:
+				self.batch_hash.update(data)
+			row[column_index] = [self.lob_offset, len(data)]
+			self.lob_offset += len(data)
+		return row
+
+	def open_batch(self):
+		"""Start the next batch file."""
+		self.batch_number = self.next_batch_number()
+		self.batch_row_count = 0
+		self.batch_file_size = 0
+		file_name = self.batch_file_name(self.batch_number)
+		self.file_names.append(file_name)
+		logger.info(f'Table({self.table_name}): batch={self.batch_number} using batch size {self.batch_size:,}')
+
+		self.open_output(file_name)
+		self.write_output(b'[')
+		if self.lob_columns:
+			self.open_lob_output()
+
+	def close_batch(self):
+		"""Finish the current batch file and track its size."""
+		self.write_output(b'\n]\n')
+		self.close_output()
+
+		# Note: Batch and sidecar members are open at once; a spooled member is handed off to the streaming one.
+		if self.lob_stream:
+			self.close_lob_output()
+
+	def write(self, row):
+		"""Serialize row to current batch; batch files are only created when there are rows to write."""
+		if not self.output_stream:
+			self.open_batch()
+
+		# json encodes tuples (including named tuples) as arrays; other row types (eg. pyodbc.Row) are not tuples
+		if self.lob_columns:
+			row = self.write_lob_values(row)
+		elif not isinstance(row, tuple):
+			row = tuple(row)
+
+		# one row per line; rows after the first are prefixed with a comma
+		# Note: encoder output is ascii (ensure_ascii) so encode() is a straight conversion to bytes.
+		if self.batch_row_count:
+			self.write_output(b',\n' + self.encoder.encode(row).encode())
+		else:
+			self.write_output(b'\n' + self.encoder.encode(row).encode())
+
+		self.batch_row_count += 1
+		self.row_count += 1
+		if self.batch_row_count >= self.batch_size:
+			self.close_batch()
+		elif self.batch_row_count % self.sample_rows == 0 and (self.memory_limit or not self.is_batch_size_sampled):
+			self.adapt_batch_size()
+
+	def write_rows(self, rows):
+		"""Serialize an iterable of rows, eg. a cursor."""
+		for row in rows:
+			self.write(row)
+
+	def close(self):
+		"""Finish last (partial) batch file."""
+		if self.output_stream:
+			self.close_batch()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		self.close()
+
+
+class CopyOutput:
+
+	"""File-like target for cursor.copy_expert() that forwards copy data to a CopyBatchWriter."""
+
+	def __init__(self, batch_writer):
+		self.batch_writer = batch_writer
+
+	def write(self, data):
+		self.batch_writer.write_data(data)
+
+
+class CopyBatchWriter(BatchWriter):
+
+	"""
+	Writes copy text format data (tab delimited columns, \\N nulls, backslash escapes) to <table>#NNNN.tsv batch files.
+	psycopg2 writes copy data a row at a time and embedded newlines are escaped, so each newline ends a row
+	and batches split at row boundaries.
+	"""
+
+	file_ext = 'tsv'
+	is_copy = True
+
+	def open_batch(self):
+		"""Start the next batch file."""
+		self.batch_number = self.next_batch_number()
+		self.batch_row_count = 0
+		self.batch_file_size = 0
+		file_name = self.batch_file_name(self.batch_number)
+		self.file_names.append(file_name)
+		logger.info(f'Table({self.table_name}): batch={self.batch_number} using batch size {self.batch_size:,} (copy)')
+		self.open_output(file_name)
+
+	def close_batch(self):
+		"""Finish the current batch file and track its size."""
+		self.close_output()
+
+	def write_copy(self, cursor, sql):
+		"""Stream a select's rows to batch files via copy (<select>) to stdout."""
+		sql = sql.strip().rstrip(';')
+		cursor.copy_expert(f'copy (\n{sql}\n) to stdout', CopyOutput(self))
+
+	def write_data(self, data):
+		"""Write a chunk of copy data to current batch; batch files are only created when there are rows to write."""
+		if isinstance(data, str):
+			data = data.encode('UTF8')
+		if not self.output_stream:
+			self.open_batch()
+		self.write_output(data)
+
+		row_count = data.count(b'\n')
+		self.batch_row_count += row_count
+		self.row_count += row_count
+		if self.batch_row_count >= self.batch_size:
+			self.close_batch()
+		elif self.batch_row_count // self.sample_rows > (self.batch_row_count - row_count) // self.sample_rows and (
+			self.memory_limit or not self.is_batch_size_sampled
+		):
+			# chunks hold many rows; sample when a chunk crosses a multiple of sample_rows
+			self.adapt_batch_size()
@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+bulk_load.py
+
+Native bulk loading of rows into an existing table.
+
+Loaders:
+- TableValuedParameterLoader: SQL Server; rows are sent as table-valued parameters (TVPs) of a table type
+  created to match the target table, inserted with a single insert ... select per chunk of rows; table types
+  are created on a table's first load and dropped when the loader is closed
+- CopyLoader: PostgreSQL; rows are streamed to copy ... from stdin in text format
+- ExecuteManyLoader: any platform; Database.bulk_insert_into_table (pyodbc fast_executemany) per chunk of rows
+
+Loaders consume any iterable of rows (eg. a batch file's row generator) without materializing it;
+TVP and executemany loaders hold one chunk of rows at a time, copy streams row by row.
+
+bulk_loader() returns the fastest loader supported by a connection. A TVP loader falls back to
+executemany if its table type can't be created (eg. missing create type permission).
+
+Usage:
+loader = bulk_loader(db_conn)
+try:
+	row_count = loader.load(schema_name, table_name, table_schema, rows)
+finally:
+	loader.close()
+"""
+
+
+# standard lib
+import datetime
+import itertools
+import json
+import logging
+
+
+# common lib
+from common import json_serializer
+from common import quote
+
+
+# 3rd party lib
+import pyodbc
+
+
+# module level logger
+logger = logging.getLogger(__name__)
+
+
+def chunks(rows, chunk_size):
+	"""Yield lists of up to chunk_size rows from an iterable of rows."""
+	rows = iter(rows)
+	while True:
+		chunk = list(itertools.islice(rows, chunk_size))
+		if not chunk:
+			break
+		yield chunk
+
+
+class BulkLoader:
+
+	"""Subclass for each bulk load method."""
+
+	def __init__(self, db_conn, chunk_size=10000):
+		self.db_conn = db_conn
+		self.chunk_size = chunk_size
+
+	def load(self, schema_name, table_name, table_schema, rows):
+		"""Subclass: Insert rows into an existing table; return count of rows inserted."""
+		raise NotImplementedError
+
+	def close(self):
+		"""Subclass: Release any database objects created by loads."""
+		pass
+
+
+class ExecuteManyLoader(BulkLoader):
+
+	def load(self, schema_name, table_name, table_schema, rows):
+		row_count = 0
+		for chunk in chunks(rows, self.chunk_size):
+			self.db_conn.bulk_insert_into_table(schema_name, table_name, table_schema, chunk)
+			row_count += len(chunk)
+		return row_count
+
+
+class TableValuedParameterLoader(BulkLoader):
+
+	"""
+	SQL Server TVP loader. TVP columns bind with their table type's declared types so (n)varchar(max) values
+	stream as large objects vs fast_executemany's fixed size parameter buffers.
+	"""
+
+	def __init__(self, db_conn, chunk_size=10000):
+		super().__init__(db_conn, chunk_size)
+		self.fallback_loader = None
+
+		# table type names keyed by (schema_name, table_name); a table's batches share its type
+		self.table_types = dict()
+
+	# noinspection PyUnusedLocal
+	def drop_table_type(self, schema_name, type_name):
+		command_name = 'drop_table_type'
+		sql_command = self.db_conn.render(command_name, locals())
+		self.db_conn.log(command_name, sql_command)
+		self.db_conn.cursor.execute(sql_command)
+		self.db_conn.conn.commit()
+
+	# noinspection PyUnusedLocal
+	def create_table_type(self, schema_name, table_name, table_schema):
+		"""Create a table type matching a target table's columns; return type name."""
+		type_name = f'{table_name}_tvp'
+		column_definitions = table_schema.column_definitions()
+
+		# type is recreated per loader since target table's schema may have changed (or a failed run left it behind)
+		self.drop_table_type(schema_name, type_name)
+
+		command_name = 'create_table_type'
+		sql_command = self.db_conn.render(command_name, locals())
+		self.db_conn.log(command_name, sql_command)
+		self.db_conn.cursor.execute(sql_command)
+		self.db_conn.conn.commit()
+		return type_name
+
+	# noinspection PyUnusedLocal
+	def load(self, schema_name, table_name, table_schema, rows):
+		if self.fallback_loader:
+			return self.fallback_loader.load(schema_name, table_name, table_schema, rows)
+
+		table_key = (schema_name, table_name)
+		try:
+			if table_key not in self.table_types:
+				self.table_types[table_key] = self.create_table_type(schema_name, table_name, table_schema)
+			type_name = self.table_types[table_key]
+		except pyodbc.Error as e:
+			logger.warning(f'Table type for {schema_name}.{table_name} not created ({e}); using executemany loader')
+			self.db_conn.conn.rollback()
+			self.fallback_loader = ExecuteManyLoader(self.db_conn, self.chunk_size)
+			return self.fallback_loader.load(schema_name, table_name, table_schema, rows)
+
+		command_name = 'insert_from_table_type'
+		column_names = ', '.join(quote(table_schema.columns.keys()))
+		sql_command = self.db_conn.render(command_name, locals())
+		self.db_conn.log(command_name, sql_command)
+
+		# a TVP is a list of row tuples prefixed by its (schema qualified) table type name
+		row_count = 0
+		try:
+			for chunk in chunks(rows, self.chunk_size):
+				table_valued_parameter = [type_name, schema_name] + [tuple(row) for row in chunk]
+				self.db_conn.cursor.execute(sql_command, (table_valued_parameter,))
+				row_count += len(chunk)
+			self.db_conn.conn.commit()
+		except Exception:
+			# drop type vs leaking it when a load fails; a later load of this table recreates it
+			del self.table_types[table_key]
+			try:
+				self.db_conn.conn.rollback()
+				self.drop_table_type(schema_name, type_name)
+			except pyodbc.Error as e:
+				logger.warning(f'Table type {schema_name}.{type_name} not dropped ({e})')
+			raise
+		return row_count
+
+	def close(self):
+		"""Drop table types created by this loader's loads."""
+		table_types, self.table_types = self.table_types, dict()
+		for (schema_name, _), type_name in table_types.items():
+			try:
+				self.drop_table_type(schema_name, type_name)
+			except pyodbc.Error as e:
+				logger.warning(f'Table type {schema_name}.{type_name} not dropped ({e})')
+
+
+def copy_value(value):
+	"""Return value as a copy text format field."""
+	if value is None:
+		return '\\N'
+	elif isinstance(value, bool):
+		return 't' if value else 'f'
+	elif isinstance(value, (bytes, bytearray, memoryview)):
+		# bytea hex format; backslash is escaped for copy
+		return '\\\\x' + bytes(value).hex()
+	elif isinstance(value, (datetime.date, datetime.time)):
+		return value.isoformat()
+	elif isinstance(value, (list, dict)):
+		text = json.dumps(value, default=json_serializer)
+	else:
+		text = str(value)
+	return text.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+class CopyStream:
+
+	"""Read-only file-like object that renders rows as copy text format lines as they are read."""
+
+	def __init__(self, rows):
+		self.rows = iter(rows)
+		self.buffer = ''
+		self.row_count = 0
+
+	def read(self, size=-1):
+		lines = [self.buffer]
+		length = len(self.buffer)
+		while size < 0 or length < size:
+			row = next(self.rows, None)
+			if row is None:
+				break
+			line = '\t'.join(copy_value(value) for value in row) + '\n'
+			lines.append(line)
+			length += len(line)
+			self.row_count += 1
+
+		data = ''.join(lines)
+		if size < 0:
+			self.buffer = ''
+			return data
+		self.buffer = data[size:]
+		return data[:size]
+
+	def readline(self, size=-1):
+		return self.read(size)
+
+
+class CopyLoader(BulkLoader):
+
+	"""PostgreSQL copy from stdin loader."""
+
+	# noinspection PyUnusedLocal
+	def load(self, schema_name, table_name, table_schema, rows):
+		command_name = 'copy_from_stdin'
+		column_names = ', '.join(quote(table_schema.columns.keys()))
+		sql_command = self.db_conn.render(command_name, locals())
+		self.db_conn.log(command_name, sql_command)
+
+		copy_stream = CopyStream(rows)
+		self.db_conn.cursor.copy_expert(sql_command, copy_stream)
+		self.db_conn.conn.commit()
+		return copy_stream.row_count
+
+
+def is_tvp_supported():
+	"""Return True if pyodbc binds schema qualified table-valued parameters (pyodbc 4.0.30+)."""
+	try:
+		version = tuple(int(part) for part in pyodbc.version.split('.')[:3])
+	except ValueError:
+		return False
+	return version >= (4, 0, 30)
+
+
+def bulk_loader(db_conn, chunk_size=10000):
+	"""Return fastest bulk loader available for a Database connection."""
+	if db_conn.platform == 'postgresql':
+		loader = CopyLoader(db_conn, chunk_size)
+	elif db_conn.platform == 'mssql' and is_tvp_supported():
+		loader = TableValuedParameterLoader(db_conn, chunk_size)
+	else:
+		loader = ExecuteManyLoader(db_conn, chunk_size)
+	logger.info(f'Using {loader.__class__.__name__} for {db_conn.platform} bulk loads')
+	return loader
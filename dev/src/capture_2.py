@@ -26,9 +26,13 @@ TODO:
 
 
 # standard lib
+import concurrent.futures
 import contextlib
+import copy
 import datetime
 import fnmatch
+import heapq
+import itertools
 import json
 import logging
 import os
@@ -37,30 +41,34 @@ import pickle
 import shutil
 import socket
 import sys
+import threading
 
 
 # common lib
-from common import create_archive
 from common import copy_file_if_exists
 from common import clear_folder
 from common import create_folder
+from common import delete_file
 from common import delete_files
 from common import describe
-from common import expand
-from common import hash_file
-from common import hash_files
 from common import hash_str
 from common import iso_to_datetime
 from common import json_load
-from common import json_save
 from common import json_serializer
-from common import key_value
-from common import save_json
 from common import script_name
 from common import split
 
 
 # udp classes
+from batch_writer import BatchWriter
+from batch_writer import CopyBatchWriter
+from batch_writer import lob_columns
+from capture_checkpoint import CaptureCheckpoint
+from capture_package import CapturePackage
+from capture_package import PackageUploader
+from column_stats import ColumnStats
+from columnar import ColumnarBatchWriter, table_columns
+from row_delta import RowDelta
 from cloud_aws import Objectstore
 from daemon import Daemon
 
@@ -89,6 +97,25 @@ logger = logging.getLogger(__name__)
 # .namespace (pulled from parent folder)
 
 
+def schema_fingerprint(table_schema):
+	"""Return hash of a table schema's column names and data types; changes when a table's schema changes."""
+	columns = list()
+	for column_name, column in table_schema.columns.items():
+		columns.append([
+			column_name, column.data_type, column.character_maximum_length, column.numeric_precision, column.numeric_scale
+		])
+	return hash_str(json.dumps(columns))
+
+
+def predict_run_time(run_times, worker_count):
+	"""Return predicted elapsed time of run_times (in scheduled order) on a pool of worker_count workers."""
+	workers = [0.0] * max(worker_count, 1)
+	for run_time in run_times:
+		# next table starts on the first worker to finish
+		heapq.heappush(workers, heapq.heappop(workers) + run_time)
+	return max(workers)
+
+
 class Stat:
 
 	def __init__(self, stat_name, stat_type=None):
@@ -100,16 +127,22 @@ class Stat:
 		self.run_time = 0
 		self.row_count = 0
 		self.data_size = 0
+		self.batch_size = 0
+
+		# capture query timeouts and the cdc window splits they triggered
+		self.timeout_count = 0
+		self.split_count = 0
 
 	def start(self):
 		self.start_time = datetime.datetime.now()
 		logger.info(f'{self.stat_name.capitalize()} started ...')
 
-	def stop(self, row_count=0, data_size=0):
+	def stop(self, row_count=0, data_size=0, batch_size=0):
 		self.end_time = datetime.datetime.now()
 		self.run_time = (self.end_time - self.start_time).total_seconds()
 		self.row_count = row_count
 		self.data_size = data_size
+		self.batch_size = batch_size
 		logger.info(f'{self.stat_name.capitalize()} complete in {self.run_time} secs ({self.row_count:,} records, {self.data_size:,} bytes)')
 
 	def row(self):
@@ -122,6 +155,9 @@ class Stat:
 		row['run_time'] = self.run_time
 		row['row_count'] = self.row_count
 		row['data_size'] = self.data_size
+		row['batch_size'] = self.batch_size
+		row['timeout_count'] = self.timeout_count
+		row['split_count'] = self.split_count
 		return row
 
 
@@ -132,6 +168,9 @@ class Stats:
 		self.file_name = file_name
 		self.stats = dict()
 
+		# capture workers start, stop, and save stats concurrently
+		self.lock = threading.RLock()
+
 		# script version
 		script_timestamp = pathlib.Path(sys.argv[0]).stat().st_mtime
 		script_datetime = datetime.datetime.fromtimestamp(script_timestamp)
@@ -153,13 +192,26 @@ class Stats:
 		self.extra_columns = [column_name.strip() for column_name in extra_columns]
 
 	def start(self, stat_name, stat_type=None):
-		self.stats[stat_name] = Stat(stat_name, stat_type)
-		self.stats[stat_name].start()
-
-	def stop(self, stat_name, row_count=0, data_size=0):
-		self.stats[stat_name].stop(row_count, data_size)
-
-	# TODO: stat_type = job, step (extract, compress, upload)
+		with self.lock:
+			self.stats[stat_name] = Stat(stat_name, stat_type)
+			self.stats[stat_name].start()
+
+	def stop(self, stat_name, row_count=0, data_size=0, batch_size=0):
+		with self.lock:
+			self.stats[stat_name].stop(row_count, data_size, batch_size)
+
+	def increment(self, stat_name, counter_name):
+		"""Increment a stat's counter, eg. timeout_count."""
+		with self.lock:
+			stat = self.stats[stat_name]
+			setattr(stat, counter_name, getattr(stat, counter_name) + 1)
+
+	def add(self, stat):
+		"""Add a stat tracked outside of stats, eg. a step that overlaps when stats are saved."""
+		with self.lock:
+			self.stats[stat.stat_name] = stat
+
+	# TODO: stat_type = job, step (extract, package, upload)
 	# save stat info in a json file format to preserve data types
 	def save(self, file_name=None):
 		# make name and path of log output an option
@@ -169,30 +221,32 @@ class Stats:
 		elif not file_name:
 			file_name = self.file_name
 
+		# snapshot stats under lock since capture workers update stats concurrently
 		rows = []
-		for stat_name, stat in self.stats.items():
-			row = dict()
+		with self.lock:
+			for stat_name, stat in self.stats.items():
+				row = dict()
 
-			# session wide properties
-			row['script_name'] = self.script_name
-			row['script_version'] = self.script_version
-			row['script_version'] = self.script_version
-			row['script_instance'] = self.script_instance
-			row['server_name'] = self.server_name
-			row['account_name'] = self.account_name
-			row['namespace'] = self.namespace
-			row['job_id'] = self.job_id
+				# session wide properties
+				row['script_name'] = self.script_name
+				row['script_version'] = self.script_version
+				row['script_version'] = self.script_version
+				row['script_instance'] = self.script_instance
+				row['server_name'] = self.server_name
+				row['account_name'] = self.account_name
+				row['namespace'] = self.namespace
+				row['job_id'] = self.job_id
 
-			# merge in stat properties
-			row = {**row, **stat.row()}
+				# merge in stat properties
+				row = {**row, **stat.row()}
 
-			# save the row for output
-			rows.append(row)
+				# save the row for output
+				rows.append(row)
 
-		# save the output
-		output_stream = open(file_name, 'w')
-		json.dump(rows, output_stream, indent=2, default=json_serializer)
-		output_stream.close()
+			# save the output
+			output_stream = open(file_name, 'w')
+			json.dump(rows, output_stream, indent=2, default=json_serializer)
+			output_stream.close()
 
 
 class TableHistory:
@@ -203,9 +257,27 @@ class TableHistory:
 		self.last_rowversion = None
 		self.last_filehash = None
 
+		# smoothed run time (secs) and last row count; used to schedule tables longest expected first
+		self.run_time = None
+		self.row_count = None
+
+	def __setstate__(self, state):
+		# histories pickled by earlier versions lack newer attributes; default them before restoring pickled ones
+		self.__init__(state.get('table_name'))
+		self.__dict__.update(state)
+
 	def __str__(self):
 		# return f'{self.table_name}: last_timestamp={self.last_timestamp}, last_filehash={self.last_filehash}'
-		return describe(self, 'table_name, last_timestamp, last_filehash')
+		return describe(self, 'table_name, last_timestamp, last_rowversion, last_filehash, run_time, row_count')
+
+	def track_run_time(self, run_time, row_count):
+		"""Update expected run time with a table's latest run time."""
+		if self.run_time is None:
+			self.run_time = run_time
+		else:
+			# smooth out run to run noise
+			self.run_time = (self.run_time + run_time) / 2
+		self.row_count = row_count
 
 
 class JobHistory:
@@ -270,6 +342,9 @@ class JobHistory:
 
 class CaptureDaemon(Daemon):
 
+	# source database statement metrics and 'sql' command
+	is_sql_logged = True
+
 	def __init__(self):
 		super().__init__()
 
@@ -285,6 +360,9 @@ class CaptureDaemon(Daemon):
 		# job specific files
 		self.capture_file_name = None
 		self.zip_file_name = None
+		self.package = None
+		self.uploader = None
+		self.upload_stat = None
 
 		# capture specific properties
 		self.project_name = None
@@ -296,10 +374,29 @@ class CaptureDaemon(Daemon):
 		self.stats = None
 		self.job_id = None
 
+		# job wide rowversion upper bound for rowversion cdc tables (SQL Server)
+		self.current_rowversion = None
+
+		# job wide table metadata cache; table schemas and pks keyed by lowercase table name
+		self.table_schemas = None
+		self.table_pks = None
+
 		# overall job stats
 		self.job_row_count = 0
 		self.job_file_size = 0
 
+		# per table checkpoints of job progress and failed run's partial package to recover checkpointed tables from
+		self.checkpoint = None
+		self.recover_file_name = None
+
+		# package manifest's table entries
+		self.manifest_tables = dict()
+
+		# capture worker state; each worker thread extracts tables over its own source connection
+		self.lock = threading.Lock()
+		self.worker = threading.local()
+		self.worker_connections = list()
+
 	def setup(self):
 		# get project name
 		if len(sys.argv) == 1:
@@ -344,6 +441,66 @@ class CaptureDaemon(Daemon):
 		self.database = self.connect_config.sections[project.database]
 
 
+	def connect(self):
+		"""Return a (db, db_engine) connection pair borrowed from the source database's connection pool."""
+		db = database.connection_pool(self.database).borrow()
+		db_engine = database.Database(self.database.platform, db.conn)
+		return db, db_engine
+
+	def disconnect(self, db):
+		"""Return a connection borrowed by connect() to its pool; pooled connections are re-used by later jobs."""
+		if db:
+			database.connection_pool(self.database).release(db)
+
+	def connection_count(self, capture_workers):
+		"""Return count of source connections a job holds at once: main connection plus workers' and their partitions'."""
+		partitions = max(
+			[int(table_object.partitions or 1) for table_object in self.table_config.sections.values()], default=1
+		)
+		partition_connections = partitions if partitions > 1 else 0
+		if capture_workers <= 1:
+			return 1 + partition_connections
+		return 1 + capture_workers * (1 + partition_connections)
+
+	def worker_connect(self):
+		"""Return current worker thread's (db, db_engine) pair, connecting on the worker's first table."""
+		if not hasattr(self.worker, 'db'):
+			self.worker.db, self.worker.db_engine = self.connect()
+			with self.lock:
+				self.worker_connections.append(self.worker.db)
+		return self.worker.db, self.worker.db_engine
+
+	def worker_process_table(self, schema_name, table_name, table_object, table_history, current_timestamp,
+	                         table_checkpoint=None):
+		"""
+		Process a table on a capture worker thread using the worker's own source connection.
+		Checkpointed tables are recovered from failed run's package without connecting when possible.
+		"""
+		if table_checkpoint and self.recover_table(table_name, table_history, table_checkpoint):
+			return
+		db, db_engine = self.worker_connect()
+		self.process_table(db, db_engine, schema_name, table_name, table_object, table_history, current_timestamp)
+
+	def close_worker_connections(self):
+		"""Return all capture worker connections borrowed during this job."""
+		for db in self.worker_connections:
+			self.disconnect(db)
+		self.worker_connections.clear()
+
+		# new thread local storage so next job's workers reconnect
+		self.worker = threading.local()
+
+	def capture_cursor(self, db, table_name):
+		"""Return a cursor for a table's capture select; server side (streaming) if project.server_cursor=1."""
+		if self.project.server_cursor != '1':
+			return db.capture_cursor()
+
+		# cursor names must be unique across a connection's open cursors
+		cursor_name = f'udp_capture_{self.job_id}_{table_name}'.lower()
+		itersize = int(self.project.cursor_itersize or 0)
+		logger.info(f'Table({table_name}): server side cursor {cursor_name} (itersize={itersize or "default"})')
+		return db.capture_cursor(cursor_name, itersize)
+
 	def current_timestamp(self, db_engine):
 		"""Return current timestamp for capture CDC date range with step back and fast forward logic."""
 
@@ -360,6 +517,19 @@ class CaptureDaemon(Daemon):
 
 		return current_timestamp
 
+	def current_rowversion_bound(self, db_engine):
+		"""Return min_active_rowversion() upper bound if any SQL Server tables use rowversion cdc, else None."""
+		if self.database.platform != 'mssql':
+			return None
+
+		table_cdcs = [table_object.cdc.lower() for table_object in self.table_config.sections.values()]
+		if 'rowversion' not in table_cdcs:
+			return None
+
+		current_rowversion = db_engine.current_rowversion()
+		logger.info(f'Current rowversion: {current_rowversion}')
+		return current_rowversion
+
 	def process_table(self, db, db_engine, schema_name, table_name, table_object, table_history, current_timestamp):
 		"""Process a specific table."""
 
@@ -392,16 +562,14 @@ class CaptureDaemon(Daemon):
 		self.stats.start(table_name, 'table')
 		# logger.info(f'Processing {table_name} ...')
 
-		# create a fresh cursor for each table
-		cursor = db.conn.cursor()
-
-		# save table object for stage
-		output_stream = open(f'{self.work_folder_name}/{table_name}.table', 'wb')
-		pickle.dump(table_object, output_stream)
-		output_stream.close()
+		# save table object state for stage; saved to work folder once we know table has changes to capture
+		table_object_state = pickle.dumps(table_object)
 
 		# discover table schema
-		table_schema = db_engine.select_table_schema(schema_name, table_name)
+		if self.table_schemas is not None:
+			table_schema = self.table_schemas.get(table_name.lower())
+		else:
+			table_schema = db_engine.select_table_schema(schema_name, table_name)
 
 		# remove ignored columns from table schema
 		if table_object.ignore_columns:
@@ -418,24 +586,28 @@ class CaptureDaemon(Daemon):
 				logger.info(f'Ignore_column: {table_name}.{column_name}')
 				table_schema.columns.pop(column_name)
 
-		# save table schema for stage to use
-		output_stream = open(f'{self.work_folder_name}/{table_name}.schema', 'wb')
-		pickle.dump(table_schema, output_stream)
-		output_stream.close()
-
-		# save table pk for stage to use
-		pk_columns = db_engine.select_table_pk(schema_name, table_name)
+		# table pk for stage to use
+		if self.table_pks is not None:
+			pk_columns = self.table_pks.get(table_name.lower(), '') if table_schema else None
+		else:
+			pk_columns = db_engine.select_table_pk(schema_name, table_name)
 		if not pk_columns and table_object.primary_key:
 			pk_columns = table_object.primary_key
-		output_stream = open(f'{self.work_folder_name}/{table_name}.pk', 'w')
-		output_stream.write(pk_columns)
-		output_stream.close()
 
 		# clear cdc if it doesn't match timestamp/rowversion
 		table_object.cdc = table_object.cdc.lower()
 		if not table_object.cdc or table_object.cdc not in ('timestamp', 'rowversion'):
 			table_object.cdc = ''
 
+		# rowversion cdc requires a SQL Server source and a rowversion column
+		if table_object.cdc == 'rowversion':
+			if self.current_rowversion is None:
+				logger.info(f'Warning: {table_name} cdc=rowversion not supported for {self.database.platform} sources')
+				table_object.cdc = ''
+			elif not table_object.rowversion:
+				logger.info(f'Warning: {table_name} cdc=rowversion but no rowversion column specified')
+				table_object.cdc = ''
+
 		# if no pk_columns, then clear table cdc
 		if not pk_columns:
 			if table_object.cdc and table_object.cdc != 'none':
@@ -453,13 +625,49 @@ class CaptureDaemon(Daemon):
 		table_object.table_name = table_name
 		table_object.column_names = column_names
 		select_cdc = cdc_select.SelectCDC(table_object)
-		sql = select_cdc.select(self.job_id, current_timestamp, last_timestamp)
 
-		# logger.info(f'Capture SQL:\n{sql}\n')
+		# backfill timestamp filtered tables in backfill_days windows; one window per job until caught up
+		# Note: Table history's last_timestamp checkpoints backfill progress; failed jobs resume at their window.
+		if table_object.backfill_days and table_object.timestamp and table_object.cdc != 'rowversion':
+			backfill_timestamp = last_timestamp + datetime.timedelta(days=float(table_object.backfill_days))
+			if backfill_timestamp < current_timestamp:
+				logger.info(f'Table({table_name}): backfill window {last_timestamp} - {backfill_timestamp}')
+				current_timestamp = backfill_timestamp
+				self.is_pending_work = True
+
+		current_rowversion = None
+		last_rowversion = None
+		if table_object.cdc == 'rowversion':
+			# initialize table history's last rowversion to first rowversion if not set yet
+			if table_history.last_rowversion is None:
+				table_history.last_rowversion = cdc_select.parse_rowversion(table_object.first_rowversion)
+			last_rowversion = table_history.last_rowversion
+			current_rowversion = self.current_rowversion
+			logger.info(f'Table({table_name}): rowversion range {last_rowversion} - {current_rowversion}')
+		cdc_window = (current_timestamp, last_timestamp, current_rowversion, last_rowversion)
+
+		# optionally probe for rows in cdc window, skipping the extract and table files of unchanged tables
+		if table_object.change_probe == '1' and not self.has_changes(db_engine, select_cdc, cdc_window):
+			logger.info(f'Table({table_name}): no changes since {last_timestamp}; skipping extract')
+			table_history.last_timestamp = current_timestamp
+			if table_object.cdc == 'rowversion':
+				table_history.last_rowversion = self.current_rowversion
+			self.stats.stop(table_name, 0, 0)
+			self.stats.save()
+			table_history.track_run_time(self.stats.stats[table_name].run_time, 0)
+			self.checkpoint_table(table_name, table_history, 0, 0, 0, dict())
+			return
 
-		# run sql here vs via db_engine.capture_select
-		# cursor = db_engine.capture_select(schema_name, table_name, column_names, last_timestamp, current_timestamp)
-		cursor.execute(sql)
+		# record sidecarred large object columns in schema so stage reads sidecars by capture's column list
+		table_schema.lob_columns = lob_columns(table_schema) if self.project.lob_sidecar == '1' else list()
+
+		# save table object, schema, and pk for stage to use
+		with open(f'{self.work_folder_name}/{table_name}.table', 'wb') as output_stream:
+			output_stream.write(table_object_state)
+		with open(f'{self.work_folder_name}/{table_name}.schema', 'wb') as output_stream:
+			pickle.dump(table_schema, output_stream)
+		with open(f'{self.work_folder_name}/{table_name}.pk', 'w') as output_stream:
+			output_stream.write(pk_columns)
 
 		# capture rows in fixed size batches to support unlimited size record counts
 		# Note: Batching on capture side allows stage to insert multiple batches in parallel.
@@ -470,101 +678,481 @@ class CaptureDaemon(Daemon):
 		else:
 			batch_size = 1_000_000
 
-		batch_number = 0
-		row_count = 0
-		file_size = 0
-		while True:
-			batch_number += 1
-			rows = cursor.fetchmany(batch_size)
-			if not rows:
-				break
-
-			logger.info(f'Table({table_name}): batch={batch_number} using batch size {batch_size:,}')
+		# cdc=none tables in row delta mode capture rows inserted and deleted since their previous capture
+		is_snapshot = not table_object.cdc or table_object.cdc == 'none'
+		row_delta = None
+		if is_snapshot and table_object.row_delta == '1':
+			row_delta = RowDelta(f'{self.state_folder_name}/{table_name}.rowhash')
+
+		# cdc=none tables with an order are checked for identical output before being added to the package
+		is_filehash_check = is_snapshot and table_object.order and not row_delta
+
+		# stream rows to numbered batch files as they come off the cursor; directly into package when possible
+		# Note: File hash is a running digest maintained by batch writer as batch files are written.
+		package = None if is_filehash_check else self.package
+		hash_method_name = 'sha256' if is_filehash_check else None
+
+		# very large tables can be extracted as concurrent key range partitions
+		# Note: Partitions complete in any order so tables checked via file hash are never partitioned.
+		# optionally collect per-column value statistics for stage as rows stream to batch files
+		if self.project.column_stats == '1':
+			column_stats = ColumnStats(column_names, is_distinct=self.project.column_distinct == '1')
+		else:
+			column_stats = None
 
-			# flatten rows to list of column values
-			json_rows = [list(row) for row in rows]
-			output_file = f'{self.work_folder_name}/{table_name}#{batch_number:04}.json'
-			with open(output_file, 'w') as output_stream:
-				# indent=2 for debugging
-				json.dump(json_rows, output_stream, indent=2, default=json_serializer)
+		# postgresql sources can stream rows to batch files via copy unless rows are filtered or observed in Python
+		is_copy = self.project.copy_extract == '1' and self.database.platform == 'postgresql'
+		is_copy = is_copy and not row_delta and not column_stats
 
-			# track stats
-			row_count += len(json_rows)
-			file_size += pathlib.Path(output_file).stat().st_size
+		if is_filehash_check or row_delta:
+			partition_column = ''
+		else:
+			partition_column = self.partition_column(table_name, table_object, pk_columns, table_schema)
+		batch_writers = None
+		if partition_column:
+			partitions = int(table_object.partitions)
+			batch_writers = self.extract_partitions(
+				db_engine, table_name, table_object, table_schema, select_cdc, cdc_window, partition_column, partitions, batch_size,
+				package, column_stats, is_copy
+			)
+		if batch_writers is None:
+			batch_writer = self.batch_writer(
+				table_name, table_schema, batch_size, package, hash_method_name, is_row_hash=bool(row_delta), is_copy=is_copy
+			)
+			with batch_writer:
+				self.extract_window(
+					db, table_name, table_object, select_cdc, cdc_window, batch_writer, row_delta, column_stats
+				)
+			batch_writers = [batch_writer]
+
+		if column_stats:
+			column_stats.save(f'{self.work_folder_name}/{table_name}.stats')
+
+		# save row delta's deleted rows for stage; table's new index is committed when job history is saved
+		if row_delta:
+			deleted_hashes = row_delta.deleted_hashes()
+			logger.info(
+				f'Table({table_name}): row delta of {row_delta.row_count:,} rows; '
+				f'{row_delta.inserted_count:,} inserted, {len(deleted_hashes):,} deleted (full={row_delta.is_full})'
+			)
+			row_delta.save(f'{self.state_folder_name}/{table_name}.rowhash.pending')
+			with open(f'{self.work_folder_name}/{table_name}.delta', 'w') as output_stream:
+				json.dump(dict(is_full=row_delta.is_full, deleted_hashes=deleted_hashes), output_stream)
+
+		# track stats; batch_size is the largest (adaptively sized) batch written
+		row_count = sum(batch_writer.row_count for batch_writer in batch_writers)
+		file_size = sum(batch_writer.file_size for batch_writer in batch_writers)
+		batch_size = max([max(batch_writer.batch_sizes, default=0) for batch_writer in batch_writers], default=0)
+
+		# package members holding table's batch (and large object sidecar) files and their row counts
+		batch_members = dict()
+		for batch_writer in batch_writers:
+			for file_name, batch_row_count in zip(batch_writer.file_names, batch_writer.batch_sizes):
+				batch_members[pathlib.Path(file_name).name] = batch_row_count
+			for file_name in batch_writer.lob_file_names:
+				batch_members[pathlib.Path(file_name).name] = None
 
 		# if no cdc, but order set, do a file hash see if output the same time as last file hash
-		if (not table_object.cdc or table_object.cdc == 'none') and table_object.order:
-			print(f'Checking {table_name} file hash based on cdc={table_object.cdc} and order={table_object.order}')
-			table_data_files = f'{self.work_folder_name}/{table_name}#*.json'
-			current_filehash = hash_files(table_data_files)
+		if is_filehash_check:
+			batch_writer = batch_writers[0]
+			logger.info(f'Checking {table_name} file hash based on cdc={table_object.cdc} and order={table_object.order}')
+			table_data_files = f'{self.work_folder_name}/{table_name}#*.*'
+			current_filehash = batch_writer.file_hash
 			if table_history.last_filehash == current_filehash:
 				# suppress this update
-				print(f'Table({table_name}): identical file hash, update suppressed')
 				logger.info(f'Table({table_name}): identical file hash, update suppressed')
 				row_count = 0
 				file_size = 0
+				batch_members = dict()
 
 				# delete exported json files
 				delete_files(table_data_files)
 			else:
-				print(f'Table({table_name}): {table_history.last_filehash} != {current_filehash}')
+				logger.info(f'Table({table_name}): {table_history.last_filehash} != {current_filehash}')
 				table_history.last_filehash = current_filehash
 
-		# update table history with new last timestamp value
+				# move changed batch files into package
+				for file_name in batch_writer.file_names + batch_writer.lob_file_names:
+					self.package.write(file_name)
+				delete_files(table_data_files)
+
+		# update table history with new last timestamp (and rowversion high-water mark) value
 		table_history.last_timestamp = current_timestamp
+		if table_object.cdc == 'rowversion':
+			table_history.last_rowversion = self.current_rowversion
 
 		# track total row count and file size across all of a table's batched json files
-		self.stats.stop(table_name, row_count, file_size)
+		self.stats.stop(table_name, row_count, file_size, batch_size)
+		table_history.track_run_time(self.stats.stats[table_name].run_time, row_count)
 
 		# save interim state of stats for diagnostics
 		self.stats.save()
 
-		self.job_row_count += row_count
-		self.job_file_size += file_size
+		# update job totals under lock since capture workers complete tables concurrently
+		with self.lock:
+			self.job_row_count += row_count
+			self.job_file_size += file_size
+
+		# durably checkpoint table's progress so a failed job can recover vs re-extract this table
+		schema_hash = schema_fingerprint(table_schema)
+		self.checkpoint_table(table_name, table_history, row_count, file_size, batch_size, batch_members, schema_hash)
 
-		# explicitly close cursor when finished
-		# cursor.close()
 		return
 
-	def compress_work_folder(self):
-		"""Compress all files in work_folder to single file in publish_folder."""
+	def extract_window(
+		self, db, table_name, table_object, select_cdc, cdc_window, batch_writer, row_delta=None, column_stats=None,
+		partition_condition='', cursor_name=None
+	):
+		"""
+		Extract a cdc window's rows to batch_writer with table's optional query_timeout (secs).
+		When a query times out before any rows are fetched, its timestamp window is split in half and
+		each half extracted in turn, recursively down to a minimum window of min_window_minutes.
+		Partitions extract their partition_condition's rows of each window via a cursor_name cursor.
+		"""
+		current_timestamp, last_timestamp, current_rowversion, last_rowversion = cdc_window
+		query_timeout = int(table_object.query_timeout or 0)
+		sql = select_cdc.select(self.job_id, *cdc_window, partition_condition=partition_condition)
 
-		# setup
-		self.stats.start('compress', 'step')
+		# logger.info(f'Capture SQL:\n{sql}\n')
+
+		# create a fresh cursor for each query; rows fetched so far detect timeouts after rows were written
+		# Note: Copy requires a standard (client side) cursor.
+		db.set_query_timeout(query_timeout)
+		cursor = db.capture_cursor() if batch_writer.is_copy else self.capture_cursor(db, cursor_name or table_name)
+		row_count = row_delta.row_count if row_delta else batch_writer.row_count
+		try:
+			if batch_writer.is_copy:
+				batch_writer.write_copy(cursor, sql)
+			else:
+				cursor.execute(sql)
+				rows = column_stats.observe(cursor) if column_stats else cursor
+				batch_writer.write_rows(row_delta.filter(rows) if row_delta else rows)
+		except Exception as e:
+			with contextlib.suppress(Exception):
+				cursor.close()
+			if not query_timeout or not db.is_query_timeout(e):
+				raise
+
+			# a timed out query leaves connection ready for next query
+			db.reset_query()
+			self.stats.increment(table_name, 'timeout_count')
+			logger.info(f'Table({table_name}): query timeout ({query_timeout} secs) for {last_timestamp} - {current_timestamp}')
+
+			# split window unless rows were already written, window has no timestamp range, or window is at minimum
+			# Note: Windows are split on second boundaries.
+			min_window = datetime.timedelta(minutes=float(table_object.min_window_minutes or 60))
+			window = current_timestamp - last_timestamp
+			is_fetched = (row_delta.row_count if row_delta else batch_writer.row_count) > row_count
+			if is_fetched or not table_object.timestamp or table_object.cdc == 'rowversion' or window / 2 < min_window:
+				raise
+
+			middle_timestamp = (last_timestamp + window / 2).replace(microsecond=0)
+			self.stats.increment(table_name, 'split_count')
+			logger.info(f'Table({table_name}): splitting window at {middle_timestamp}')
+			for window in ((middle_timestamp, last_timestamp), (current_timestamp, middle_timestamp)):
+				cdc_window = (*window, None, None)
+				self.extract_window(
+					db, table_name, table_object, select_cdc, cdc_window, batch_writer, row_delta, column_stats,
+					partition_condition, cursor_name
+				)
+			return
+
+		# explicitly close cursor when finished; releases server side cursor resources
+		cursor.close()
+
+	def schedule_tables(self, job_history, capture_workers):
+		"""
+		Return (tables, predicted run time) with tables ordered longest expected run time first to minimize
+		job run time across capture workers; tables without run time history (eg. new tables) are scheduled first.
+		Sequential (capture_workers=1) jobs keep table config order.
+		"""
+		tables = list(self.table_config.sections.items())
+		run_times = {table_name: job_history.get_table_history(table_name).run_time for table_name, _ in tables}
+		if capture_workers > 1:
+			tables.sort(key=lambda table: (run_times[table[0]] is not None, -(run_times[table[0]] or 0)))
+
+		known_run_times = [run_times[table_name] for table_name, _ in tables if run_times[table_name] is not None]
+		predicted_run_time = predict_run_time(known_run_times, capture_workers)
+		unknown_count = len(tables) - len(known_run_times)
+		logger.info(
+			f'Extract predicted run time {predicted_run_time:,.1f} secs using {capture_workers} capture workers '
+			f'({unknown_count} tables without run time history)'
+		)
+		return tables, predicted_run_time
+
+	def checkpoint_table(self, table_name, table_history, row_count, file_size, batch_size, batch_members, schema_hash=''):
+		"""
+		Move a completed table's table, schema, pk, delta, and stats files into package, add table to package manifest,
+		then checkpoint table and its members. batch_members is a dict of batch member names and row counts.
+		"""
+		member_row_counts = dict(batch_members)
+		for file_ext in ('table', 'schema', 'pk', 'delta', 'stats'):
+			file_name = pathlib.Path(f'{self.work_folder_name}/{table_name}.{file_ext}')
+			if file_name.exists():
+				self.package.write(file_name)
+				delete_file(file_name)
+				member_row_counts[file_name.name] = None
+
+		members = list()
+		for member_name, member_row_count in member_row_counts.items():
+			member = self.package.member_record(member_name)
+			member['row_count'] = member_row_count
+			members.append(member)
+
+		with self.lock:
+			self.manifest_tables[table_name] = dict(
+				schema_hash=schema_hash, row_count=row_count, file_size=file_size, members=list(member_row_counts)
+			)
+		self.checkpoint.save(self.job_id, table_history, row_count, file_size, batch_size, members, schema_hash)
+
+	def recover_table(self, table_name, table_history, table_checkpoint):
+		"""
+		Recover a table checkpointed by a failed run of this job from its partial package vs re-extracting it.
+		Returns False if table's checkpointed members can't be recovered.
+		"""
+		if not self.recover_file_name:
+			return False
+
+		# members are read once; all are verified before any are added to package
+		members = table_checkpoint['members']
+		logger.info(f'Table({table_name}): recovering {len(members)} checkpointed package members')
+		self.stats.start(table_name, 'table')
+		try:
+			self.package.recover_members(self.recover_file_name, members)
+		except (OSError, ValueError) as e:
+			logger.info(f'Table({table_name}): checkpoint not recoverable ({e}); re-extracting')
+			return False
+
+		table_history.last_timestamp = table_checkpoint['last_timestamp']
+		table_history.last_rowversion = table_checkpoint['last_rowversion']
+		table_history.last_filehash = table_checkpoint['last_filehash']
+
+		row_count = table_checkpoint['row_count']
+		file_size = table_checkpoint['file_size']
+		batch_size = table_checkpoint['batch_size']
+		self.stats.stop(table_name, row_count, file_size, batch_size)
+		self.stats.save()
+		with self.lock:
+			self.job_row_count += row_count
+			self.job_file_size += file_size
+
+		# failed run's smoothed run time of its extract vs this run's (much shorter) recovery time
+		run_time = table_checkpoint.get('run_time')
+		if run_time is None:
+			table_history.track_run_time(self.stats.stats[table_name].run_time, row_count)
+		else:
+			table_history.run_time = run_time
+			table_history.row_count = row_count
+
+		# re-checkpoint with table's member locations in this run's package
+		batch_members = {member['member_name']: member.get('row_count') for member in members}
+		schema_hash = table_checkpoint['schema_hash']
+		self.checkpoint_table(table_name, table_history, row_count, file_size, batch_size, batch_members, schema_hash)
+		return True
+
+	@staticmethod
+	def has_changes(db_engine, select_cdc, cdc_window):
+		"""Return False if a table's cdc window has no rows; tables without a cdc window always have changes."""
+		sql = select_cdc.select_probe(*cdc_window)
+		if not sql:
+			return True
+
+		db_engine.log('select_probe', sql)
+		db_engine.cursor.execute(sql)
+		return bool(db_engine.cursor.fetchone()[0])
+
+	def batch_writer(self, table_name, table_schema, batch_size, package=None, hash_method_name=None, batch_numbers=None,
+	                 is_row_hash=False, is_copy=False):
+		"""
+		Return a batch writer for project's batch format and adaptive batch sizing options.
+		Rows of row delta tables (is_row_hash) include an extra udp_rowhash column.
+		Copy writers (is_copy) write postgresql copy text format batches regardless of batch format.
+		"""
+		batch_bytes = int(self.project.batch_bytes or 0)
+		memory_limit = int(self.project.memory_limit or 0)
+		if is_copy:
+			return CopyBatchWriter(
+				self.work_folder_name, table_name, batch_size, package, hash_method_name, batch_numbers,
+				batch_bytes, memory_limit
+			)
+		elif self.project.batch_format == 'columnar':
+			extended_columns = [('udp_job', 'int'), ('udp_timestamp', 'datetime')]
+			if is_row_hash:
+				extended_columns.append(('udp_rowhash', 'int'))
+			columns = table_columns(table_schema, extended_columns)
+			return ColumnarBatchWriter(
+				self.work_folder_name, table_name, batch_size, columns, package, hash_method_name, batch_numbers,
+				batch_bytes, memory_limit
+			)
+		else:
+			# optionally stream large object column values to batch sidecar files
+			return BatchWriter(
+				self.work_folder_name, table_name, batch_size, package, hash_method_name, batch_numbers,
+				batch_bytes, memory_limit, getattr(table_schema, 'lob_columns', None)
+			)
+
+	@staticmethod
+	def partition_column(table_name, table_object, pk_columns, table_schema=None):
+		"""
+		Return column to partition a table's extraction by or '' if table is extracted via a single select.
+		Columns whose data types can't be split into ranges (eg. uniqueidentifier) aren't partitioned.
+		"""
+		if int(table_object.partitions or 1) < 2:
+			return ''
+
+		# explicit partition key, single column pk, or first timestamp column
+		pk_columns = [column_name for column_name in split(pk_columns or '') if column_name]
+		timestamp_columns = [column_name for column_name in split(table_object.timestamp) if column_name]
+		if table_object.partition_key:
+			partition_column = table_object.partition_key
+		elif len(pk_columns) == 1:
+			partition_column = pk_columns[0]
+		elif timestamp_columns:
+			partition_column = timestamp_columns[0]
+		else:
+			logger.info(f'Warning: {table_name} partitions={table_object.partitions} but no partition key column')
+			return ''
+
+		# skip range probe (and partition connections) for key types partition boundaries can't split
+		column_name = partition_column.replace('"', '').rpartition('.')[2].lower()
+		columns = {name.lower(): column for name, column in table_schema.columns.items()} if table_schema else dict()
+		if column_name in columns and not cdc_select.is_partition_type(columns[column_name].data_type):
+			logger.info(
+				f'Warning: {table_name} partition column {partition_column} ({columns[column_name].data_type}) '
+				f'not partitionable; using a single select'
+			)
+			return ''
+		return partition_column
+
+	def extract_partitions(self, db_engine, table_name, table_object, table_schema, select_cdc, cdc_window, partition_column, partitions,
+	                       batch_size, package, column_stats=None, is_copy=False):
+		"""
+		Extract a table's CDC window as concurrent partition_column sub-ranges; returns partitions' batch writers.
+		Partitions' column statistics are merged into column_stats. Returns None if the window's range can't be split
+		(eg. no rows or a single key value) so caller extracts it via a single select on its own connection.
+		"""
+
+		# split partition column's min/max range within CDC window into partition sub-ranges
+		sql = select_cdc.select_range(partition_column, *cdc_window)
+		db_engine.log('select_range', sql)
+		db_engine.cursor.execute(sql)
+		min_value, max_value = db_engine.cursor.fetchone()
+		boundaries = cdc_select.partition_boundaries(min_value, max_value, partitions)
+		if not boundaries:
+			logger.info(
+				f'Table({table_name}): {partition_column} range ({min_value} - {max_value}) not split; using a single select'
+			)
+			return None
+
+		conditions = cdc_select.partition_conditions(partition_column, boundaries)
+		logger.info(f'Table({table_name}): {len(conditions)} partition(s) on {partition_column} ({min_value} - {max_value})')
+
+		# partitions share a batch number sequence so output is a single set of <table>#NNNN batch files
+		batch_numbers = itertools.count(1)
+		batch_writers = [
+			self.batch_writer(table_name, table_schema, batch_size, package, batch_numbers=batch_numbers, is_copy=is_copy)
+			for _ in conditions
+		]
+		partition_stats = [
+			ColumnStats(table_schema.columns, column_stats.is_distinct) if column_stats else None for _ in conditions
+		]
+		with concurrent.futures.ThreadPoolExecutor(len(conditions), thread_name_prefix='partition') as executor:
+			futures = list()
+			for partition_number, (condition, batch_writer) in enumerate(zip(conditions, batch_writers), 1):
+				# select builders hold a select's cdc state so each partition renders its (split) windows with its own
+				futures.append(executor.submit(
+					self.extract_partition, table_name, table_object, partition_number, copy.copy(select_cdc), cdc_window,
+					condition, batch_writer, partition_stats[partition_number - 1]
+				))
+
+			try:
+				for future in concurrent.futures.as_completed(futures):
+					future.result()
+			except Exception:
+				executor.shutdown(wait=False, cancel_futures=True)
+				raise
+
+		if column_stats:
+			for stats in partition_stats:
+				column_stats.merge(stats)
+
+		return batch_writers
+
+	def extract_partition(self, table_name, table_object, partition_number, select_cdc, cdc_window, partition_condition,
+	                      batch_writer, column_stats=None):
+		"""Extract a single partition over its own source connection with table's query timeout and window splitting."""
+		db, db_engine = self.connect()
+		try:
+			with batch_writer:
+				self.extract_window(
+					db, table_name, table_object, select_cdc, cdc_window, batch_writer, column_stats=column_stats,
+					partition_condition=partition_condition, cursor_name=f'{table_name}_{partition_number}'
+				)
+		finally:
+			self.disconnect(db)
+
+	def open_package(self):
+		"""
+		Create publish_folder zip package that batch files stream into during extraction.
+		Package is uploaded to objectstore in parts as it is written unless we're in --notransfer mode.
+		"""
 		self.capture_file_name = f'{self.namespace}#{self.job_id:09}'
-		self.zip_file_name = f'{self.publish_folder_name}/{self.capture_file_name}'
+		self.zip_file_name = f'{self.publish_folder_name}/{self.capture_file_name}.zip'
+
+		self.uploader = None
+		if self.option('notransfer') != '1':
+			# upload overlaps packaging so its stat isn't added to job stats (saved in package) until complete
+			self.upload_stat = Stat('upload', 'step')
+			self.upload_stat.start()
+			cloud_connection = self.connect_config.sections[self.project.cloud]
+			capture_objectstore = Objectstore(self.project.capture_objectstore, cloud_connection)
+			objectstore_file_name = f'{self.namespace}/{self.capture_file_name}.zip'
+			self.uploader = PackageUploader(capture_objectstore, objectstore_file_name)
+
+		self.package = CapturePackage(self.zip_file_name, spool_folder_name=self.work_folder_name, uploader=self.uploader)
+		self.manifest_tables = dict()
+
+	def close_package(self):
+		"""Add remaining work_folder files (job.log) and manifest.json to package and close it."""
+
+		# setup
+		self.stats.start('package', 'step')
 
 		# copy capture_state files to work folder to be included in capture zip package as well
 		copy_file_if_exists(f'{self.state_folder_name}/last_job.log', self.work_folder_name)
 
-		# compress
-		# Note: zip_file_name gets updated by make_archive()
-		self.zip_file_name = shutil.make_archive(self.zip_file_name, format='zip', root_dir=self.work_folder_name)
-
-		# finish
+		# batch files were compressed into the package as they were extracted
+		for file_name in sorted(pathlib.Path(self.work_folder_name).glob('*')):
+			if file_name.is_file():
+				self.package.write(file_name)
+
+		# manifest is package's last member so it can describe all other members
+		manifest = dict(
+			namespace=self.namespace, job_id=self.job_id, tables=self.manifest_tables, members=self.package.member_records()
+		)
+		with self.package.open_member('manifest.json') as output_stream:
+			json.dump(manifest, output_stream, indent=2)
+		self.package.close()
+		self.package = None
+
+		# finish; extract step tracks uncompressed size, package step tracks compressed size
 		zip_file_size = pathlib.Path(self.zip_file_name).stat().st_size
-		self.stats.stop('compress', 0, zip_file_size)
+		self.stats.stop('package', 0, zip_file_size)
 
 	def upload_to_objectstore(self):
-		"""Upload publish_folder's <namespace>-<job_id>.zip to objectstore."""
+		"""Wait for pipelined upload of publish_folder's <namespace>#<job_id>.zip to objectstore to complete."""
 
 		# don't upload captured data if we're in --notransfer mode
-		if self.option('notransfer') == '1':
+		if not self.uploader:
 			return
 
-		# setup
-		self.stats.start('upload', 'step')
-		cloud_connection = self.connect_config.sections[self.project.cloud]
-		capture_objectstore = Objectstore(self.project.capture_objectstore, cloud_connection)
-		objectstore_file_name = f'{self.namespace}/{self.capture_file_name}.zip'
-
-		# upload
-		# capture_objectstore.put(f'{self.publish_folder_name}/{self.capture_file_name}.zip', objectstore_file_name)
-		capture_objectstore.put(self.zip_file_name, objectstore_file_name)
+		# package parts were uploaded as the package was written; confirm final part and complete upload
+		self.uploader.finish()
 
 		# finish
-		zip_file_size = pathlib.Path(self.zip_file_name).stat().st_size
-		self.stats.stop('upload', 0, zip_file_size)
+		self.upload_stat.stop(0, self.uploader.upload_size)
+		self.stats.add(self.upload_stat)
+		self.uploader = None
 
 	def save_recovery_state_file(self):
 
@@ -608,21 +1196,32 @@ class CaptureDaemon(Daemon):
 			self.job_row_count = 0
 			self.job_file_size = 0
 
+			# set by tables with backfill windows remaining; next job runs immediately vs waiting for schedule
+			self.is_pending_work = False
+
 			# create/clear job folders
 			create_folder(self.state_folder_name)
+
+			# tables checkpointed by a failed run of this job are recovered from its partial package
+			self.checkpoint = CaptureCheckpoint(f'{self.state_folder_name}/capture_checkpoint.db')
+			table_checkpoints = self.checkpoint.load(job_id)
+			self.recover_file_name = None
+			partial_file_name = f'{self.publish_folder_name}/{self.namespace}#{job_id:09}.zip'
+			if table_checkpoints and pathlib.Path(partial_file_name).exists():
+				logger.info(f'Recovering {len(table_checkpoints)} checkpointed tables from failed run of job {job_id}')
+				self.recover_file_name = f'{self.state_folder_name}/capture_recover.zip'
+				os.replace(partial_file_name, self.recover_file_name)
+
 			clear_folder(self.work_folder_name)
 			clear_folder(self.publish_folder_name)
 
-			# _connect to source database
-			db = None
-			db_engine = None
-			if self.database.platform == 'postgresql':
-				db = database.PostgreSQL(self.database)
-				db_engine = database.Database('postgresql', db.conn)
+			# batch files stream into publish_folder's zip package as tables are extracted
+			self.open_package()
 
-			elif self.database.platform == 'mssql':
-				db = database.MSSQL(self.database)
-				db_engine = database.Database('mssql', db.conn)
+			# _connect to source database; size connection pool for the job's concurrent connections
+			capture_workers = int(self.project.capture_workers or 1)
+			database.connection_pool(self.database).reserve(self.connection_count(capture_workers))
+			db, db_engine = self.connect()
 
 			# cursor = db.conn.cursor()
 
@@ -631,21 +1230,61 @@ class CaptureDaemon(Daemon):
 			# get current_timestamp() from source database with step back and fast forward logic
 			current_timestamp = self.current_timestamp(db_engine)
 
+			# get current rowversion upper bound for rowversion cdc tables
+			self.current_rowversion = self.current_rowversion_bound(db_engine)
+
+			# discover all table schemas and pks with one catalog query each vs several queries per table
+			self.table_schemas = db_engine.select_schema_table_schemas(self.database.schema)
+			self.table_pks = db_engine.select_schema_table_pks(self.database.schema)
+			logger.info(f'Discovered {len(self.table_schemas)} table schemas in {self.database.schema}')
+
 			# process all tables
 			self.stats.start('extract', 'step')
-			for table_name, table_object in self.table_config.sections.items():
-				table_history = job_history.get_table_history(table_name)
-				self.process_table(db, db_engine, self.database.schema, table_name, table_object, table_history, current_timestamp)
+			tables, predicted_run_time = self.schedule_tables(job_history, capture_workers)
+			if capture_workers <= 1:
+				# extract tables one at a time over our main connection
+				for table_name, table_object in tables:
+					table_history = job_history.get_table_history(table_name)
+					table_checkpoint = table_checkpoints.get(table_name.lower())
+					if table_checkpoint and self.recover_table(table_name, table_history, table_checkpoint):
+						continue
+					self.process_table(db, db_engine, self.database.schema, table_name, table_object, table_history, current_timestamp)
+			else:
+				# extract tables concurrently via a bounded pool of workers, each with its own source connection
+				logger.info(f'Extracting tables using {capture_workers} capture workers')
+				with concurrent.futures.ThreadPoolExecutor(capture_workers, thread_name_prefix='capture') as executor:
+					futures = list()
+					for table_name, table_object in tables:
+						# get table history on main thread since get_table_history() adds new tables to job history
+						table_history = job_history.get_table_history(table_name)
+						table_checkpoint = table_checkpoints.get(table_name.lower())
+						future = executor.submit(
+							self.worker_process_table,
+							self.database.schema, table_name, table_object, table_history, current_timestamp, table_checkpoint
+						)
+						futures.append(future)
+
+					# propagate the first worker exception so job history is not saved for a partial job;
+					# tables not yet started are cancelled vs extracted for a job that will fail
+					try:
+						for future in concurrent.futures.as_completed(futures):
+							future.result()
+					except Exception:
+						executor.shutdown(wait=False, cancel_futures=True)
+						raise
 			self.stats.stop('extract', self.job_row_count, self.job_file_size)
+			extract_run_time = self.stats.stats['extract'].run_time
+			logger.info(f'Extract predicted run time {predicted_run_time:,.1f} secs, actual {extract_run_time:,.1f} secs')
 
-			# save interim job stats to work_folder before compressing this folder
+			# save interim job stats to work_folder before packaging
 			self.stats.stop('capture', self.job_row_count, self.job_file_size)
 			self.stats.save()
 
-			# compress work_folder files to publish_folder zip file
-			self.compress_work_folder()
+			# add remaining work_folder files to publish_folder zip package
+			self.close_package()
 
-			# upload publish_folder zip file
+			# wait for publish_folder zip file's pipelined upload to complete
+			# Note: Job history is only saved after the upload is confirmed complete.
 			self.upload_to_objectstore()
 
 			# save final stats for complete job run
@@ -653,8 +1292,15 @@ class CaptureDaemon(Daemon):
 			self.stats.save(f'{self.state_folder_name}/last_job.log')
 			self.stats.save()
 
-			# update job_id and table histories
+			# update job_id and table histories; job's table checkpoints are no longer needed
 			job_history.save()
+			self.checkpoint.clear()
+			if self.recover_file_name:
+				delete_file(self.recover_file_name)
+
+			# commit row delta tables' new row hash indexes now that their deltas are part of a saved job
+			for file_name in pathlib.Path(self.state_folder_name).glob('*.rowhash.pending'):
+				os.replace(file_name, file_name.with_suffix(''))
 
 			# compress capture_state and save to capture objectstore for recovery
 			self.save_recovery_state_file()
@@ -670,9 +1316,23 @@ class CaptureDaemon(Daemon):
 			raise
 
 		finally:
-			# explicitly close database connection when finished with job
-			with contextlib.suppress(Exception):
-				db.conn.close()
+			# return database connections to pool when finished with job
+			self.disconnect(db)
+			self.close_worker_connections()
+			if self.checkpoint:
+				with contextlib.suppress(Exception):
+					self.checkpoint.close()
+				self.checkpoint = None
+
+			# release an incomplete package's file handle and discard its partial upload
+			if self.package:
+				with contextlib.suppress(Exception):
+					self.package.close()
+				self.package = None
+			if self.uploader:
+				with contextlib.suppress(Exception):
+					self.uploader.abort()
+				self.uploader = None
 
 
 # test
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+capture_checkpoint.py
+
+Crash-safe, per-table checkpoints of a capture job's progress.
+
+Job history (capture.job) is only saved once a job's package has been uploaded. Each table's progress is
+checkpointed here as soon as the table finishes: its high-water marks (last_timestamp, last_rowversion,
+last_filehash), its stats and run time, and the package members holding its batch, table, schema, and pk files.
+
+When a job fails, its job_id is re-used by the next run. That run restores checkpointed tables' history and
+recovers their members from the failed run's partial package instead of re-querying the source database.
+
+Checkpoints are stored in a SQLite database (WAL journal, synchronous commits); each table's checkpoint
+is committed as its own transaction. Checkpoints are cleared once a job's history has been saved.
+
+Usage:
+checkpoint = CaptureCheckpoint(f'{state_folder_name}/capture_checkpoint.db')
+table_checkpoints = checkpoint.load(job_id)
+checkpoint.save(job_id, table_history, row_count, file_size, batch_size, members)
+checkpoint.clear()
+checkpoint.close()
+"""
+
+
+# standard lib
+import datetime
+import json
+import logging
+import sqlite3
+import threading
+
+
+# module level logger
+logger = logging.getLogger(__name__)
+
+
+class CaptureCheckpoint:
+
+	"""SQLite store of a capture job's completed tables; thread safe."""
+
+	def __init__(self, file_name):
+		self.file_name = str(file_name)
+
+		# capture workers checkpoint tables concurrently over a shared connection
+		self.lock = threading.Lock()
+
+		self.conn = sqlite3.connect(self.file_name, check_same_thread=False)
+		self.conn.execute('pragma journal_mode=wal')
+		self.conn.execute('pragma synchronous=full')
+		with self.conn:
+			self.conn.execute(
+				'create table if not exists table_checkpoint ('
+				'job_id integer not null, table_name text not null, '
+				'last_timestamp text, last_rowversion text, last_filehash text, '
+				'row_count integer, file_size integer, batch_size integer, members text, schema_hash text, '
+				'run_time real, primary key (job_id, table_name))'
+			)
+
+			# checkpoint files left by a failed run of an earlier version lack newer columns
+			column_names = {row[1] for row in self.conn.execute('pragma table_info(table_checkpoint)')}
+			if 'run_time' not in column_names:
+				self.conn.execute('alter table table_checkpoint add column run_time real')
+
+	def load(self, job_id):
+		"""Return dict of job's checkpointed tables keyed by lowercase table name."""
+		with self.lock:
+			rows = self.conn.execute(
+				'select table_name, last_timestamp, last_rowversion, last_filehash, row_count, file_size, batch_size, '
+				'members, schema_hash, run_time from table_checkpoint where job_id = ?', (job_id,)
+			).fetchall()
+
+		table_checkpoints = dict()
+		for row in rows:
+			(
+				table_name, last_timestamp, last_rowversion, last_filehash, row_count, file_size, batch_size, members,
+				schema_hash, run_time
+			) = row
+			table_checkpoints[table_name] = dict(
+				last_timestamp=datetime.datetime.fromisoformat(last_timestamp) if last_timestamp else None,
+				last_rowversion=int(last_rowversion) if last_rowversion else None,
+				last_filehash=last_filehash,
+				row_count=row_count,
+				file_size=file_size,
+				batch_size=batch_size,
+				members=json.loads(members),
+				schema_hash=schema_hash,
+				run_time=run_time
+			)
+		return table_checkpoints
+
+	def save(self, job_id, table_history, row_count, file_size, batch_size, members, schema_hash=''):
+		"""Commit a completed table's history (including its run time), stats, and package members (list of member dicts)."""
+		last_timestamp = table_history.last_timestamp.isoformat() if table_history.last_timestamp else None
+		last_rowversion = str(table_history.last_rowversion) if table_history.last_rowversion is not None else None
+		with self.lock, self.conn:
+			self.conn.execute(
+				'insert or replace into table_checkpoint (job_id, table_name, last_timestamp, last_rowversion, last_filehash, '
+				'row_count, file_size, batch_size, members, schema_hash, run_time) values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+				(
+					job_id, table_history.table_name.lower(), last_timestamp, last_rowversion, table_history.last_filehash,
+					row_count, file_size, batch_size, json.dumps(members), schema_hash, getattr(table_history, 'run_time', None)
+				)
+			)
+
+	def clear(self):
+		"""Delete all checkpoints; called once a job's history has been saved."""
+		with self.lock, self.conn:
+			self.conn.execute('delete from table_checkpoint')
+
+	def close(self):
+		with self.lock:
+			self.conn.close()
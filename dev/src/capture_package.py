@@ -0,0 +1,425 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+capture_package.py
+
+Capture package (<namespace>#<job_id>.zip) written incrementally during extraction.
+
+Batch files stream directly into the package as compressed members so capture no longer writes
+uncompressed batches to capture_work and then re-reads them to compress a zip file.
+
+A zip file only supports one member open for writing at a time. The first writer to open a member
+takes the package's writer token and streams directly into the package; concurrent writers (capture
+workers, batch sidecars) spool their member to a temporary file (in memory up to spool_size bytes).
+A spooled member is copied into the package when closed if the package is free, otherwise it's handed
+off to the current writer, which copies pending members into the package when it releases the token.
+The package lock is only held for short metadata updates, never while member data is written, so
+closing a member or adding a file never waits on another member's stream.
+
+Pipelined upload: A package can hand its bytes to a PackageUploader as fixed size parts while it is
+being written so a multipart upload of the package runs concurrently with extraction. The package is
+written as a non-seekable stream (members use data descriptors) so bytes are never rewritten once
+written. Parts pass through a bounded queue; when uploads fall behind, package writes (and therefore
+extraction) block until the uploader catches up.
+
+Usage:
+uploader = PackageUploader(objectstore, object_key)
+package = CapturePackage(zip_file_name, spool_folder_name, uploader=uploader)
+with package.open_member('table#0001.json') as output_stream:
+	output_stream.write(data)
+package.write(work_file_name)
+package.close()
+uploader.finish()
+
+Manifest: member_records() describe all of a package's members, eg. for capture's manifest.json member.
+
+Recovery: member_record() describes a closed member's location in the package file. A failed job's
+checkpointed members can be copied out of its partial (never closed) package via recover_member().
+"""
+
+
+# standard lib
+import collections
+import io
+import logging
+import pathlib
+import queue
+import shutil
+import struct
+import tempfile
+import threading
+import zipfile
+import zlib
+
+
+# module level logger
+logger = logging.getLogger(__name__)
+
+
+# zip local file header signature and size
+local_header_signature = b'PK\x03\x04'
+local_header_size = 30
+
+
+def read_partial_member(file_name, member, chunk_size=1024 * 1024):
+	"""
+	Yield uncompressed chunks of a member (member_record() dict) of a package file that may never have been closed.
+	Raises ValueError if member's local header, size, or CRC don't match package file contents.
+	"""
+	member_name = member['member_name']
+	with open(file_name, 'rb') as input_stream:
+		input_stream.seek(member['header_offset'])
+		header = input_stream.read(local_header_size)
+		if len(header) < local_header_size or header[:4] != local_header_signature:
+			raise ValueError(f'No local header for {member_name} in {file_name}')
+		name_size, extra_size = struct.unpack_from('<HH', header, 26)
+		if input_stream.read(name_size) != member_name.encode('UTF8'):
+			raise ValueError(f'Local header name mismatch for {member_name} in {file_name}')
+		input_stream.seek(extra_size, io.SEEK_CUR)
+
+		decompressor = zlib.decompressobj(-zlib.MAX_WBITS) if member['compress_type'] == zipfile.ZIP_DEFLATED else None
+		crc = 0
+		remaining = member['compress_size']
+		while remaining:
+			data = input_stream.read(min(remaining, chunk_size))
+			if not data:
+				raise ValueError(f'Truncated {member_name} in {file_name}')
+			remaining -= len(data)
+			if decompressor:
+				data = decompressor.decompress(data)
+			crc = zlib.crc32(data, crc)
+			yield data
+
+		if decompressor:
+			data = decompressor.flush()
+			crc = zlib.crc32(data, crc)
+			yield data
+
+	if crc != member['crc']:
+		raise ValueError(f'CRC mismatch for {member_name} in {file_name}')
+
+
+class PackageUploader:
+
+	"""Uploads package parts to objectstore via a multipart upload on a background thread."""
+
+	def __init__(self, objectstore, object_key, part_size=16 * 1024 * 1024, queue_size=4):
+		self.objectstore = objectstore
+		self.object_key = object_key
+
+		# objectstores require all parts but the last to be at least 5MB
+		self.part_size = part_size
+
+		# bounded queue of parts (bytes) to upload; None marks end of package
+		self.parts = queue.Queue(maxsize=queue_size)
+
+		# upload state
+		self.uploaded_parts = list()
+		self.upload_size = 0
+		self.exception = None
+		self.is_finished = False
+
+		self.upload_id = objectstore.create_multipart_upload(object_key)
+		if not self.upload_id:
+			raise RuntimeError(f'Unable to start multipart upload of {object_key}')
+
+		self.thread = threading.Thread(target=self.run, name='upload', daemon=True)
+		self.thread.start()
+
+	def run(self):
+		try:
+			while True:
+				data = self.parts.get()
+				if data is None:
+					break
+
+				part_number = len(self.uploaded_parts) + 1
+				etag = self.objectstore.upload_part(self.object_key, self.upload_id, part_number, data)
+				if not etag:
+					raise RuntimeError(f'Unable to upload part {part_number} of {self.object_key}')
+				self.uploaded_parts.append(dict(PartNumber=part_number, ETag=etag))
+				self.upload_size += len(data)
+
+		except Exception as e:
+			self.exception = e
+			logger.exception(f'Upload of {self.object_key} failed: {e}')
+
+			# keep draining parts so package writers don't block on a full queue
+			while self.parts.get() is not None:
+				pass
+
+	def finish(self):
+		"""Wait for all parts to upload and complete the upload; package must be closed first."""
+		self.thread.join()
+		if self.exception:
+			self.abort()
+			raise self.exception
+
+		if not self.objectstore.complete_multipart_upload(self.object_key, self.upload_id, self.uploaded_parts):
+			self.abort()
+			raise RuntimeError(f'Unable to complete multipart upload of {self.object_key}')
+
+		self.is_finished = True
+		logger.info(f'Uploaded {self.object_key} ({len(self.uploaded_parts)} parts, {self.upload_size:,} bytes)')
+
+	def abort(self):
+		if not self.is_finished:
+			self.is_finished = True
+			self.objectstore.abort_multipart_upload(self.object_key, self.upload_id)
+
+
+class PackageStream:
+
+	"""Non-seekable package output stream that passes written bytes to an uploader as fixed size parts."""
+
+	def __init__(self, file_name, uploader):
+		self.output_stream = open(file_name, 'wb')
+		self.uploader = uploader
+		self.position = 0
+		self.part = bytearray()
+
+	def write(self, data):
+		self.output_stream.write(data)
+		self.position += len(data)
+
+		self.part += data
+		while len(self.part) >= self.uploader.part_size:
+			self.uploader.parts.put(bytes(self.part[:self.uploader.part_size]))
+			del self.part[:self.uploader.part_size]
+		return len(data)
+
+	def tell(self):
+		return self.position
+
+	def flush(self):
+		self.output_stream.flush()
+
+	def close(self):
+		"""Close package file and queue final (partial) part and end of package marker."""
+		self.output_stream.close()
+		if self.part:
+			self.uploader.parts.put(bytes(self.part))
+			self.part = bytearray()
+		self.uploader.parts.put(None)
+
+
+class PackageMember(io.BufferedIOBase):
+
+	"""Binary, write only stream for a single package member."""
+
+	def __init__(self, package, member_name):
+		super().__init__()
+		self.package = package
+		self.member_name = member_name
+
+		# stream directly into package if no other member is being written, otherwise spool until closed
+		if package.acquire_writer(self):
+			self.is_spooled = False
+			try:
+				self.output_stream = package.zip_file.open(member_name, 'w', force_zip64=True)
+			except Exception:
+				package.release_writer()
+				raise
+		else:
+			self.is_spooled = True
+			self.output_stream = package.spool_stream()
+
+	def writable(self):
+		return True
+
+	def write(self, data):
+		return self.output_stream.write(data)
+
+	def close(self):
+		if self.closed:
+			return
+
+		try:
+			if self.is_spooled:
+				self.package.add_member(self.member_name, self.output_stream)
+			else:
+				try:
+					self.output_stream.close()
+				finally:
+					self.package.release_writer()
+		finally:
+			super().close()
+
+
+class CapturePackage:
+
+	"""Zip package of a capture job's files; thread safe."""
+
+	def __init__(self, file_name, spool_folder_name=None, spool_size=64 * 1024 * 1024, uploader=None):
+		self.file_name = str(file_name)
+		self.spool_folder_name = spool_folder_name
+		self.spool_size = spool_size
+
+		# guards zip_file metadata, writer token, and pending members; never held while member data is written
+		self.lock = threading.Lock()
+		self.condition = threading.Condition(self.lock)
+
+		# writer token: member (or package) currently writing to zip_file
+		self.writer = None
+
+		# spooled members (member_name, spool stream) handed off to current writer while zip_file is busy
+		self.pending = collections.deque()
+		self.pending_names = set()
+
+		# package bytes stream to uploader as they are written when uploading is pipelined
+		if uploader:
+			self.output_stream = PackageStream(self.file_name, uploader)
+			output = self.output_stream
+		else:
+			self.output_stream = None
+			output = self.file_name
+		self.zip_file = zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED, allowZip64=True)
+
+	def open_member(self, member_name, mode='w'):
+		"""Return stream for writing member_name; text (mode='w') or binary (mode='wb') output."""
+		output_stream = PackageMember(self, member_name)
+		if 'b' in mode:
+			return output_stream
+		else:
+			return io.TextIOWrapper(output_stream, encoding='UTF8')
+
+	def spool_stream(self):
+		return tempfile.SpooledTemporaryFile(max_size=self.spool_size, dir=self.spool_folder_name)
+
+	def acquire_writer(self, writer):
+		"""Take writer token if zip_file is free; returns False without waiting if another member is writing."""
+		with self.lock:
+			if self.writer is None:
+				self.writer = writer
+				return True
+			return False
+
+	def release_writer(self):
+		"""Copy members handed off while token was held into package, then release writer token."""
+		while True:
+			with self.condition:
+				if not self.pending:
+					self.writer = None
+					self.condition.notify_all()
+					return
+				member_name, input_stream = self.pending.popleft()
+
+			try:
+				self.copy_member(member_name, input_stream)
+			except Exception:
+				# a failed write fails the package; drop remaining pending members so no waiter blocks forever
+				with self.condition:
+					for _, pending_stream in self.pending:
+						pending_stream.close()
+					self.pending.clear()
+					self.pending_names.clear()
+					self.writer = None
+					self.condition.notify_all()
+				raise
+
+			with self.condition:
+				self.pending_names.discard(member_name)
+				self.condition.notify_all()
+
+	def copy_member(self, member_name, input_stream):
+		"""Copy a spooled member into package; caller holds writer token."""
+		try:
+			input_stream.seek(0)
+			with self.zip_file.open(member_name, 'w', force_zip64=True) as output_stream:
+				shutil.copyfileobj(input_stream, output_stream)
+		finally:
+			input_stream.close()
+
+	def add_member(self, member_name, input_stream):
+		"""Copy a spooled member into package now if zip_file is free, otherwise hand it off to current writer."""
+		with self.lock:
+			if self.writer is not None:
+				self.pending.append((member_name, input_stream))
+				self.pending_names.add(member_name)
+				return
+			self.writer = input_stream
+		try:
+			self.copy_member(member_name, input_stream)
+		finally:
+			self.release_writer()
+
+	def member_info(self, member_name):
+		"""Return ZipInfo (file_size and compress_size) for a closed member; waits for handed off members."""
+		with self.condition:
+			self.condition.wait_for(lambda: member_name not in self.pending_names)
+			return self.zip_file.getinfo(member_name)
+
+	def member_record(self, member_name):
+		"""Return dict locating a closed member's compressed bytes in package file, eg. for capture checkpoints."""
+		member_info = self.member_info(member_name)
+		return dict(
+			member_name=member_name,
+			header_offset=member_info.header_offset,
+			compress_size=member_info.compress_size,
+			compress_type=member_info.compress_type,
+			file_size=member_info.file_size,
+			crc=member_info.CRC
+		)
+
+	def member_records(self):
+		"""Return member_record() dicts of all closed members in package order."""
+		with self.lock:
+			member_names = [member_info.filename for member_info in self.zip_file.infolist()]
+		return [self.member_record(member_name) for member_name in member_names]
+
+	def recover_member(self, file_name, member):
+		"""Copy a member (member_record() dict) from a partial package file into this package."""
+		with self.open_member(member['member_name'], 'wb') as output_stream:
+			for data in read_partial_member(file_name, member):
+				output_stream.write(data)
+
+	def recover_members(self, file_name, members):
+		"""
+		Copy members from a partial package file into this package, reading each member once. Members are verified
+		into spools before any are added so a ValueError (or OSError) for one member leaves package unchanged.
+		"""
+		spool_streams = list()
+		try:
+			for member in members:
+				spool_streams.append(self.spool_stream())
+				for data in read_partial_member(file_name, member):
+					spool_streams[-1].write(data)
+		except Exception:
+			for spool_stream in spool_streams:
+				spool_stream.close()
+			raise
+
+		for member, spool_stream in zip(members, spool_streams):
+			self.add_member(member['member_name'], spool_stream)
+
+	def write(self, file_name, member_name=None):
+		"""Add an existing file to package."""
+		if not member_name:
+			member_name = pathlib.Path(file_name).name
+
+		# file is spooled when zip_file is busy since callers may delete file once added
+		if not self.acquire_writer(file_name):
+			spool_stream = self.spool_stream()
+			with open(file_name, 'rb') as input_stream:
+				shutil.copyfileobj(input_stream, spool_stream)
+			self.add_member(member_name, spool_stream)
+			return
+
+		try:
+			self.zip_file.write(file_name, member_name)
+		finally:
+			self.release_writer()
+
+	@property
+	def file_size(self):
+		return pathlib.Path(self.file_name).stat().st_size
+
+	def close(self):
+		with self.condition:
+			self.condition.wait_for(lambda: self.writer is None)
+			self.zip_file.close()
+			if self.output_stream:
+				self.output_stream.close()
+				self.output_stream = None
@@ -13,6 +13,19 @@ table_object.column_names = '*'
 select_cdc = SelectCDC(table_object)
 sql = select_cdc.select(job_id, current_timestamp, last_timestamp)
 
+Rowversion (SQL Server) CDC tables (table_object.cdc = rowversion) filter on a rowversion range vs timestamps:
+sql = select_cdc.select(job_id, current_timestamp, last_timestamp, current_rowversion, last_rowversion)
+Rowversions are ints; parse_rowversion() converts configured first_rowversion values, eg. 0x00000000000007D1.
+
+Partitioned extraction splits a table's CDC select into key range sub-selects:
+sql = select_cdc.select_range(partition_column, current_timestamp, last_timestamp)
+boundaries = partition_boundaries(min_value, max_value, partition_count)
+conditions = partition_conditions(partition_column, boundaries)
+sqls = [select_cdc.select(job_id, current_timestamp, last_timestamp, partition_condition=condition) for ...]
+
+Partition columns must be one of partition_data_types (see is_partition_type()); tables keyed by other types
+(eg. uniqueidentifier, varchar) are extracted via a single select without a min/max probe.
+
 TODO: Add validation to insure we have minimum required components, eg. pk's.
 
 """
@@ -66,6 +79,81 @@ def add_aliases(column_names, table_alias='s'):
 	"""Performs add_alias() on a list of column names."""
 	return [add_alias(column_name, table_alias) for column_name in column_names]
 
+
+# source column data types whose values partition_boundaries() can split
+partition_data_types = {
+	'tinyint', 'smallint', 'int', 'integer', 'bigint', 'smallserial', 'serial', 'bigserial',
+	'date', 'smalldatetime', 'datetime', 'datetime2', 'timestamp', 'timestamp without time zone'
+}
+
+
+def is_partition_type(data_type):
+	"""Return True if a column's data type can be split into partition ranges."""
+	return (data_type or '').lower() in partition_data_types
+
+
+def parse_rowversion(value):
+	"""Return a rowversion as an int from an int, decimal or 0x prefixed hex text, or binary(8) value; blank is 0."""
+	if isinstance(value, int):
+		return value
+	elif isinstance(value, (bytes, bytearray)):
+		return int.from_bytes(value, 'big')
+
+	# SQL Server displays rowversions as 0x prefixed hex, eg. 0x00000000000007D1
+	text = str(value or '').strip()
+	if text.lower().startswith('0x'):
+		return int(text, 16)
+	return int(text or 0)
+
+
+def partition_boundaries(min_value, max_value, partition_count):
+	"""
+	Return sorted list of interior boundary values splitting [min_value, max_value] into partition_count ranges.
+	Supports int, date, and datetime values; returns an empty list (no partitioning) for other types.
+	Datetime boundaries are truncated to whole seconds to match timestamp literal precision.
+	"""
+	if min_value is None or max_value is None or partition_count < 2:
+		return []
+
+	if isinstance(min_value, int) and not isinstance(min_value, bool):
+		step = (max_value - min_value) / partition_count
+		boundaries = [min_value + int(step * index) for index in range(1, partition_count)]
+	elif isinstance(min_value, (datetime.date, datetime.datetime)):
+		# promote dates to datetimes so date ranges can be split within a day
+		if not isinstance(min_value, datetime.datetime):
+			min_value = datetime.datetime.combine(min_value, datetime.time())
+			max_value = datetime.datetime.combine(max_value, datetime.time())
+		step = (max_value - min_value) / partition_count
+		boundaries = [(min_value + step * index).replace(microsecond=0) for index in range(1, partition_count)]
+	else:
+		return []
+
+	# small ranges may produce duplicate boundaries
+	return sorted(set(boundary for boundary in boundaries if min_value < boundary <= max_value))
+
+
+def partition_conditions(partition_column, boundaries):
+	"""
+	Return list of where conditions covering all partition_column values (including nulls) split by boundaries.
+	First partition is unbounded below (and includes nulls); last partition is unbounded above.
+	"""
+	partition_column = add_alias(partition_column, 's')
+	values = []
+	for boundary in boundaries:
+		if isinstance(boundary, datetime.datetime):
+			values.append(f"'{boundary:%Y-%m-%d %H:%M:%S}'")
+		else:
+			values.append(f'{boundary}')
+
+	if not values:
+		return ['']
+
+	conditions = [f'{partition_column} < {values[0]} or {partition_column} is null']
+	for lower_value, upper_value in zip(values, values[1:]):
+		conditions.append(f'{partition_column} >= {lower_value} and {partition_column} < {upper_value}')
+	conditions.append(f'{partition_column} >= {values[-1]}')
+	return conditions
+
 ###
 
 
@@ -262,6 +350,24 @@ class SelectCDC:
 	_  {order_clause}
 	'''
 
+	range_template = '''
+	__select
+	_  min({partition_column}), max({partition_column})
+	_  from "{schema_name}"."{table_name}" as "s"
+	_  {join_clause}
+	_  {where_clause}
+	'''
+
+	probe_template = '''
+	__select
+	_  case when exists (
+	_    select 1
+	_    from "{schema_name}"."{table_name}" as "s"
+	_    {join_clause}
+	_    {where_clause}
+	_  ) then 1 else 0 end
+	'''
+
 	timestamp_where_template = '''
 	__   (
 	_      {timestamp_value} >= '{last_timestamp}' and
@@ -269,15 +375,28 @@ class SelectCDC:
 	_    )
 	'''
 
+	# Note: Rowversion values are compared as binary(8) so predicates remain sargable on indexed rowversion columns;
+	# literals are cast via bigint since large integer literals are numeric, whose binary form is not a rowversion.
+	rowversion_where_template = '''
+	__   (
+	_      {rowversion_column} >= cast(cast({last_rowversion} as bigint) as binary(8)) and
+	_      {rowversion_column} < cast(cast({current_rowversion} as bigint) as binary(8))
+	_    )
+	'''
+
 	def __init__(self, table):
 		# indent template text
 		self.select_template = indent(self.select_template)
+		self.range_template = indent(self.range_template)
+		self.probe_template = indent(self.probe_template)
 		self.timestamp_where_template = indent(self.timestamp_where_template)
+		self.rowversion_where_template = indent(self.rowversion_where_template)
 
 		# object scope properties
 		self.table = table
 		self.timestamp_value = ''
 		self.timestamp_where_condition = ''
+		self.partition_where_condition = ''
 
 	def column_names(self):
 		if self.table.column_names == '*':
@@ -289,7 +408,8 @@ class SelectCDC:
 	# noinspection PyUnusedLocal
 	# Note: last_timestamp referenced in expanded f-string.
 	def timestamp_logic(self, current_timestamp, last_timestamp=None):
-		timestamp_columns = add_aliases(split(self.table.timestamp))
+		# ignore empty entries from blank timestamp values, eg. rowversion cdc tables without timestamps
+		timestamp_columns = add_aliases([column_name for column_name in split(self.table.timestamp) if column_name])
 		if not timestamp_columns:
 			self.timestamp_value = f"'{current_timestamp:%Y-%m-%d %H:%M:%S}'"
 			self.timestamp_where_condition = ''
@@ -304,6 +424,13 @@ class SelectCDC:
 			self.timestamp_value = timestamp_value
 			self.timestamp_where_condition = expand(self.timestamp_where_template)
 
+	# noinspection PyUnusedLocal
+	# Note: current_rowversion and last_rowversion referenced in expanded f-string.
+	def rowversion_logic(self, current_rowversion, last_rowversion):
+		"""Replace timestamp conditions with a [last_rowversion, current_rowversion) range condition."""
+		rowversion_column = add_alias(self.table.rowversion, 's')
+		self.timestamp_where_condition = expand(self.rowversion_where_template)
+
 	def join_clause(self):
 		schema_name = self.table.schema_name
 		join_clause = self.table.join.strip('\\')
@@ -312,14 +439,18 @@ class SelectCDC:
 		return join_clause
 
 	def where_clause(self):
-		if not self.table.where and not self.timestamp_where_condition:
+		conditions = []
+		if self.table.where:
+			conditions.append(f'({self.table.where})')
+		if self.timestamp_where_condition:
+			conditions.append(self.timestamp_where_condition)
+		if self.partition_where_condition:
+			conditions.append(f'({self.partition_where_condition})')
+
+		if not conditions:
 			where_clause = ''
-		elif self.table.where and not self.timestamp_where_condition:
-			where_clause = f'where\n{spaces(4)}({self.table.where})'
-		elif not self.table.where and self.timestamp_where_condition:
-			where_clause = f'where\n{spaces(4)}{self.timestamp_where_condition}'
 		else:
-			where_clause = f'where\n{spaces(4)}({self.table.where}) and\n{spaces(4)}{self.timestamp_where_condition}'
+			where_clause = f'where\n{spaces(4)}' + f' and\n{spaces(4)}'.join(conditions)
 		return where_clause
 
 	def order_clause(self):
@@ -330,9 +461,45 @@ class SelectCDC:
 			order_clause = f'order by {", ".join(order_columns)}'
 		return order_clause
 
-	# noinspection PyUnusedLocal
-	def select(self, job_id, current_timestamp, last_timestamp):
+	def cdc_logic(self, current_timestamp, last_timestamp, current_rowversion=None, last_rowversion=None):
 		self.timestamp_logic(current_timestamp, last_timestamp)
+		if self.table.cdc == 'rowversion':
+			self.rowversion_logic(current_rowversion, last_rowversion)
+
+	# noinspection PyUnusedLocal
+	def select_range(self, partition_column, current_timestamp, last_timestamp, current_rowversion=None, last_rowversion=None):
+		"""Return select of partition_column's min and max values within the table's CDC window."""
+		self.cdc_logic(current_timestamp, last_timestamp, current_rowversion, last_rowversion)
+		self.partition_where_condition = ''
+
+		schema_name = self.table.schema_name
+		table_name = self.table.table_name
+		partition_column = add_alias(partition_column, 's')
+		join_clause = self.join_clause()
+		where_clause = self.where_clause()
+		sql = expand(self.range_template)
+		return delete_blank_lines(sql.strip() + ';')
+
+	# noinspection PyUnusedLocal
+	def select_probe(self, current_timestamp, last_timestamp, current_rowversion=None, last_rowversion=None):
+		"""Return select of 1 if any rows exist within table's CDC window, else 0; '' if table has no CDC window."""
+		self.cdc_logic(current_timestamp, last_timestamp, current_rowversion, last_rowversion)
+		self.partition_where_condition = ''
+		if not self.timestamp_where_condition:
+			return ''
+
+		schema_name = self.table.schema_name
+		table_name = self.table.table_name
+		join_clause = self.join_clause()
+		where_clause = self.where_clause()
+		sql = expand(self.probe_template)
+		return delete_blank_lines(sql.strip() + ';')
+
+	# noinspection PyUnusedLocal
+	def select(self, job_id, current_timestamp, last_timestamp, current_rowversion=None, last_rowversion=None,
+	           partition_condition=''):
+		self.cdc_logic(current_timestamp, last_timestamp, current_rowversion, last_rowversion)
+		self.partition_where_condition = partition_condition
 
 		schema_name = self.table.schema_name
 		table_name = self.table.table_name
@@ -153,6 +153,75 @@ class Objectstore(Connect):
 			raise
 
 
+	def create_multipart_upload(self, object_key):
+		"""Start a multipart upload to object_key; returns upload id or None."""
+		logger.info(self._describe('create_multipart_upload', object_key=object_key))
+		try:
+			# parameters(Bucket=, Key=)
+			response = self.client.create_multipart_upload(Bucket=self.objectstore_name, Key=object_key)
+			return response['UploadId']
+
+		# exception handling
+		except ClientError as e:
+			logger.error(e)
+			return None
+		except Exception as e:
+			logger.exception(f'client.create_multipart_upload() failed: {e}')
+			raise
+
+	def upload_part(self, object_key, upload_id, part_number, data):
+		"""Upload part_number (1-based) of a multipart upload; returns part's ETag or None."""
+		logger.debug(self._describe(f'upload_part({part_number})', object_key=object_key))
+		try:
+			# parameters(Bucket=, Key=, UploadId=, PartNumber=, Body=)
+			response = self.client.upload_part(
+				Bucket=self.objectstore_name, Key=object_key, UploadId=upload_id, PartNumber=part_number, Body=data
+			)
+			return response['ETag']
+
+		# exception handling
+		except ClientError as e:
+			logger.error(e)
+			return None
+		except Exception as e:
+			logger.exception(f'client.upload_part() failed: {e}')
+			raise
+
+	def complete_multipart_upload(self, object_key, upload_id, parts):
+		"""Complete a multipart upload from list of dict(PartNumber=, ETag=) parts."""
+		logger.info(self._describe('complete_multipart_upload', object_key=object_key))
+		try:
+			# parameters(Bucket=, Key=, UploadId=, MultipartUpload=)
+			self.client.complete_multipart_upload(
+				Bucket=self.objectstore_name, Key=object_key, UploadId=upload_id, MultipartUpload=dict(Parts=parts)
+			)
+			return True
+
+		# exception handling
+		except ClientError as e:
+			logger.error(e)
+			return False
+		except Exception as e:
+			logger.exception(f'client.complete_multipart_upload() failed: {e}')
+			raise
+
+	def abort_multipart_upload(self, object_key, upload_id):
+		"""Abort a multipart upload, releasing its uploaded parts."""
+		logger.info(self._describe('abort_multipart_upload', object_key=object_key))
+		try:
+			# parameters(Bucket=, Key=, UploadId=)
+			self.client.abort_multipart_upload(Bucket=self.objectstore_name, Key=object_key, UploadId=upload_id)
+			return True
+
+		# exception handling
+		except ClientError as e:
+			logger.error(e)
+			return False
+		except Exception as e:
+			logger.exception(f'client.abort_multipart_upload() failed: {e}')
+			raise
+
+
 class Queue(Connect):
 	"""
 	Abstracted queue class.
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+column_stats.py
+
+Per-column value statistics collected as capture streams a table's rows.
+
+Statistics per column:
+- null_count
+- min_value, max_value (numeric, string, date and datetime values)
+- max_length (string and binary values; characters or bytes)
+- distinct_count: estimate from a k minimum values (KMV) sketch of value hashes; optional (is_distinct) since
+  hashing every value is the costliest statistic and stage doesn't use it to size columns
+
+Capture saves a table's statistics as <table>.stats (json) alongside <table>.schema so stage can size
+target columns and skip type conversion of all-null columns.
+
+Usage:
+column_stats = ColumnStats(column_names, is_distinct=True)
+rows = column_stats.observe(cursor)   # pass-through generator
+...
+column_stats.merge(other_column_stats)
+column_stats.save(file_name)
+"""
+
+
+# standard lib
+import datetime
+import decimal
+import heapq
+import json
+import logging
+
+
+# common lib
+from common import json_serializer
+
+
+# module level logger
+logger = logging.getLogger(__name__)
+
+
+# value types with meaningful (json serializable) min/max values
+ordered_types = (int, float, decimal.Decimal, str, datetime.date)
+
+# 64-bit hash space
+hash_mask = (1 << 64) - 1
+
+
+def mix_hash(value):
+	"""Return value's hash() scrambled over a uniform 64-bit range (splitmix64 finalizer)."""
+	value = (hash(value) + 0x9E3779B97F4A7C15) & hash_mask
+	value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & hash_mask
+	value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & hash_mask
+	return value ^ (value >> 31)
+
+
+class DistinctSketch:
+
+	"""K minimum values sketch estimating a column's distinct value count."""
+
+	def __init__(self, k=256):
+		self.k = k
+
+		# max heap (negated hashes) of k smallest distinct hashes
+		self.heap = list()
+		self.hashes = set()
+
+	def add(self, value_hash):
+		if value_hash in self.hashes:
+			return
+		if len(self.heap) < self.k:
+			heapq.heappush(self.heap, -value_hash)
+			self.hashes.add(value_hash)
+		elif value_hash < -self.heap[0]:
+			self.hashes.discard(-heapq.heapreplace(self.heap, -value_hash))
+			self.hashes.add(value_hash)
+
+	def merge(self, other):
+		for value_hash in other.hashes:
+			self.add(value_hash)
+
+	@property
+	def distinct_count(self):
+		if len(self.heap) < self.k:
+			# exact when fewer than k distinct values
+			return len(self.heap)
+		return int((self.k - 1) * (1 << 64) / -self.heap[0])
+
+
+class ColumnStat:
+
+	def __init__(self, column_name, is_distinct=False):
+		self.column_name = column_name
+		self.null_count = 0
+		self.min_value = None
+		self.max_value = None
+		self.max_length = None
+		self.sketch = DistinctSketch() if is_distinct else None
+
+	def add(self, value):
+		if value is None:
+			self.null_count += 1
+			return
+
+		if isinstance(value, (str, bytes, bytearray, memoryview)):
+			if self.max_length is None or len(value) > self.max_length:
+				self.max_length = len(value)
+
+		if isinstance(value, ordered_types):
+			if self.min_value is None or value < self.min_value:
+				self.min_value = value
+			if self.max_value is None or value > self.max_value:
+				self.max_value = value
+			if self.sketch:
+				self.sketch.add(mix_hash(value))
+		elif self.sketch and isinstance(value, (bytes, bytearray, memoryview)):
+			self.sketch.add(mix_hash(bytes(value)))
+
+	def merge(self, other):
+		self.null_count += other.null_count
+		for value in (other.min_value, other.max_value):
+			if value is not None:
+				if self.min_value is None or value < self.min_value:
+					self.min_value = value
+				if self.max_value is None or value > self.max_value:
+					self.max_value = value
+		if other.max_length is not None and (self.max_length is None or other.max_length > self.max_length):
+			self.max_length = other.max_length
+		if self.sketch and other.sketch:
+			self.sketch.merge(other.sketch)
+
+	def row(self):
+		"""Return stat as a dict that can be round tripped via JSON."""
+		return dict(
+			null_count=self.null_count,
+			min_value=self.min_value,
+			max_value=self.max_value,
+			max_length=self.max_length,
+			distinct_count=self.sketch.distinct_count if self.sketch else None
+		)
+
+
+class ColumnStats:
+
+	"""
+	Statistics for a table's columns; rows' trailing extended columns (eg. udp_jobid) are ignored.
+	Distinct counts are only estimated when is_distinct is set.
+	"""
+
+	def __init__(self, column_names, is_distinct=False):
+		self.row_count = 0
+		self.is_distinct = is_distinct
+		self.column_stats = [ColumnStat(column_name, is_distinct) for column_name in column_names]
+
+	def observe(self, rows):
+		"""Yield rows unchanged while collecting their column statistics."""
+		column_stats = self.column_stats
+		for row in rows:
+			self.row_count += 1
+			for column_stat, value in zip(column_stats, row):
+				column_stat.add(value)
+			yield row
+
+	def merge(self, other):
+		"""Merge statistics of another set of rows from same table, eg. a partition's rows."""
+		self.row_count += other.row_count
+		for column_stat, other_column_stat in zip(self.column_stats, other.column_stats):
+			column_stat.merge(other_column_stat)
+
+	def save(self, file_name):
+		columns = {column_stat.column_name: column_stat.row() for column_stat in self.column_stats}
+		with open(file_name, 'w') as output_stream:
+			json.dump(dict(row_count=self.row_count, columns=columns), output_stream, indent=2, default=json_serializer)
@@ -0,0 +1,398 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+columnar.py
+
+Columnar, typed binary capture batch format; an optional alternative to json batch files.
+
+Capture writes <table>#NNNN.col batch files when [project].batch_format = columnar.
+Each column's encoding is driven by the table's TableSchema data types so stage can
+load native Python values without per-cell string parsing (eg. arrow.get() on datetimes).
+
+File layout (all integers little-endian):
+- magic: b'UDPC' + format version (1 byte)
+- header: uint32 length + UTF8 json {table_name, row_count, columns: [{column_name, kind, scale}]}
+- one block per column, in header column order:
+  - null bitmap: ceil(row_count / 8) bytes; bit set = null value
+  - uint64 length + column data
+
+Column kinds and data encodings:
+- int: int64 per row (bool values stored as 0/1)
+- float: float64 per row
+- decimal: int64 per row scaled by 10**scale (numeric precision <= 18)
+- datetime: int64 microseconds since 1970-01-01 (naive datetimes; aware values are stored as UTC, dates as midnight)
+- date: int64 proleptic Gregorian ordinal
+- time: int64 microseconds since midnight
+- string: int64 byte length per row + concatenated UTF8 bytes
+- binary: int64 byte length per row + concatenated bytes
+
+Columns whose types can't be encoded natively (eg. timezone aware timestamps, unsized numerics)
+fall back to the string kind. Null values in fixed width kinds are stored as 0.
+
+Note: Columnar batches buffer a batch's column values before writing so keep batch sizes moderate.
+"""
+
+
+# standard lib
+import array
+import datetime
+import decimal
+import json
+import logging
+import struct
+import sys
+
+
+# udp lib
+from batch_writer import BatchWriter
+
+
+# module level logger
+logger = logging.getLogger(__name__)
+
+
+# file format identification
+magic = b'UDPC'
+format_version = 1
+
+# encoding anchors
+epoch = datetime.datetime(1970, 1, 1)
+one_microsecond = datetime.timedelta(microseconds=1)
+
+# source data types (PostgreSQL, SQL Server) by column kind
+int_data_types = {'bigint', 'int', 'integer', 'smallint', 'tinyint', 'bit', 'boolean'}
+float_data_types = {'float', 'real', 'double precision'}
+decimal_data_types = {'decimal', 'numeric'}
+datetime_data_types = {'datetime', 'datetime2', 'smalldatetime', 'timestamp without time zone'}
+date_data_types = {'date'}
+time_data_types = {'time', 'time without time zone'}
+
+# Note: SQL Server's timestamp type is a rowversion (binary) value.
+binary_data_types = {'binary', 'varbinary', 'image', 'timestamp', 'rowversion', 'bytea'}
+
+# scaled decimals must fit in an int64
+max_decimal_precision = 18
+
+
+def column_kind(column):
+	"""Return (kind, scale) encoding for a TableSchema column."""
+	data_type = column.data_type.lower()
+	if data_type in int_data_types:
+		return 'int', 0
+	elif data_type in float_data_types:
+		return 'float', 0
+	elif data_type in decimal_data_types:
+		precision = column.numeric_precision
+		scale = column.numeric_scale
+		if precision and scale is not None and precision <= max_decimal_precision:
+			return 'decimal', int(scale)
+		else:
+			return 'string', 0
+	elif data_type in datetime_data_types:
+		return 'datetime', 0
+	elif data_type in date_data_types:
+		return 'date', 0
+	elif data_type in time_data_types:
+		return 'time', 0
+	elif data_type in binary_data_types:
+		return 'binary', 0
+	else:
+		return 'string', 0
+
+
+def table_columns(table_schema, extended_columns=None):
+	"""
+	Return list of column encodings (dicts) for a table schema plus optional extended (column_name, kind) columns.
+	Use case: Capture's udp_job and udp_timestamp columns appended to every capture select.
+	"""
+	columns = list()
+	for column_name, column in table_schema.columns.items():
+		kind, scale = column_kind(column)
+		columns.append(dict(column_name=column_name, kind=kind, scale=scale))
+
+	if extended_columns:
+		for column_name, kind in extended_columns:
+			columns.append(dict(column_name=column_name, kind=kind, scale=0))
+
+	return columns
+
+
+# encoders ...
+
+
+def _int64_array(values):
+	"""Return values as little-endian int64 bytes."""
+	output = array.array('q', values)
+	if sys.byteorder == 'big':
+		output.byteswap()
+	return output.tobytes()
+
+
+def _float64_array(values):
+	"""Return values as little-endian float64 bytes."""
+	output = array.array('d', values)
+	if sys.byteorder == 'big':
+		output.byteswap()
+	return output.tobytes()
+
+
+def _to_datetime(value):
+	"""Return value as a naive datetime; aware datetimes are normalized to UTC and dates to midnight."""
+	# udp_timestamp is a str literal when a table has no timestamp columns
+	if isinstance(value, str):
+		value = datetime.datetime.fromisoformat(value)
+	elif not isinstance(value, datetime.datetime):
+		return datetime.datetime.combine(value, datetime.time())
+
+	if value.tzinfo is not None and value.utcoffset() is not None:
+		value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+	return value
+
+
+def _to_text(value):
+	if isinstance(value, str):
+		return value
+	elif isinstance(value, (dict, list)):
+		# jsonb values
+		return json.dumps(value)
+	elif isinstance(value, (datetime.date, datetime.time)):
+		return value.isoformat()
+	else:
+		return str(value)
+
+
+def _encode_values(kind, scale, values):
+	"""Return encoded column data for non-null values; nulls are passed in as None."""
+	if kind == 'int':
+		return _int64_array([0 if value is None else int(value) for value in values])
+
+	elif kind == 'float':
+		return _float64_array([0.0 if value is None else float(value) for value in values])
+
+	elif kind == 'decimal':
+		output = []
+		for value in values:
+			if value is None:
+				output.append(0)
+			else:
+				output.append(int(decimal.Decimal(value).scaleb(scale).to_integral_value()))
+		return _int64_array(output)
+
+	elif kind == 'datetime':
+		output = []
+		for value in values:
+			if value is None:
+				output.append(0)
+			else:
+				output.append((_to_datetime(value) - epoch) // one_microsecond)
+		return _int64_array(output)
+
+	elif kind == 'date':
+		return _int64_array([0 if value is None else value.toordinal() for value in values])
+
+	elif kind == 'time':
+		output = []
+		for value in values:
+			if value is None:
+				output.append(0)
+			else:
+				output.append(((value.hour * 60 + value.minute) * 60 + value.second) * 1_000_000 + value.microsecond)
+		return _int64_array(output)
+
+	else:
+		# string and binary kinds: lengths followed by concatenated bytes
+		chunks = []
+		for value in values:
+			if value is None:
+				chunks.append(b'')
+			elif kind == 'binary':
+				chunks.append(bytes(value))
+			else:
+				chunks.append(_to_text(value).encode('UTF8'))
+		return _int64_array([len(chunk) for chunk in chunks]) + b''.join(chunks)
+
+
+def _null_bitmap(values):
+	bitmap = bytearray((len(values) + 7) // 8)
+	for index, value in enumerate(values):
+		if value is None:
+			bitmap[index >> 3] |= 1 << (index & 7)
+	return bytes(bitmap)
+
+
+def encode_column(kind, scale, values):
+	"""Return a column block: null bitmap + uint64 length + encoded column data."""
+	data = _encode_values(kind, scale, values)
+	return _null_bitmap(values) + struct.pack('<Q', len(data)) + data
+
+
+# decoders ...
+
+
+def _read_int64_array(data, row_count):
+	values = array.array('q')
+	values.frombytes(data[:row_count * 8])
+	if sys.byteorder == 'big':
+		values.byteswap()
+	return values.tolist()
+
+
+def _read_float64_array(data, row_count):
+	values = array.array('d')
+	values.frombytes(data[:row_count * 8])
+	if sys.byteorder == 'big':
+		values.byteswap()
+	return values.tolist()
+
+
+def _decode_values(kind, scale, data, row_count):
+	"""Return list of column values from encoded column data; null positions are reset by caller."""
+	if kind == 'int':
+		return _read_int64_array(data, row_count)
+
+	elif kind == 'float':
+		return _read_float64_array(data, row_count)
+
+	elif kind == 'decimal':
+		return [decimal.Decimal(value).scaleb(-scale) for value in _read_int64_array(data, row_count)]
+
+	elif kind == 'datetime':
+		return [epoch + datetime.timedelta(microseconds=value) for value in _read_int64_array(data, row_count)]
+
+	elif kind == 'date':
+		return [datetime.date.fromordinal(value) if value else None for value in _read_int64_array(data, row_count)]
+
+	elif kind == 'time':
+		output = []
+		for value in _read_int64_array(data, row_count):
+			seconds, microseconds = divmod(value, 1_000_000)
+			minutes, seconds = divmod(seconds, 60)
+			hours, minutes = divmod(minutes, 60)
+			output.append(datetime.time(hours, minutes, seconds, microseconds))
+		return output
+
+	else:
+		lengths = _read_int64_array(data, row_count)
+		output = []
+		offset = row_count * 8
+		for length in lengths:
+			chunk = data[offset:offset + length]
+			offset += length
+			if kind == 'binary':
+				output.append(bytes(chunk))
+			else:
+				output.append(str(chunk, 'UTF8'))
+		return output
+
+
+def decode_column(kind, scale, block, row_count):
+	"""Decode a column block returning (column values, bytes consumed)."""
+	bitmap_size = (row_count + 7) // 8
+	bitmap = block[:bitmap_size]
+	data_size = struct.unpack_from('<Q', block, bitmap_size)[0]
+	data_offset = bitmap_size + 8
+	values = _decode_values(kind, scale, block[data_offset:data_offset + data_size], row_count)
+
+	# restore null values
+	for byte_index, byte in enumerate(bitmap):
+		if byte:
+			for bit in range(8):
+				if byte & (1 << bit):
+					values[byte_index * 8 + bit] = None
+
+	return values, data_offset + data_size
+
+
+def load_columnar(file_name):
+	"""Return (header, rows) from a columnar batch file; rows are lists of native Python values."""
+	with open(file_name, 'rb') as input_stream:
+		data = memoryview(input_stream.read())
+
+	if bytes(data[:4]) != magic:
+		raise ValueError(f'Not a columnar batch file ({file_name})')
+	version = data[4]
+	if version != format_version:
+		raise ValueError(f'Unsupported columnar batch version ({version}) in {file_name}')
+
+	header_size = struct.unpack_from('<I', data, 5)[0]
+	offset = 9
+	header = json.loads(str(data[offset:offset + header_size], 'UTF8'))
+	offset += header_size
+
+	row_count = header['row_count']
+	columns = []
+	for column in header['columns']:
+		values, block_size = decode_column(column['kind'], column['scale'], data[offset:], row_count)
+		columns.append(values)
+		offset += block_size
+
+	rows = [list(row) for row in zip(*columns)]
+	return header, rows
+
+
+class ColumnarBatchWriter(BatchWriter):
+
+	"""Buffers a batch's values by column, then writes each batch as a <table>#NNNN.col file."""
+
+	file_ext = 'col'
+
+	def __init__(self, folder_name, table_name, batch_size, columns, package=None, hash_method_name=None, batch_numbers=None,
+	             batch_bytes=0, memory_limit=0):
+		super().__init__(
+			folder_name, table_name, batch_size, package, hash_method_name, batch_numbers, batch_bytes, memory_limit
+		)
+		self.columns = columns
+		self.column_values = None
+
+	def open_batch(self):
+		"""Start the next batch; batch files are written when a batch is closed."""
+		self.batch_number = self.next_batch_number()
+		self.batch_row_count = 0
+		self.batch_file_size = 0
+		self.file_names.append(self.batch_file_name(self.batch_number))
+		logger.info(f'Table({self.table_name}): batch={self.batch_number} using batch size {self.batch_size:,}')
+		self.column_values = [list() for _ in self.columns]
+
+	def close_batch(self):
+		"""Encode buffered column values to the current batch file and track its size."""
+		header = dict(table_name=self.table_name, row_count=self.batch_row_count, columns=self.columns)
+		header = json.dumps(header).encode('UTF8')
+
+		self.open_output(self.file_names[-1])
+		self.write_output(magic + bytes([format_version]))
+		self.write_output(struct.pack('<I', len(header)))
+		self.write_output(header)
+		for column, values in zip(self.columns, self.column_values):
+			self.write_output(encode_column(column['kind'], column['scale'], values))
+		self.close_output()
+		self.column_values = None
+
+	def write(self, row):
+		"""Buffer row's values by column."""
+		if self.column_values is None:
+			self.open_batch()
+
+		for values, value in zip(self.column_values, row):
+			values.append(value)
+
+		self.batch_row_count += 1
+		self.row_count += 1
+		if self.batch_row_count >= self.batch_size:
+			self.close_batch()
+		elif self.batch_row_count % self.sample_rows == 0 and (self.memory_limit or not self.is_batch_size_sampled):
+			self.adapt_batch_size()
+
+	def sample_row_size(self):
+		"""Return average encoded bytes per row of buffered column values."""
+		row_count = max(self.batch_row_count, 1)
+		sample_size = 0
+		for column, values in zip(self.columns, self.column_values):
+			sample_size += len(encode_column(column['kind'], column['scale'], values))
+		return sample_size / row_count
+
+	def close(self):
+		"""Write last (partial) batch file."""
+		if self.column_values is not None:
+			self.close_batch()
@@ -291,7 +291,8 @@ def hash_str(text, hash_method_name=None):
 	hash_method = getattr(hashlib, hash_method_name)()
 
 	# hashes only operate on bytestrings; .encode() without an encoding parm converts to bytestring
-	return hash_method(text.encode()).hexdigest()
+	hash_method.update(text.encode())
+	return hash_method.hexdigest()
 
 
 def hash_file(file_name, hash_method_name=None):
@@ -304,10 +305,11 @@ def hash_file(file_name, hash_method_name=None):
 	# get hash method pointer
 	hash_method = getattr(hashlib, hash_method_name)()
 
-	# open file as binary since hashes only operate on bytestrings
+	# open file as binary since hashes only operate on bytestrings; read in blocks vs loading entire file
 	with open(file_name, 'rb') as input_stream:
-		hash_value = hash_method(input_stream.read()).hexdigest()
-	return hash_value
+		for data in iter(lambda: input_stream.read(1024 * 1024), b''):
+			hash_method.update(data)
+	return hash_method.hexdigest()
 
 
 def hash_files(glob_pattern, hash_method_name=None):
@@ -690,7 +692,7 @@ def script_path():
 # serializer operations ...
 
 
-def _json_serializer(obj):
+def json_serializer(obj):
 	"""Json serializer for objects not serializable by default json module."""
 	if isinstance(obj, (datetime.datetime, datetime.date)):
 		return obj.isoformat()
@@ -706,7 +708,7 @@ def export_json(file_name, obj):
 	Use case: Export data for one-way data exchange with databases, APIs, and Javascript libraries.
 	"""
 	with open(file_name, 'w') as output_stream:
-		json.dump(obj, output_stream, indent=2, default=_json_serializer)
+		json.dump(obj, output_stream, indent=2, default=json_serializer)
 
 
 def load_jsonpickle(file_name):
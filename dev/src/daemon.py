@@ -23,7 +23,9 @@ from common import script_name
 # udp class
 from config import ConfigSectionKey
 from option import Option
+from schedule import CommandFileSchedule
 from schedule import Schedule
+from sql_log import statement_log
 
 
 # module level logger
@@ -32,6 +34,10 @@ logger = logging.getLogger(__name__)
 
 class Daemon:
 
+	# daemons that query databases record statement metrics to <script>_sql.log and poll <script>.command for the
+	# 'sql' command that logs their aggregate (see CommandFileSchedule)
+	is_sql_logged = False
+
 	def __init__(self, project_file):
 		self.config = None
 		self.option = None
@@ -42,6 +48,9 @@ class Daemon:
 		self.database = None
 		self.schedule = None
 
+		# main() sets when it has more work ready (eg. capture backfill windows) so next run skips schedule wait
+		self.is_pending_work = False
+
 		# project file controls configuration
 		self.project_file = project_file
 
@@ -70,6 +79,10 @@ class Daemon:
 		log_setup(log_file_name=f'../sessions/{script_name()}.log')
 		log_session_info()
 
+		# per-statement sql metrics; aggregate is logged by the 'sql' command (see CommandFileSchedule)
+		if self.is_sql_logged:
+			statement_log.setup(f'../sessions/{script_name()}_sql.log')
+
 		self.setup(*args, **kwargs)
 		self.start()
 
@@ -86,7 +99,10 @@ class Daemon:
 
 			# standard wait for scheduled time slot and run logic
 			while True:
-				if self.schedule.wait():
+				if self.is_pending_work and not self.schedule.is_stopped():
+					logger.info('Pending work: executing immediately')
+					self.main()
+				elif self.schedule.wait():
 					self.main()
 				else:
 					break
@@ -122,8 +138,11 @@ class Daemon:
 		environ_var = just_file_stem(self.project_file).lower()
 		self.option = Option(environ_var, options=config('project').options)
 
-		# load project specific schedule
-		self.schedule = Schedule(config('schedule'))
+		# load project specific schedule; sql logged daemons poll <script>.command file for commands, eg. stop, sql
+		if self.is_sql_logged:
+			self.schedule = CommandFileSchedule(config('schedule'))
+		else:
+			self.schedule = Schedule(config('schedule'))
 
 		# diagnostics
 		self.option.dump()
@@ -15,18 +15,27 @@ Database platform specific SQL logic in <database>.sql files.
 
 FUTURE:
 - Make cursor and version code more generic.
-- Wrap cursor.execute() to use a generic parameter syntax and optionally log generated SQL and execution times.
+- Wrap cursor.execute() to use a generic parameter syntax.
+
+Cursors created by Database and Connection.capture_cursor() are TimedCursors recording each statement's
+execution metrics to sql_log.statement_log.
 - Read property objects to load server, database, etc properties.
 - Only expose a high level cursor, fetchone|many|all, executemany() ???
 """
 
 # standard lib
+import ast
+import builtins
+import collections
+import contextlib
+import datetime
 import logging
 import pickle
+import threading
+import time
 
 
 # common lib
-from common import expand
 from common import log_setup
 from common import log_session_info
 from common import quote
@@ -35,6 +44,9 @@ from common import quote
 # udp classes
 from config import ConfigSection
 from config import ConfigSectionKey
+from sql_log import StatementRecord
+from sql_log import statement_log
+from sql_log import row_size
 
 
 # udp specific lib
@@ -56,6 +68,145 @@ class Object:
 	pass
 
 
+class CopyCounter:
+
+	"""File-like wrapper counting data passed through cursor.copy_expert() in either direction."""
+
+	def __init__(self, file, statement):
+		self.file = file
+		self.statement = statement
+
+	def count(self, data):
+		self.statement.byte_count += len(data)
+		self.statement.row_count += data.count(b'\n' if isinstance(data, bytes) else '\n')
+
+	def write(self, data):
+		self.count(data)
+		return self.file.write(data)
+
+	def read(self, size=-1):
+		data = self.file.read(size)
+		self.count(data)
+		return data
+
+	def readline(self, size=-1):
+		data = self.file.readline(size)
+		self.count(data)
+		return data
+
+
+class TimedCursor:
+
+	"""
+	Instrumented cursor recording each statement's execute time, time to first row, fetch time, rows, and bytes
+	to sql_log.statement_log. A statement is recorded when its rows are exhausted, its cursor executes
+	another statement, or its cursor is closed. Other attributes pass through to the wrapped cursor.
+	"""
+
+	def __init__(self, cursor, command_name=''):
+		# set via __dict__ since other attributes are set on the wrapped cursor
+		self.__dict__.update(cursor=cursor, default_command_name=command_name, command_name='', statement=None)
+
+	def __getattr__(self, name):
+		return getattr(self.cursor, name)
+
+	def __setattr__(self, name, value):
+		if name in self.__dict__:
+			self.__dict__[name] = value
+		else:
+			setattr(self.cursor, name, value)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		self.close()
+
+	def begin(self, sql):
+		"""Record previous statement and start a new statement named by Database.log() or cursor's default name."""
+		self.finish()
+		self.statement = StatementRecord(self.command_name or self.default_command_name, str(sql))
+		self.command_name = ''
+
+	def finish(self):
+		if self.statement:
+			statement_log.record(self.statement)
+			self.statement = None
+
+	def fetched(self, rows, start_time):
+		"""Add fetched rows and time spent fetching them to current statement."""
+		statement = self.statement
+		if not statement:
+			return
+
+		end_time = time.perf_counter()
+		statement.fetch_time += end_time - start_time
+		if rows:
+			if statement.first_row_time is None:
+				statement.first_row_time = end_time - statement.start_time
+			# bytes are estimated from a fetch's first row vs sizing every value of every row
+			statement.row_count += len(rows)
+			statement.byte_count += row_size(rows[0]) * len(rows)
+
+	def execute(self, sql, *args):
+		self.begin(sql)
+		self.cursor.execute(sql, *args)
+		self.statement.execute_time = time.perf_counter() - self.statement.start_time
+		return self
+
+	def executemany(self, sql, params):
+		self.begin(sql)
+		result = self.cursor.executemany(sql, params)
+		self.statement.execute_time = time.perf_counter() - self.statement.start_time
+		if isinstance(params, (list, tuple)):
+			self.statement.row_count = len(params)
+		self.finish()
+		return result
+
+	def copy_expert(self, sql, file, *args):
+		self.begin(sql)
+		result = self.cursor.copy_expert(sql, CopyCounter(file, self.statement), *args)
+		self.statement.execute_time = time.perf_counter() - self.statement.start_time
+		self.finish()
+		return result
+
+	def fetchone(self):
+		start_time = time.perf_counter()
+		row = self.cursor.fetchone()
+		self.fetched([row] if row is not None else [], start_time)
+		if row is None:
+			self.finish()
+		return row
+
+	def fetchmany(self, *args):
+		start_time = time.perf_counter()
+		rows = self.cursor.fetchmany(*args)
+		self.fetched(rows, start_time)
+		if not rows:
+			self.finish()
+		return rows
+
+	def fetchall(self):
+		start_time = time.perf_counter()
+		rows = self.cursor.fetchall()
+		self.fetched(rows, start_time)
+		self.finish()
+		return rows
+
+	def __iter__(self):
+		# iterate a fetch (eg. a named cursor's itersize round trip) at a time so rows are timed and counted per fetch
+		fetch_size = getattr(self.cursor, 'itersize', 0) or max(self.cursor.arraysize, 1000)
+		while True:
+			rows = self.fetchmany(fetch_size)
+			if not rows:
+				return
+			yield from rows
+
+	def close(self):
+		self.finish()
+		self.cursor.close()
+
+
 class Connection:
 
 	def __init__(self, connection):
@@ -79,6 +230,9 @@ class Connection:
 		self.cursor = None
 		self.connect()
 
+		# pooled connections expire by age
+		self.connect_time = time.monotonic()
+
 		# log diagnostic info
 		self.check_version()
 
@@ -94,6 +248,34 @@ class Connection:
 		if self.server_encoding:
 			logger.info(f'{self.platform}.server_encoding: {self.server_encoding}')
 
+	def capture_cursor(self, cursor_name='', itersize=0):
+		"""Subclass for platforms that stream result sets via server side cursors; returns a standard cursor."""
+		return TimedCursor(self.conn.cursor(), 'capture_select')
+
+	def set_query_timeout(self, seconds):
+		"""Subclass: Set timeout (secs, 0 for none) of queries executed via cursors created after this call."""
+		pass
+
+	@staticmethod
+	def is_query_timeout(exception):
+		"""Subclass: Return True if exception was raised by a query timeout."""
+		return False
+
+	def reset_query(self):
+		"""Subclass: Reset connection state after a failed query."""
+		pass
+
+	def is_healthy(self):
+		"""Return True if connection can execute a query."""
+		try:
+			cursor = self.conn.cursor()
+			cursor.execute('select 1;')
+			cursor.fetchone()
+			cursor.close()
+			return True
+		except Exception:
+			return False
+
 	def check_version(self):
 		"""Subclass for connection specific properties."""
 		pass
@@ -105,6 +287,15 @@ class Connection:
 
 class MSSQL(Connection):
 
+	def set_query_timeout(self, seconds):
+		# applies to cursors created by connection after timeout is set
+		self.conn.timeout = seconds
+
+	@staticmethod
+	def is_query_timeout(exception):
+		# ODBC timeout expired sqlstate
+		return isinstance(exception, pyodbc.Error) and exception.args and exception.args[0] == 'HYT00'
+
 	def check_version(self):
 		self.client_version = f'pyodbc {pyodbc.version}'
 		self.client_drivers = f'{pyodbc.drivers()}'
@@ -175,6 +366,34 @@ class MSSQL(Connection):
 
 class PostgreSQL(Connection):
 
+	def capture_cursor(self, cursor_name='', itersize=0):
+		"""
+		Return a named (server side) cursor if cursor_name specified, otherwise a standard (client side) cursor.
+		Named cursors stream result sets from the server in itersize row batches vs loading the entire
+		result set into client memory on execute(). Named cursors must be closed before they can be reused.
+		"""
+		if not cursor_name:
+			return TimedCursor(self.conn.cursor(), 'capture_select')
+
+		cursor = self.conn.cursor(name=cursor_name)
+		if itersize:
+			cursor.itersize = itersize
+		return TimedCursor(cursor, 'capture_select')
+
+	def set_query_timeout(self, seconds):
+		# statement_timeout applies to each statement, including a named cursor's fetches
+		# Note: Timeout is set per query since rolling back a timed out query's transaction reverts set commands.
+		self.cursor.execute(f'set statement_timeout = {int(seconds * 1000)};')
+
+	@staticmethod
+	def is_query_timeout(exception):
+		# query_canceled sqlstate
+		return isinstance(exception, psycopg2.Error) and exception.pgcode == '57014'
+
+	def reset_query(self):
+		# failed statements abort their transaction
+		self.conn.rollback()
+
 	def check_version(self):
 		self.client_drivers = None
 		self.client_encoding = self.conn.get_parameter_status('client_encoding')
@@ -219,6 +438,276 @@ class PostgreSQL(Connection):
 		self.cursor = self.conn.cursor()
 
 
+class ConnectionPool:
+
+	"""
+	Thread safe pool of connections to a database: connection section.
+
+	Connections are health checked when borrowed and closed once idle longer than max_idle secs or
+	open longer than max_lifetime secs; expired idle connections are reaped as connections are released.
+	Default max_idle (65 min) outlasts hourly capture schedules so consecutive jobs re-use connections. Borrowers wait up to timeout secs for a connection when max_size connections
+	are open. Returned connections have their transaction rolled back and query timeout cleared.
+	"""
+
+	def __init__(self, connection_config, max_size=0, max_idle=3900, max_lifetime=14400, timeout=300):
+		self.connection_config = connection_config
+		self.max_size = max_size
+		self.max_idle = max_idle
+		self.max_lifetime = max_lifetime
+		self.timeout = timeout
+
+		# idle connections as (db, release time) and count of open (idle and borrowed) connections
+		self.idle = list()
+		self.size = 0
+		self.condition = threading.Condition()
+
+	def connect(self):
+		"""Return a new connection for pool's database platform."""
+		if self.connection_config.platform == 'postgresql':
+			return PostgreSQL(self.connection_config)
+		elif self.connection_config.platform == 'mssql':
+			return MSSQL(self.connection_config)
+		else:
+			raise ValueError(f'Unsupported database platform ({self.connection_config.platform})')
+
+	def reserve(self, min_size):
+		"""Raise a limited pool's max_size to min_size so callers holding min_size connections at once can't starve."""
+		with self.condition:
+			if self.max_size and self.max_size < min_size:
+				logger.warning(f'Connection pool size {self.max_size} < {min_size} concurrent connections; using {min_size}')
+				self.max_size = min_size
+				self.condition.notify_all()
+
+	def is_expired(self, db, release_time):
+		now = time.monotonic()
+		return now - release_time > self.max_idle or now - db.connect_time > self.max_lifetime
+
+	@staticmethod
+	def disconnect(db):
+		with contextlib.suppress(Exception):
+			db.conn.close()
+
+	def borrow(self):
+		"""
+		Return a healthy connection from pool, connecting if no idle connections are available.
+		Raises TimeoutError if pool stays at max_size open connections for timeout secs.
+		"""
+		while True:
+			with self.condition:
+				is_available = self.condition.wait_for(
+					lambda: self.idle or not self.max_size or self.size < self.max_size, timeout=self.timeout or None
+				)
+				if not is_available:
+					raise TimeoutError(
+						f'No connection available from pool after {self.timeout} secs; '
+						f'all {self.size} of pool_size={self.max_size} connections are borrowed'
+					)
+				if self.idle:
+					db, release_time = self.idle.pop()
+				else:
+					db, release_time = None, None
+					self.size += 1
+
+			if not db:
+				try:
+					return self.connect()
+				except Exception:
+					self.discard()
+					raise
+
+			# replace expired and unhealthy connections outside of lock since health checks are round trips
+			if not self.is_expired(db, release_time) and db.is_healthy():
+				return db
+			self.disconnect(db)
+			self.discard()
+
+	def discard(self):
+		"""Remove a closed connection from pool's count of open connections."""
+		with self.condition:
+			self.size -= 1
+			self.condition.notify()
+
+	def release(self, db):
+		"""Return a borrowed connection to pool."""
+		try:
+			# clear timeout in its own transaction; set commands are reverted by rollbacks
+			db.conn.rollback()
+			db.set_query_timeout(0)
+			db.conn.commit()
+		except Exception:
+			self.disconnect(db)
+			self.discard()
+			return
+
+		with self.condition:
+			self.idle.append((db, time.monotonic()))
+			expired = [(idle_db, release_time) for idle_db, release_time in self.idle if self.is_expired(idle_db, release_time)]
+			if expired:
+				self.idle = [idle for idle in self.idle if idle not in expired]
+				self.size -= len(expired)
+			self.condition.notify(1 + len(expired))
+
+		# close reaped connections outside of lock
+		for idle_db, _ in expired:
+			self.disconnect(idle_db)
+
+	@contextlib.contextmanager
+	def connection(self):
+		"""Borrow a connection for the duration of a with block."""
+		db = self.borrow()
+		try:
+			yield db
+		finally:
+			self.release(db)
+
+	def close(self):
+		"""Close pool's idle connections."""
+		with self.condition:
+			idle = self.idle
+			self.idle = list()
+			self.size -= len(idle)
+			self.condition.notify_all()
+		for db, _ in idle:
+			self.disconnect(db)
+
+
+# connection pools shared across jobs and daemons in a process, keyed by database: connection section
+connection_pools = dict()
+connection_pools_lock = threading.Lock()
+
+
+def connection_pool(connection):
+	"""Return the shared pool for a database: connection section; pool limits are optional section settings."""
+	pool_key = getattr(connection, '_section_key', '') or (
+		connection.platform, connection.host, connection.port, connection.database, connection.username
+	)
+	with connection_pools_lock:
+		if pool_key not in connection_pools:
+			connection_pools[pool_key] = ConnectionPool(
+				connection,
+				max_size=int(getattr(connection, 'pool_size', '') or 0),
+				max_idle=int(getattr(connection, 'pool_max_idle', '') or 3900),
+				max_lifetime=int(getattr(connection, 'pool_max_lifetime', '') or 14400),
+				timeout=int(getattr(connection, 'pool_timeout', '') or 300)
+			)
+		return connection_pools[pool_key]
+
+
+class SQLTemplate:
+
+	"""
+	SQL command template compiled once into an f-string renderer.
+
+	A template's parameters are the free names its {expressions} reference, excluding builtins (eg. len) and
+	names bound within an expression (eg. comprehension variables). Rendering raises a KeyError naming any
+	missing parameters. Renders with only scalar parameter values are memoized by their tuple of values in
+	a least recently used cache shared by all threads; templates are pure functions of their parameters so
+	repeated metadata queries (eg. does_table_exist) render once. Renders with other values (eg. table schemas) are not memoized so cached keys can't keep
+	objects alive or go stale when a mutable object changes.
+	"""
+
+	# max memoized renders per template
+	cache_size = 1024
+
+	# parameter value types renders are memoized for; immutable and hashable
+	scalar_types = {
+		str, bytes, bool, int, float, type(None), datetime.date, datetime.datetime, datetime.time, datetime.timedelta
+	}
+
+	def __init__(self, command_name, template):
+		self.command_name = command_name
+		self.template = template
+
+		triple_quote = "'" * 3
+		expression = f'f{triple_quote}{template}{triple_quote}'
+		self.code = compile(expression, f'<sql:{command_name}>', 'eval')
+		self.parameters = tuple(sorted(self.free_names(ast.parse(expression, mode='eval'))))
+
+		# renders keyed by parameter values in least to most recently used order; lock guards lookups and evictions
+		self.renders = collections.OrderedDict()
+		self.lock = threading.Lock()
+
+	@staticmethod
+	def free_names(tree):
+		"""Return names loaded by an expression tree that are neither builtins nor bound within the expression."""
+		loaded_names = set()
+		bound_names = set()
+		for node in ast.walk(tree):
+			if isinstance(node, ast.Name):
+				if isinstance(node.ctx, ast.Load):
+					loaded_names.add(node.id)
+				else:
+					# comprehension targets and assignment expression (walrus) targets
+					bound_names.add(node.id)
+			elif isinstance(node, ast.arg):
+				# lambda arguments
+				bound_names.add(node.arg)
+		return {name for name in loaded_names - bound_names if not hasattr(builtins, name)}
+
+	def render(self, parameters):
+		"""Render template from a dict of parameters, eg. caller's locals(); extra keys are ignored."""
+		try:
+			values = tuple(parameters[name] for name in self.parameters)
+		except KeyError:
+			missing_parameters = ', '.join(name for name in self.parameters if name not in parameters)
+			raise KeyError(f'SQL template [{self.command_name}] missing parameters: {missing_parameters}')
+
+		# keyed by value types too since equal values of different types (eg. 1, 1.0, True) render differently
+		is_cacheable = all(type(value) in self.scalar_types for value in values)
+		render_key = tuple((type(value), value) for value in values) if is_cacheable else None
+		if is_cacheable:
+			with self.lock:
+				sql_command = self.renders.get(render_key)
+				if sql_command is not None:
+					self.renders.move_to_end(render_key)
+					return sql_command
+
+		# parameters are passed as globals so they're visible within comprehensions' nested scopes
+		sql_command = eval(self.code, dict(zip(self.parameters, values)))
+		if is_cacheable:
+			with self.lock:
+				self.renders[render_key] = sql_command
+				while len(self.renders) > self.cache_size:
+					self.renders.popitem(last=False)
+		return sql_command
+
+
+class SQLTemplates:
+
+	"""A database platform's <platform>.cfg templates; parsed once per process, compiled on first use."""
+
+	def __init__(self, platform):
+		self.platform = platform
+		self.config = ConfigSection('conf', 'local')
+		self.config.load(f'{platform}.cfg')
+		self.templates = dict()
+		self.lock = threading.Lock()
+
+	def __call__(self, command_name):
+		"""Return a command's compiled SQLTemplate."""
+		sql_template = self.templates.get(command_name)
+		if sql_template is None:
+			template = self.config(command_name)
+			if template is None:
+				raise KeyError(f'Undefined SQL template [{command_name}] in {self.platform}.cfg')
+			with self.lock:
+				sql_template = self.templates.setdefault(command_name, SQLTemplate(command_name, template))
+		return sql_template
+
+
+# compiled templates shared by all Database instances in a process, keyed by platform
+sql_templates_cache = dict()
+sql_templates_lock = threading.Lock()
+
+
+def sql_templates(platform):
+	"""Return shared SQLTemplates for a database platform."""
+	with sql_templates_lock:
+		if platform not in sql_templates_cache:
+			sql_templates_cache[platform] = SQLTemplates(platform)
+		return sql_templates_cache[platform]
+
+
 """
 Python DB API-compliance: auto-commit is off by default. You need to call conn.commit to commit any pending transaction.
 Connections (and cursors) are context managers, you can simply use the with statement to automatically commit/rollback a 
@@ -238,10 +727,8 @@ class Database:
 	def __init__(self, platform, conn):
 		self.platform = platform
 		self.conn = conn
-		self.cursor = self.conn.cursor()
-		self.sql = ConfigSection('conf', 'local')
-		self.sql.load(f'{platform}.cfg')
-		# self.sql.dump()
+		self.cursor = TimedCursor(self.conn.cursor())
+		self.sql = sql_templates(platform)
 
 		# TODO: This should come in another way
 		if platform == 'postgresql':
@@ -249,13 +736,15 @@ class Database:
 		else:
 			self.queryparm = '?'
 
-	@staticmethod
-	def log(command_name, sql):
+	def log(self, command_name, sql):
+		"""Log a statement's SQL and name the cursor's next statement for statement metrics."""
 		single_line_sql = sql.replace('\n', r'\n')
 		logger.info(f'sql({command_name}): {single_line_sql}')
+		self.cursor.command_name = command_name
 
-	# def sql(self, command):
-	# 	return self.sql_config.sections[command]
+	def render(self, command_name, parameters):
+		"""Render a command's SQL template from a dict of parameters, eg. caller's locals()."""
+		return self.sql(command_name).render(parameters)
 
 	def is_null(self, sql_command):
 		# Note: referenced in embedded f-string
@@ -277,28 +766,34 @@ class Database:
 	def execute(self, command_name, value=None):
 		# noinspection PyUnusedLocal
 		queryparm = self.queryparm
-		sql_template = self.sql(command_name)
-		sql_command = expand(sql_template)
+		sql_command = self.render(command_name, locals())
+		self.log(command_name, sql_command)
 		if value is None:
 			cursor = self.cursor.execute(sql_command)
 		else:
 			cursor = self.cursor.execute(sql_command, value)
-		self.log(command_name, sql_command)
 		return cursor
 
 	# noinspection PyUnusedLocal
 	def current_timestamp(self, timezone=None):
 		command_name = 'current_timestamp'
-		sql_template = self.sql(command_name)
-		sql_command = expand(sql_template)
+		sql_command = self.render(command_name, locals())
 		self.cursor.execute(sql_command)
 		return self.cursor.fetchone()[0]
 
+	# noinspection PyUnusedLocal
+	def current_rowversion(self):
+		"""Return database's current rowversion upper bound as an int (SQL Server only)."""
+		command_name = 'current_rowversion'
+		sql_command = self.render(command_name, locals())
+		self.log(command_name, sql_command)
+		self.cursor.execute(sql_command)
+		return int(self.cursor.fetchone()[0])
+
 	# noinspection PyUnusedLocal
 	def does_database_exist(self, database_name):
 		command_name = 'does_database_exist'
-		sql_template = self.sql(command_name)
-		sql_command = expand(sql_template)
+		sql_command = self.render(command_name, locals())
 		self.log(command_name, sql_command)
 		return not self.is_null(sql_command)
 
@@ -307,8 +802,7 @@ class Database:
 		if not self.does_database_exist(database_name):
 			autocommit = self.conn.autocommit
 			self.conn.autocommit = True
-			sql_template = self.sql(command_name)
-			sql_command = expand(sql_template)
+			sql_command = self.render(command_name, locals())
 			self.log(command_name, sql_command)
 			self.cursor.execute(sql_command)
 			self.conn.autocommit = autocommit
@@ -317,8 +811,7 @@ class Database:
 	# Note: database_name used in embedded f-strings.
 	def use_database(self, database_name):
 		command_name = 'use_database'
-		sql_template = self.sql('use_database')
-		sql_command = expand(sql_template)
+		sql_command = self.render(command_name, locals())
 		self.log(command_name, sql_command)
 		self.cursor.execute(sql_command)
 
@@ -326,8 +819,7 @@ class Database:
 	# Note: schema_name used in embedded f-string
 	def does_schema_exist(self, schema_name):
 		command_name = 'does_schema_exist'
-		sql_template = self.sql(command_name)
-		sql_command = expand(sql_template)
+		sql_command = self.render(command_name, locals())
 		self.log(command_name, sql_command)
 		return not self.is_null(sql_command)
 
@@ -336,8 +828,7 @@ class Database:
 		if not self.does_schema_exist(schema_name):
 			autocommit = self.conn.autocommit
 			self.conn.autocommit = True
-			sql_template = self.sql(command_name)
-			sql_command = expand(sql_template)
+			sql_command = self.render(command_name, locals())
 			self.log(command_name, sql_command)
 			self.cursor.execute(sql_command)
 			self.conn.autocommit = autocommit
@@ -346,8 +837,7 @@ class Database:
 	# Note: schema_name, table_name used in embedded f-strings.
 	def does_table_exist(self, schema_name, table_name):
 		command_name = 'does_table_exist'
-		sql_template = self.sql(command_name)
-		sql_command = expand(sql_template)
+		sql_command = self.render(command_name, locals())
 		self.log(command_name, sql_command)
 		return not self.is_null(sql_command)
 
@@ -357,8 +847,7 @@ class Database:
 			# print(f'Table does not exist: {schema_name}.{table_name}')
 			return None
 		else:
-			sql_template = self.sql(command_name)
-			sql_command = expand(sql_template)
+			sql_command = self.render(command_name, locals())
 			self.log(command_name, sql_command)
 			self.cursor.execute(sql_command)
 
@@ -383,8 +872,7 @@ class Database:
 			# print(f'Table does not exist: {schema_name}.{table_name}')
 			return None
 		else:
-			sql_template = self.sql(command_name)
-			sql_command = expand(sql_template)
+			sql_command = self.render(command_name, locals())
 			self.log(command_name, sql_command)
 			self.cursor.execute(sql_command)
 			rows = self.cursor.fetchall()
@@ -395,6 +883,45 @@ class Database:
 				pk_columns = ', '.join(pk_columns)
 			return pk_columns
 
+	# noinspection PyUnusedLocal
+	# Note: schema_name used in embedded f-string.
+	def select_schema_table_schemas(self, schema_name):
+		"""Returns dict of TableSchema's for all of a schema's tables keyed by lowercase table name."""
+		command_name = 'select_schema_table_schemas'
+		sql_command = self.render(command_name, locals())
+		self.log(command_name, sql_command)
+		self.cursor.execute(sql_command)
+
+		# group column rows by table; see select_table_schema()
+		rows = self.cursor.fetchall()
+		column_names = [column[0] for column in self.cursor.description if column[0] != 'table_name']
+		table_columns = dict()
+		for row in rows:
+			column = Object()
+			for column_name in column_names:
+				value = getattr(row, column_name)
+				setattr(column, column_name, value)
+			table_columns.setdefault(row.table_name, []).append(column)
+
+		table_schemas = dict()
+		for table_name, columns in table_columns.items():
+			table_schemas[table_name.lower()] = tableschema.TableSchema(table_name, columns)
+		return table_schemas
+
+	# noinspection PyUnusedLocal
+	# Note: schema_name used in embedded f-string.
+	def select_schema_table_pks(self, schema_name):
+		"""Returns dict of comma delimited pk column names for all of a schema's tables keyed by lowercase table name."""
+		command_name = 'select_schema_table_pks'
+		sql_command = self.render(command_name, locals())
+		self.log(command_name, sql_command)
+		self.cursor.execute(sql_command)
+
+		table_pks = dict()
+		for row in self.cursor.fetchall():
+			table_pks.setdefault(row.table_name.lower(), []).append(row.column_name)
+		return {table_name: ', '.join(sorted(pk_columns)) for table_name, pk_columns in table_pks.items()}
+
 	def create_table_from_table_schema(self, schema_name, table_name, table, extended_definitions=None):
 		command_name = 'create_table_from_table_schema'
 		if not self.does_table_exist(schema_name, table_name):
@@ -404,8 +931,7 @@ class Database:
 			# noinspection PyUnusedLocal
 			# Note: column_definitions used in embedded f-strings.
 			column_definitions = table.column_definitions(extended_definitions)
-			sql_template = self.sql(command_name)
-			sql_command = expand(sql_template)
+			sql_command = self.render(command_name, locals())
 
 			# print(f'create_table_from_table_schema:\n{sql_command}\n')
 
@@ -419,23 +945,42 @@ class Database:
 		if not self.does_table_exist(schema_name, table_name):
 			autocommit = self.conn.autocommit
 			self.conn.autocommit = True
-			sql_template = self.sql(command_name)
-			sql_command = expand(sql_template)
+			sql_command = self.render(command_name, locals())
 			self.log(command_name, sql_command)
 			self.cursor.execute(sql_command)
 			self.conn.autocommit = autocommit
 
+	def migrate_named_table(self, schema_name, table_name):
+		"""Add columns missing from a named table created by an earlier version of its create_named_table template."""
+		command_name = f'migrate_named_table_{schema_name}_{table_name}'
+		autocommit = self.conn.autocommit
+		self.conn.autocommit = True
+		sql_command = self.render(command_name, locals())
+		self.log(command_name, sql_command)
+		self.cursor.execute(sql_command)
+		self.conn.autocommit = autocommit
+
 	def drop_table(self, schema_name, table_name):
 		command_name = 'drop_table'
 		if self.does_table_exist(schema_name, table_name):
 			autocommit = self.conn.autocommit
 			self.conn.autocommit = True
-			sql_template = self.sql(command_name)
-			sql_command = expand(sql_template)
+			sql_command = self.render(command_name, locals())
 			self.log(command_name, sql_command)
 			self.cursor.execute(sql_command)
 			self.conn.autocommit = autocommit
 
+	# noinspection PyUnusedLocal
+	def delete_row_hashes(self, schema_name, table_name, delete_table_name):
+		"""Delete table rows matching delete table's udp_rowhash values; duplicate rows are deleted by count."""
+		command_name = 'delete_row_hashes'
+		autocommit = self.conn.autocommit
+		self.conn.autocommit = True
+		sql_command = self.render(command_name, locals())
+		self.log(command_name, sql_command)
+		self.cursor.execute(sql_command)
+		self.conn.autocommit = autocommit
+
 	# applies to session vs global temp tables
 	def drop_temp_table(self, table_name):
 		command_name = 'drop_temp_table'
@@ -448,8 +993,7 @@ class Database:
 
 		autocommit = self.conn.autocommit
 		self.conn.autocommit = True
-		sql_template = self.sql(command_name)
-		sql_command = expand(sql_template)
+		sql_command = self.render(command_name, locals())
 		self.log(command_name, sql_command)
 		self.cursor.execute(sql_command)
 		self.conn.autocommit = autocommit
@@ -463,8 +1007,7 @@ class Database:
 		column_values = column_names_values.values()
 		autocommit = self.conn.autocommit
 		self.conn.autocommit = True
-		sql_template = self.sql(command_name)
-		sql_command = expand(sql_template)
+		sql_command = self.render(command_name, locals())
 		self.log(command_name, sql_command)
 		self.cursor.execute(sql_command, *column_values)
 		self.conn.autocommit = autocommit
@@ -484,8 +1027,7 @@ class Database:
 		column_placeholders = ', '.join([self.queryparm] * len(table_schema.columns))
 		autocommit = self.conn.autocommit
 		self.conn.autocommit = False
-		sql_template = self.sql(command_name)
-		sql_command = expand(sql_template)
+		sql_command = self.render(command_name, locals())
 
 		# print(sql_command)
 
@@ -506,9 +1048,7 @@ class Database:
 		if self.platform == 'mssql':
 			self.conn.autocommit = True
 
-		sql_template = self.sql(command_name)
-		# print(f'\ncapture_select.sql_template:\n{sql_template}\n')
-		sql_command = expand(sql_template)
+		sql_command = self.render(command_name, locals())
 		self.log(command_name, sql_command)
 		self.cursor.execute(sql_command)
 		if self.platform == 'mssql':
@@ -519,8 +1059,7 @@ class Database:
 	# Note: schema_name, table_name used in embedded f-strings.
 	def delete_where(self, schema_name, table_name, value):
 		command_name = f'delete_where'
-		sql_template = self.sql(command_name)
-		sql_command = expand(sql_template)
+		sql_command = self.render(command_name, locals())
 		self.log(command_name, sql_command)
 		self.cursor.execute(sql_command)
 
@@ -556,8 +1095,7 @@ class Database:
 
 		autocommit = self.conn.autocommit
 		self.conn.autocommit = True
-		sql_template = self.sql(command_name)
-		sql_command = expand(sql_template)
+		sql_command = self.render(command_name, locals())
 		self.log(command_name, sql_command)
 		self.cursor.execute(sql_command)
 		self.conn.autocommit = autocommit
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+row_delta.py
+
+Row level delta detection for snapshot (cdc=none) tables.
+
+Snapshot tables have no pk or timestamp to capture changes by, so each capture selects the full table.
+In row delta mode ([table].row_delta = 1) each row is fingerprinted (signed 64-bit hash of its column values)
+and compared to the previous run's fingerprints so only inserted rows are written to batch files and
+deleted rows are sent as a list of fingerprints. Updated rows are a delete plus an insert.
+
+Inserted rows carry their fingerprint as an extra udp_rowhash column; stage stores udp_rowhash in the
+target table and deletes rows by fingerprint. Identical rows share a fingerprint and are matched by count.
+
+The previous run's fingerprints are a compact on-disk index (capture_state/<table>.rowhash): a sorted
+array of int64 values, 8 bytes per row. A run without an index (eg. a table's first run) is a full snapshot
+that stage loads by rebuilding the target table.
+
+Usage:
+row_delta = RowDelta(index_file_name)
+batch_writer.write_rows(row_delta.filter(cursor))
+deleted_hashes = row_delta.deleted_hashes()
+row_delta.save(pending_index_file_name)
+"""
+
+
+# standard lib
+import array
+import bisect
+import hashlib
+import json
+import logging
+import pathlib
+
+
+# common lib
+from common import json_serializer
+
+
+# module level logger
+logger = logging.getLogger(__name__)
+
+
+class RowDelta:
+
+	"""Filters a snapshot table's rows to rows inserted since previous run and tracks rows deleted since previous run."""
+
+	# capture's udp_jobid and udp_timestamp columns vary by job so they are not part of a row's fingerprint
+	extended_column_count = 2
+
+	def __init__(self, index_file_name):
+		self.index_file_name = str(index_file_name)
+
+		# previous run's sorted fingerprints; matched bits mark fingerprints found in current run
+		self.previous_hashes = None
+		if pathlib.Path(self.index_file_name).exists():
+			self.previous_hashes = array.array('q')
+			with open(self.index_file_name, 'rb') as input_stream:
+				self.previous_hashes.frombytes(input_stream.read())
+		previous_count = len(self.previous_hashes) if self.previous_hashes is not None else 0
+		self.matched = bytearray((previous_count + 7) // 8)
+
+		# current run's fingerprints
+		self.current_hashes = array.array('q')
+		self.row_count = 0
+		self.inserted_count = 0
+
+		# compact encoder matching batch file encoding
+		self.encoder = json.JSONEncoder(separators=(',', ':'), default=json_serializer)
+
+	@property
+	def is_full(self):
+		"""Return True if there's no previous index, ie. all rows are sent as a full snapshot."""
+		return self.previous_hashes is None
+
+	def row_hash(self, row):
+		"""Return signed 64-bit fingerprint of a row's column values."""
+		data = self.encoder.encode(row[:-self.extended_column_count]).encode()
+		return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'little', signed=True)
+
+	def is_match(self, row_hash):
+		"""Match row_hash to an unmatched occurrence in previous fingerprints; False if row is new."""
+		if not self.previous_hashes:
+			return False
+
+		index = bisect.bisect_left(self.previous_hashes, row_hash)
+		while index < len(self.previous_hashes) and self.previous_hashes[index] == row_hash:
+			if not self.matched[index >> 3] & (1 << (index & 7)):
+				self.matched[index >> 3] |= 1 << (index & 7)
+				return True
+			index += 1
+		return False
+
+	def filter(self, rows):
+		"""Yield inserted rows with their fingerprint appended as a udp_rowhash column."""
+		for row in rows:
+			# pyodbc.Row and other row types are not tuples
+			row = tuple(row)
+			row_hash = self.row_hash(row)
+			self.current_hashes.append(row_hash)
+			self.row_count += 1
+			if not self.is_match(row_hash):
+				self.inserted_count += 1
+				yield row + (row_hash,)
+
+	def deleted_hashes(self):
+		"""Return list of previous fingerprints not matched by current rows."""
+		if not self.previous_hashes:
+			return list()
+
+		deleted_hashes = list()
+		for index, row_hash in enumerate(self.previous_hashes):
+			if not self.matched[index >> 3] & (1 << (index & 7)):
+				deleted_hashes.append(row_hash)
+		return deleted_hashes
+
+	def save(self, file_name):
+		"""Save current fingerprints as next run's index."""
+		current_hashes = array.array('q', sorted(self.current_hashes))
+		with open(file_name, 'wb') as output_stream:
+			current_hashes.tofile(output_stream)
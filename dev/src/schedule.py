@@ -57,6 +57,7 @@ from common import trim_seconds
 
 # udp class
 from section import SectionSchedule
+from sql_log import statement_log
 
 
 # module level logger
@@ -273,6 +274,8 @@ class CommandFileSchedule(Schedule):
 				stop_status = True
 			if command in ('diagnostics', 'dump', 'info'):
 				self.dump()
+			if command in ('sql', 'sql_stats'):
+				statement_log.dump()
 
 		return stop_status
 
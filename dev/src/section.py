@@ -105,6 +105,12 @@ class SectionDatabase(Section):
 		self.username = ''
 		self.password = ''
 
+		# connection pool; pool_size (0 = no limit), pool_max_idle, pool_max_lifetime and pool_timeout in secs
+		self.pool_size = ''
+		self.pool_max_idle = ''
+		self.pool_max_lifetime = ''
+		self.pool_timeout = ''
+
 
 # TODO: 2018-09-15 - add extended datapool attributes.
 # TODO: Consider renaming datapool to datapond.
@@ -165,6 +171,35 @@ class SectionProject(Section):
 		self.options = ''
 		self.batch_size = ''
 
+		# capture: batch file format; <blank> | json (default) or columnar (typed binary, see columnar.py)
+		self.batch_format = ''
+
+		# capture: adaptive batch sizing; batch_size becomes an upper limit
+		# batch_bytes: target bytes per batch sized from first rows fetched
+		# memory_limit: process memory ceiling in bytes; batches are closed early while memory used is over it
+		self.batch_bytes = ''
+		self.memory_limit = ''
+
+		# capture: stream json batches' large object (text, jsonb, (n)varchar(max)) values to <table>#NNNN.lob sidecars
+		self.lob_sidecar = ''
+
+		# capture: collect per-column value statistics (<table>.stats) used by stage to size columns (column_stats = 1)
+		self.column_stats = ''
+
+		# capture: estimate column statistics' distinct counts; hashes every captured value (column_distinct = 1)
+		self.column_distinct = ''
+
+		# capture: extract postgresql sources via copy (<select>) to stdout into <table>#NNNN.tsv batches (copy_extract = 1)
+		# Note: Not used for row_delta tables or when column_stats = 1 since both require rows as Python values.
+		self.copy_extract = ''
+
+		# capture: number of tables extracted concurrently, each worker with its own source connection
+		self.capture_workers = ''
+
+		# capture: stream result sets via server side cursors fetching cursor_itersize rows per round trip
+		self.server_cursor = ''
+		self.cursor_itersize = ''
+
 		# resources
 		self.cloud = ''
 		self.database = ''
@@ -236,3 +271,21 @@ class SectionTable(Section):
 		self.where = ''
 		self.order = ''
 		self.delete_when = ''
+
+		# probe for rows in cdc window before extracting; unchanged tables are skipped (change_probe = 1)
+		self.change_probe = ''
+
+		# backfill first-time loads in windows of backfill_days (eg. 1, 7) per capture job vs one full history query
+		self.backfill_days = ''
+
+		# cdc=none tables: capture only rows inserted/deleted since last capture via row hashes (row_delta = 1)
+		self.row_delta = ''
+
+		# capture query timeout in secs; timed out timestamp windows are split in half down to min_window_minutes
+		self.query_timeout = ''
+		self.min_window_minutes = ''
+
+		# split extraction of very large tables into concurrent key range partitions
+		# partition_key defaults to a single column pk or first timestamp column
+		self.partitions = ''
+		self.partition_key = ''
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""
+sql_log.py
+
+SQL statement metrics recorded by database.TimedCursor.
+
+Each statement's record:
+- command_name: SQL template (eg. does_table_exist) or capture step (eg. capture_select) that issued it
+- fingerprint: hash of statement's SQL with literals replaced by ?; same template + table = same fingerprint
+- execute_time: secs for execute() to return
+- first_row_time: secs from execute() to first row fetched (None if no rows were fetched)
+- fetch_time: secs spent in fetch calls
+- row_count, byte_count: rows fetched (or sent by executemany/copy) and their approximate size in bytes;
+  fetched bytes are estimated per fetch from its first row
+
+Records are written as json lines to a rotating log file (see setup()) and aggregated in-process by
+(command_name, fingerprint). The aggregate is logged by a daemon's 'sql' command (see CommandFileSchedule).
+
+Usage:
+statement_log.setup('../sessions/capture_sql.log')
+statement_log.record(record)
+statement_log.dump()
+"""
+
+
+# standard lib
+import hashlib
+import json
+import logging
+import logging.handlers
+import re
+import threading
+import time
+
+
+# module level logger
+logger = logging.getLogger(__name__)
+
+
+# string, hex and numeric literals
+literal_pattern = re.compile(r"'(?:[^']|'')*'|\b0x[0-9a-f]+\b|\b\d+(?:\.\d+)?\b", re.IGNORECASE)
+
+
+def fingerprint(sql):
+	"""Return hash of sql with literals replaced by ? and whitespace compressed."""
+	sql = literal_pattern.sub('?', sql.lower())
+	sql = ' '.join(sql.split())
+	return hashlib.blake2b(sql.encode('UTF8'), digest_size=8).hexdigest()
+
+
+def value_size(value):
+	"""Return approximate size of a column value in bytes."""
+	if value is None:
+		return 0
+	elif isinstance(value, (str, bytes, bytearray)):
+		return len(value)
+	else:
+		return 8
+
+
+def row_size(row):
+	"""Return approximate size of a row's column values in bytes."""
+	return sum(value_size(value) for value in row)
+
+
+class StatementRecord:
+
+	def __init__(self, command_name, sql):
+		# statements issued outside of Database methods are named by their leading keyword
+		if not command_name and sql.strip():
+			command_name = sql.split(None, 1)[0].lower()
+		self.command_name = command_name
+		self.sql = sql
+		self.fingerprint = fingerprint(sql)
+		self.start_time = time.perf_counter()
+		self.execute_time = 0.0
+		self.first_row_time = None
+		self.fetch_time = 0.0
+		self.row_count = 0
+		self.byte_count = 0
+
+	@property
+	def run_time(self):
+		return self.execute_time + self.fetch_time
+
+	def row(self):
+		return dict(
+			command_name=self.command_name,
+			fingerprint=self.fingerprint,
+			execute_time=round(self.execute_time, 6),
+			first_row_time=round(self.first_row_time, 6) if self.first_row_time is not None else None,
+			fetch_time=round(self.fetch_time, 6),
+			row_count=self.row_count,
+			byte_count=self.byte_count
+		)
+
+
+class StatementStat:
+
+	"""Aggregate of a (command_name, fingerprint)'s statements."""
+
+	def __init__(self, command_name, fingerprint, sql):
+		self.command_name = command_name
+		self.fingerprint = fingerprint
+
+		# first statement's sql as a sample of fingerprint's statements
+		self.sql = ' '.join(sql.split())[:200]
+
+		self.count = 0
+		self.execute_time = 0.0
+		self.fetch_time = 0.0
+		self.max_run_time = 0.0
+		self.row_count = 0
+		self.byte_count = 0
+
+	def add(self, record):
+		self.count += 1
+		self.execute_time += record.execute_time
+		self.fetch_time += record.fetch_time
+		self.max_run_time = max(self.max_run_time, record.run_time)
+		self.row_count += record.row_count
+		self.byte_count += record.byte_count
+
+	@property
+	def run_time(self):
+		return self.execute_time + self.fetch_time
+
+
+class StatementLog:
+
+	"""Thread safe log and in-process aggregate of statement records."""
+
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.stats = dict()
+
+		# structured (json lines) statement log; not propagated to application log
+		self.record_logger = logging.getLogger('sql_statements')
+		self.record_logger.propagate = False
+		self.record_logger.setLevel(logging.INFO)
+
+	def setup(self, file_name, max_bytes=10_000_000, backup_count=5):
+		"""Write statement records to a rotating log file."""
+		for handler in list(self.record_logger.handlers):
+			self.record_logger.removeHandler(handler)
+			handler.close()
+		handler = logging.handlers.RotatingFileHandler(file_name, maxBytes=max_bytes, backupCount=backup_count)
+		handler.setFormatter(logging.Formatter('%(message)s'))
+		self.record_logger.addHandler(handler)
+
+	def record(self, record):
+		"""Log and aggregate a completed statement."""
+		if self.record_logger.handlers:
+			self.record_logger.info(json.dumps(record.row()))
+
+		key = (record.command_name, record.fingerprint)
+		with self.lock:
+			if key not in self.stats:
+				self.stats[key] = StatementStat(record.command_name, record.fingerprint, record.sql)
+			self.stats[key].add(record)
+
+	def top(self, count=20):
+		"""Return aggregate stats with the most total run time."""
+		with self.lock:
+			stats = list(self.stats.values())
+		return sorted(stats, key=lambda stat: stat.run_time, reverse=True)[:count]
+
+	def dump(self, count=20):
+		logger.info(f'SQL statements by total run time (top {count}):')
+		for stat in self.top(count):
+			logger.info(
+				f'{stat.command_name}({stat.fingerprint}): count={stat.count:,}, run_time={stat.run_time:.3f}, '
+				f'execute_time={stat.execute_time:.3f}, fetch_time={stat.fetch_time:.3f}, '
+				f'max_run_time={stat.max_run_time:.3f}, rows={stat.row_count:,}, bytes={stat.byte_count:,}; {stat.sql}'
+			)
+
+	def clear(self):
+		with self.lock:
+			self.stats.clear()
+
+
+# process-wide statement log shared by all connections
+statement_log = StatementLog()
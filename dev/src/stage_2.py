@@ -95,9 +95,12 @@ clear the table's references from our state file (table object).
 
 
 # standard lib
+import decimal
 import glob
+import json
 import logging
 import pathlib
+import re
 import time
 
 
@@ -112,7 +115,10 @@ from common import load_text
 
 
 # udp lib
+from batch_writer import lob_columns
+from bulk_load import bulk_loader
 import cdc_merge
+from columnar import load_columnar
 import cloud_aws as cloud
 import config
 import database
@@ -138,26 +144,44 @@ logger = logging.getLogger(__name__)
 # import stats/stat
 
 
-def convert_data_types(rows, table_schema):
+def convert_datetime(value):
+	"""Convert a date, datetime or time string to a datetime value."""
+	# shorten high precision values to avoid ODBC Datetime field overflow errors
+	if len(value) > 23:
+		value = value[0:25]
+	return arrow.get(value).datetime
+
+
+def column_converters(table_schema, null_columns=None):
+	"""Return list of (column index, converter) for columns whose batch values require conversion."""
+	converters = list()
 	for column_index, column in enumerate(table_schema.columns.values()):
-		# print(f'{column.column_name} ({column.data_type}) (index {column_index})')
+		# skip columns captured with only null values
+		if null_columns and column.column_name in null_columns:
+			continue
 
 		# convert all date, datetime, time strings to datetime values
 		if column.data_type in ('date', 'datetime', 'datetime2', 'smalldatetime', 'time'):
-			# print(f'Converting {column.column_name} ({column.data_type}) (index {column_index}) to datetime')
-			for row in rows:
-				if row[column_index] is not None:
-					# shorten high precision values to avoid ODBC Datetime field overflow errors
-					if len(row[column_index]) > 23:
-						row[column_index] = row[column_index][0:25]
-					row[column_index] = arrow.get(row[column_index]).datetime
+			converters.append((column_index, convert_datetime))
 
 		# make sure nvarchar are really strings
 		if column.data_type == 'nvarchar':
-			# print(f'Converting {column.column_name} ({column.data_type}) (index {column_index}) to str')
-			for row in rows:
-				if row[column_index] is not None:
-					row[column_index] = str(row[column_index])
+			converters.append((column_index, str))
+
+	return converters
+
+
+def convert_row(row, converters):
+	for column_index, converter in converters:
+		if row[column_index] is not None:
+			row[column_index] = converter(row[column_index])
+	return row
+
+
+def convert_data_types(rows, table_schema, null_columns=None):
+	converters = column_converters(table_schema, null_columns)
+	for row in rows:
+		convert_row(row, converters)
 
 
 '''
@@ -175,7 +199,39 @@ UUID: cast(<column> as text)
 '''
 
 
-def convert_to_mssql(table_schema, extended_definitions=None):
+# largest sized nvarchar; longer values require nvarchar(max)
+max_nvarchar_length = 4000
+
+
+def nvarchar_length(column, column_stats, default_length):
+	"""
+	Return nvarchar length for a character varying column; source's declared length or, when undeclared,
+	twice its longest captured value rounded up to a power of 2, capped at max_nvarchar_length (-1 for max when
+	longest value doesn't fit). Default length if column has no stats; only tables rebuilt every run have stats since
+	a persistent table's later values may be longer.
+	"""
+	column_stat = column_stats.get(column.column_name) if column_stats else None
+	if not column_stat:
+		return default_length
+
+	if column.character_maximum_length and 0 < column.character_maximum_length <= max_nvarchar_length:
+		return column.character_maximum_length
+
+	max_length = column_stat['max_length']
+	if max_length is None:
+		return default_length
+
+	if max_length > max_nvarchar_length:
+		return -1
+
+	length = 32
+	while length < max_length * 2:
+		length *= 2
+	return min(length, max_nvarchar_length)
+
+
+def convert_to_mssql(table_schema, extended_definitions=None, column_stats=None):
+	"""Convert table schema's data types to SQL Server types; column_stats (capture's <table>.stats) size nvarchars."""
 	# add extended definitions if present
 	if extended_definitions:
 		for definition in extended_definitions:
@@ -199,7 +255,7 @@ def convert_to_mssql(table_schema, extended_definitions=None):
 
 		elif data_type == 'character varying':
 			column.data_type = 'nvarchar'
-			column.character_maximum_length = 768
+			column.character_maximum_length = nvarchar_length(column, column_stats, 768)
 
 		# PostgreSQL/SQL Server
 		elif data_type == 'date':
@@ -235,6 +291,146 @@ def convert_to_mssql(table_schema, extended_definitions=None):
 			pass
 
 
+def batch_files(work_folder, table_name):
+	"""Return sorted list of a table's json (<table>#NNNN.json), columnar (.col) or copy (.tsv) batch files."""
+	work_folder_obj = pathlib.Path(work_folder)
+	file_names = list(work_folder_obj.glob(f'{table_name}#*.json'))
+	file_names.extend(work_folder_obj.glob(f'{table_name}#*.col'))
+	file_names.extend(work_folder_obj.glob(f'{table_name}#*.tsv'))
+	return sorted(file_names)
+
+
+# copy text format backslash escapes
+copy_escapes = {'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t', 'v': '\v'}
+copy_escape_pattern = re.compile(r'\\(.)')
+
+
+def copy_unescape(value):
+	return copy_escape_pattern.sub(lambda match: copy_escapes.get(match.group(1), match.group(1)), value)
+
+
+def copy_boolean(value):
+	# postgresql boolean columns are staged as tinyint
+	return 1 if value == 't' else 0 if value == 'f' else int(value)
+
+
+def copy_bytea(value):
+	# bytea hex format
+	return bytes.fromhex(value[2:])
+
+
+def copy_decoders(table_schema):
+	"""Return list of (column index, decoder) converting copy text values to their target column's Python type."""
+	decoders = list()
+	for column_index, column in enumerate(table_schema.columns.values()):
+		data_type = column.data_type
+		if data_type == 'tinyint':
+			decoders.append((column_index, copy_boolean))
+		elif data_type in ('bigint', 'int', 'smallint'):
+			decoders.append((column_index, int))
+		elif data_type in ('decimal', 'numeric', 'money', 'smallmoney'):
+			decoders.append((column_index, decimal.Decimal))
+		elif data_type in ('float', 'real'):
+			decoders.append((column_index, float))
+		elif data_type in ('binary', 'varbinary', 'image'):
+			decoders.append((column_index, copy_bytea))
+	return decoders
+
+
+def read_copy_rows(batch_file, table_schema):
+	"""Yield rows of a copy text format batch file (tab delimited, \\N nulls, backslash escapes)."""
+	decoders = copy_decoders(table_schema)
+	with open(batch_file, encoding='UTF8', newline='\n') as input_stream:
+		for line in input_stream:
+			row = [
+				None if value == '\\N' else copy_unescape(value) if '\\' in value else value
+				for value in line.rstrip('\n').split('\t')
+			]
+			for column_index, decoder in decoders:
+				if row[column_index] is not None:
+					row[column_index] = decoder(row[column_index])
+			yield row
+
+
+def read_lob_values(row, column_indexes, lob_stream):
+	"""Replace a row's [offset, length] large object references with values read from its batch's sidecar file."""
+	for column_index in column_indexes:
+		if row[column_index] is not None:
+			offset, length = row[column_index]
+			lob_stream.seek(offset)
+			row[column_index] = str(lob_stream.read(length), 'UTF8')
+	return row
+
+
+def read_json_rows(batch_file):
+	"""Yield rows of a json batch file; capture writes a row per line so rows are parsed a line at a time."""
+	with open(batch_file, encoding='UTF8') as input_stream:
+		if input_stream.readline().strip() != '[':
+			# batch without a row per line layout
+			input_stream.seek(0)
+			yield from json.load(input_stream)
+			return
+
+		for line in input_stream:
+			line = line.strip()
+			if line and line != ']':
+				yield json.loads(line.rstrip(','))
+
+
+def stream_batch(batch_file, table_schema, null_columns=None, lob_column_indexes=None):
+	"""
+	Yield rows from a batch file with column values converted to their target types.
+	lob_column_indexes are the large object columns capture streamed to the batch's sidecar file.
+	"""
+	if pathlib.Path(batch_file).suffix == '.col':
+		# columnar batches decode to typed values; no per-cell conversion required
+		header, rows = load_columnar(batch_file)
+		yield from rows
+		return
+
+	converters = column_converters(table_schema, null_columns)
+	if pathlib.Path(batch_file).suffix == '.tsv':
+		for row in read_copy_rows(batch_file, table_schema):
+			yield convert_row(row, converters)
+		return
+
+	# large object values stream from batch's sidecar file
+	lob_file_name = pathlib.Path(batch_file).with_suffix('.lob')
+	if not lob_file_name.exists():
+		for row in read_json_rows(batch_file):
+			yield convert_row(row, converters)
+		return
+
+	with open(lob_file_name, 'rb') as lob_stream:
+		for row in read_json_rows(batch_file):
+			yield convert_row(read_lob_values(row, lob_column_indexes or list(), lob_stream), converters)
+
+
+def apply_row_delete(db_conn, bulk_loader, namespace, table_name, table_schema, extended_definitions, row_delta):
+	"""Rebuild a row delta table for a full snapshot or delete its deleted rows by row hash."""
+	if row_delta['is_full']:
+		logger.info(f'Table {table_name} row delta is a full snapshot; rebuilding table')
+		db_conn.drop_table(namespace, table_name)
+		db_conn.create_table_from_table_schema(namespace, table_name, table_schema, extended_definitions)
+		return
+
+	deleted_hashes = row_delta['deleted_hashes']
+	logger.info(f'Table {table_name} row delta has {len(deleted_hashes):,} deleted rows')
+	if not deleted_hashes:
+		return
+
+	# load deleted row hashes into a work table and delete matching target rows
+	delete_table_name = f'_{table_name}_delete'
+	delete_table_schema = tableschema.TableSchema(delete_table_name, [])
+	delete_table_schema.add_definition('udp_rowhash bigint')
+	db_conn.drop_table(namespace, delete_table_name)
+	db_conn.create_table_from_table_schema(namespace, delete_table_name, delete_table_schema)
+	rows = [[row_hash] for row_hash in deleted_hashes]
+	bulk_loader.load(namespace, delete_table_name, delete_table_schema, rows)
+	db_conn.delete_row_hashes(namespace, table_name, delete_table_name)
+	db_conn.drop_table(namespace, delete_table_name)
+
+
 def stage_file(db_conn, archive_objectstore, object_key):
 
 	# make sure work folder exists and is empty
@@ -259,134 +455,152 @@ def stage_file(db_conn, archive_objectstore, object_key):
 	file_names.include('*')
 	extract_archive(source_file_name, work_folder, file_names)
 
-	# process all table files in our work folder
-	for file_name in sorted(glob.glob(f'{work_folder}/*.table')):
-		table_name = pathlib.Path(file_name).stem
-		logger.info(f'Processing {table_name} ...')
-
-		# TODO: rename files to use a _table, _schema suffix and .json file extension
-
-		# always load table objects
-		# input_stream = open(f'{work_folder}/{table_name}.table', 'rb')
-		# table_object = pickle.load(input_stream)
-		# input_stream.close()
-		table_object = load_json(f'{work_folder}/{table_name}.table')
-
-		# always load table schema
-		# input_stream = open(f'{work_folder}/{table_name}.schema', 'rb')
-		# table_schema = pickle.load(input_stream)
-		# input_stream.close()
-		table_schema = load_json(f'{work_folder}/{table_name}.schema')
-
-		# always load table pk
-		# input_stream = open(f'{work_folder}/{table_name}.pk')
-		# table_pk = input_stream.read().strip()
-		# input_stream.close()
-		table_pk = load_text(f'{work_folder}/{table_name}.pk').strip()
-
-		# extend table object with table table and column names from table_schema object
-		table_object.table_name = table_name
-		table_object.column_names = [column_name for column_name in table_schema.columns]
-
-		# if drop_table, drop table and exit
-		if table_object.drop_table:
-			logger.info(f'Table drop request; table_drop=1')
-			db_conn.drop_table(namespace, table_name)
-			return
-
-		# convert table schema to our target database and add extended column definitions
-		extended_definitions = 'udp_jobid int, udp_timestamp datetime2'.split(',')
-		convert_to_mssql(table_schema, extended_definitions)
-
-		# 2018-09-12 support custom staging table type overrides
-		# [table].table_type = < blank > | standard, columnar, memory, columnar - memory
-
-
-		# create target table if it doesn't exist
-		if not db_conn.does_table_exist(namespace, table_name):
-			# FUTURE: Add udp_pk, udp_nk, udp_nstk and other extended columns
-			logger.info(f'Creating table: {namespace}.{table_name}')
-			db_conn.create_table_from_table_schema(namespace, table_name, table_schema, extended_definitions)
-
-		# handle cdc vs non-cdc table workflows differently
-		logger.debug(f'{table_name}.cdc={table_object.cdc}, timestamp={table_object.timestamp}')
-		if not table_object.cdc or table_object.cdc.lower() == 'none' or not table_pk:
-			# if table cdc=none, drop the target table
-			logger.info(f'Table cdc=[{table_object.cdc}]; rebuilding table')
-			db_conn.drop_table(namespace, table_name)
-
-			# no cdc in effect for this table - insert directly to target table
-			work_folder_obj = pathlib.Path(work_folder)
-			batch_number = 0
-			for json_file in sorted(work_folder_obj.glob(f'{table_name}#*.json')):
-				# load rows from json file
-				# input_stream = open(json_file)
-				# rows = json.load(input_stream)
-				# input_stream.close()
-				rows = load_json(json_file)
-
-				# insert/upsert/merge *.json into target tables
-				if not rows:
-					logger.info(f'Table {table_name} has 0 rows; no updates')
-				else:
+	# fastest bulk load method supported by target database
+	loader = bulk_loader(db_conn)
+
+	# drop any database objects (eg. table types) the loader created, including when staging fails
+	try:
+		# process all table files in our work folder
+		for file_name in sorted(glob.glob(f'{work_folder}/*.table')):
+			table_name = pathlib.Path(file_name).stem
+			logger.info(f'Processing {table_name} ...')
+
+			# TODO: rename files to use a _table, _schema suffix and .json file extension
+
+			# always load table objects
+			# input_stream = open(f'{work_folder}/{table_name}.table', 'rb')
+			# table_object = pickle.load(input_stream)
+			# input_stream.close()
+			table_object = load_json(f'{work_folder}/{table_name}.table')
+
+			# always load table schema
+			# input_stream = open(f'{work_folder}/{table_name}.schema', 'rb')
+			# table_schema = pickle.load(input_stream)
+			# input_stream.close()
+			table_schema = load_json(f'{work_folder}/{table_name}.schema')
+
+			# capture's sidecarred large object columns; packages predating the recorded list derive it from the
+			# source schema before its columns are converted (and resized) for the target database
+			lob_column_indexes = getattr(table_schema, 'lob_columns', None)
+			if lob_column_indexes is None:
+				lob_column_indexes = lob_columns(table_schema)
+
+			# always load table pk
+			# input_stream = open(f'{work_folder}/{table_name}.pk')
+			# table_pk = input_stream.read().strip()
+			# input_stream.close()
+			table_pk = load_text(f'{work_folder}/{table_name}.pk').strip()
+
+			# extend table object with table table and column names from table_schema object
+			table_object.table_name = table_name
+			table_object.column_names = [column_name for column_name in table_schema.columns]
+
+			# if drop_table, drop table and exit
+			if table_object.drop_table:
+				logger.info(f'Table drop request; table_drop=1')
+				db_conn.drop_table(namespace, table_name)
+				return
+
+			# row delta snapshot tables have deleted row hashes and an extra udp_rowhash column
+			row_delta = None
+			if pathlib.Path(f'{work_folder}/{table_name}.delta').exists():
+				with open(f'{work_folder}/{table_name}.delta') as input_stream:
+					row_delta = json.load(input_stream)
+
+			# convert table schema to our target database and add extended column definitions
+			extended_definitions = 'udp_jobid int, udp_timestamp datetime2'.split(',')
+			if row_delta:
+				extended_definitions.append('udp_rowhash bigint')
+			# capture's optional per-column statistics size columns and identify all-null columns
+			column_stats = None
+			null_columns = None
+			if pathlib.Path(f'{work_folder}/{table_name}.stats').exists():
+				with open(f'{work_folder}/{table_name}.stats') as input_stream:
+					table_stats = json.load(input_stream)
+				column_stats = table_stats['columns']
+				null_columns = {
+					column_name for column_name, column_stat in column_stats.items()
+					if column_stat['null_count'] == table_stats['row_count']
+				}
+
+			# cdc none (or pk-less) tables are rebuilt every run so their nvarchars can be sized by this run's stats;
+			# persistent cdc and row delta targets keep default lengths so later runs' longer values still fit
+			is_rebuilt = not row_delta and (not table_object.cdc or table_object.cdc.lower() == 'none' or not table_pk)
+			convert_to_mssql(table_schema, extended_definitions, column_stats if is_rebuilt else None)
+
+			# 2018-09-12 support custom staging table type overrides
+			# [table].table_type = < blank > | standard, columnar, memory, columnar - memory
+
+
+			# create target table if it doesn't exist
+			if not db_conn.does_table_exist(namespace, table_name):
+				# FUTURE: Add udp_pk, udp_nk, udp_nstk and other extended columns
+				logger.info(f'Creating table: {namespace}.{table_name}')
+				db_conn.create_table_from_table_schema(namespace, table_name, table_schema, extended_definitions)
+
+			# handle cdc vs non-cdc table workflows differently
+			logger.debug(f'{table_name}.cdc={table_object.cdc}, timestamp={table_object.timestamp}')
+			if row_delta:
+				apply_row_delete(db_conn, loader, namespace, table_name, table_schema, extended_definitions, row_delta)
+
+			if row_delta or is_rebuilt:
+				# if table cdc=none, drop the target table; row delta tables only receive their inserted rows
+				if is_rebuilt:
+					logger.info(f'Table cdc=[{table_object.cdc}]; rebuilding table')
+					db_conn.drop_table(namespace, table_name)
+
+				# no cdc in effect for this table - insert directly to target table
+				batch_number = 0
+				for batch_file in batch_files(work_folder, table_name):
+					# stream rows from json or columnar batch file into target table
 					batch_number += 1
-					logger.info(f'Job {job_id}, batch {batch_number}, table {table_name}')
-
-					# convert date/datetime columns to date/datetime values
-					convert_data_types(rows, table_schema)
+					rows = stream_batch(batch_file, table_schema, null_columns, lob_column_indexes)
+					row_count = loader.load(namespace, table_name, table_schema, rows)
+					if not row_count:
+						logger.info(f'Table {table_name} has 0 rows; no updates')
+					else:
+						logger.info(f'Job {job_id}, batch {batch_number}, table {table_name}, {row_count:,} rows')
 
-					# db_conn.insert_many( namespace, table_name, rows )
-					db_conn.bulk_insert_into_table(namespace, table_name, table_schema, rows)
-
-		else:
-			# table has cdc updates
-
-			# create temp table to receive captured changes
-			# FUTURE: Create a database wrapper function for creating 'portable' temp table names vs hard-coding '#'.
-			temp_table_name = f'_{table_name}'
-			db_conn.drop_table(namespace, temp_table_name)
-
-			# print(f'namespace = {namespace}')
-			# print(f'temp_table_name = {temp_table_name}')
-			# print(f'table_object = {dir(table_object)}')
-			# print(f'extended definitions = {extended_definitions}')
-
-			db_conn.create_table_from_table_schema(namespace, temp_table_name, table_schema, extended_definitions)
-
-			# insert captured updates into temp table
-			work_folder_obj = pathlib.Path(work_folder)
-			batch_number = 0
-			for json_file in sorted(work_folder_obj.glob(f'{table_name}#*.json')):
-				# load rows from json file
-				# input_stream = open(json_file)
-				# rows = json.load(input_stream)
-				# input_stream.close()
-				rows = load_json(json_file)
-
-				# insert/upsert/merge *.json into target tables
-				if not rows:
-					logger.info(f'Table {table_name} has 0 rows; no updates')
-					break
-				else:
-					batch_number += 1
-					logger.info(f'Job {job_id}, batch {batch_number}, table {table_name}')
+			else:
+				# table has cdc updates
 
-					# convert date/datetime columns to date/datetime values
-					convert_data_types(rows, table_schema)
+				# create temp table to receive captured changes
+				# FUTURE: Create a database wrapper function for creating 'portable' temp table names vs hard-coding '#'.
+				temp_table_name = f'_{table_name}'
+				db_conn.drop_table(namespace, temp_table_name)
 
-					# db_conn.insert_many( namespace, table_name, rows )
-					db_conn.bulk_insert_into_table(namespace, temp_table_name, table_schema, rows)
-			else:
-				# merge (upsert) temp table to target table
-				merge_cdc = cdc_merge.MergeCDC(table_object, extended_definitions)
-				sql_command = merge_cdc.merge(namespace, table_pk)
+				# print(f'namespace = {namespace}')
+				# print(f'temp_table_name = {temp_table_name}')
+				# print(f'table_object = {dir(table_object)}')
+				# print(f'extended definitions = {extended_definitions}')
 
-				# TODO: Capture SQL commands in a sql specific log.
-				logger.debug(sql_command)
-				db_conn.cursor.execute(sql_command)
+				db_conn.create_table_from_table_schema(namespace, temp_table_name, table_schema, extended_definitions)
 
-			# drop temp table after merge
-			db_conn.drop_table(namespace, temp_table_name)
+				# insert captured updates into temp table
+				batch_number = 0
+				for batch_file in batch_files(work_folder, table_name):
+					# stream rows from json or columnar batch file into temp table
+					batch_number += 1
+					rows = stream_batch(batch_file, table_schema, null_columns, lob_column_indexes)
+					row_count = loader.load(namespace, temp_table_name, table_schema, rows)
+					if not row_count:
+						logger.info(f'Table {table_name} has 0 rows; no updates')
+						break
+					else:
+						logger.info(f'Job {job_id}, batch {batch_number}, table {table_name}, {row_count:,} rows')
+				else:
+					# merge (upsert) temp table to target table
+					merge_cdc = cdc_merge.MergeCDC(table_object, extended_definitions)
+					sql_command = merge_cdc.merge(namespace, table_pk)
+
+					# TODO: Capture SQL commands in a sql specific log.
+					logger.debug(sql_command)
+					db_conn.cursor.execute(sql_command)
+
+				# drop temp table after merge
+				db_conn.drop_table(namespace, temp_table_name)
+	finally:
+		loader.close()
 
 
 def process_next_file_to_stage(db_conn, archive_objectstore, stage_queue):
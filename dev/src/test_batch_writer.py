@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_batch_writer.py
+"""
+
+
+# standard libs
+import datetime
+import decimal
+import itertools
+import json
+import threading
+import zipfile
+
+
+# common lib
+from common import hash_files
+
+
+# udp classes
+import batch_writer as batch_writer_module
+from batch_writer import BatchWriter
+from batch_writer import CopyBatchWriter
+from capture_package import CapturePackage
+
+
+# 3rd party libs
+import pytest
+
+
+# sample rows: an int, str, decimal, datetime, and null column
+rows = [
+	(row_number, f'name {row_number}', decimal.Decimal('1.25'), datetime.datetime(2018, 9, 27, 12, 0, row_number % 60), None)
+	for row_number in range(1, 26)
+]
+
+
+def read_batch_rows(file_names):
+	batch_rows = list()
+	for file_name in file_names:
+		with open(file_name) as input_stream:
+			batch_rows.extend(json.load(input_stream))
+	return batch_rows
+
+
+def test_batch_files(tmp_path):
+	with BatchWriter(str(tmp_path), 'customer', 10) as batch_writer:
+		batch_writer.write_rows(rows)
+
+	# batches roll every batch_size rows and are numbered from 1
+	assert [file_name.split('/')[-1] for file_name in batch_writer.file_names] == [
+		'customer#0001.json', 'customer#0002.json', 'customer#0003.json'
+	]
+	assert batch_writer.batch_sizes == [10, 10, 5]
+	assert batch_writer.row_count == len(rows)
+	assert batch_writer.file_size == sum((tmp_path / f'customer#{n:04}.json').stat().st_size for n in (1, 2, 3))
+
+	# batch files are json arrays of rows
+	batch_rows = read_batch_rows(batch_writer.file_names)
+	assert len(batch_rows) == len(rows)
+	assert batch_rows[0][:2] == [1, 'name 1']
+	assert batch_rows[-1][-1] is None
+
+
+def test_no_rows(tmp_path):
+	# batch files are only created when there are rows to write
+	with BatchWriter(str(tmp_path), 'customer', 10, hash_method_name='sha256') as batch_writer:
+		batch_writer.write_rows([])
+	assert batch_writer.file_names == []
+	assert batch_writer.row_count == 0
+	assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.parametrize('hash_method_name', ['sha256', 'md5'])
+def test_file_hash(tmp_path, hash_method_name):
+	with BatchWriter(str(tmp_path), 'customer', 10, hash_method_name=hash_method_name) as batch_writer:
+		batch_writer.write_rows(rows)
+
+	# running digest of batches matches a hash of the batch files written
+	assert batch_writer.file_hash == hash_files(f'{tmp_path}/customer#*.json', hash_method_name)
+
+
+def test_shared_batch_numbers(tmp_path):
+	# partition writers share a table's batch number sequence
+	batch_numbers = itertools.count(1)
+	batch_writers = [BatchWriter(str(tmp_path), 'customer', 10, batch_numbers=batch_numbers) for _ in range(2)]
+	for batch_writer in batch_writers:
+		with batch_writer:
+			batch_writer.write_rows(rows[:15])
+
+	file_names = sorted(file_name.name for file_name in tmp_path.iterdir())
+	assert file_names == [f'customer#{n:04}.json' for n in (1, 2, 3, 4)]
+	assert len(read_batch_rows(sorted(str(file_name) for file_name in tmp_path.iterdir()))) == 30
+
+
+def test_hash_method_none(tmp_path):
+	with BatchWriter(str(tmp_path), 'customer', 10) as batch_writer:
+		batch_writer.write_rows(rows)
+	assert batch_writer.file_hash is None
+
+
+# sample rows with large object values in columns 1 and 2
+lob_rows = [(row_number, f'text {row_number} é' * row_number, None if row_number % 3 else {'n': row_number}) for row_number in range(1, 26)]
+
+
+def read_lob_rows(batch_file_name, lob_data):
+	"""Return batch rows with [offset, length] references replaced by their sidecar values."""
+	batch_rows = list()
+	for row in read_batch_rows([batch_file_name]):
+		for column_index in (1, 2):
+			if row[column_index] is not None:
+				offset, length = row[column_index]
+				row[column_index] = lob_data[offset:offset + length].decode('UTF8')
+		batch_rows.append(row)
+	return batch_rows
+
+
+def test_lob_sidecars(tmp_path):
+	with BatchWriter(str(tmp_path), 'customer', 10, hash_method_name='sha256', lob_columns=[1, 2]) as batch_writer:
+		batch_writer.write_rows(lob_rows)
+
+	assert [file_name.split('/')[-1] for file_name in batch_writer.lob_file_names] == [
+		'customer#0001.lob', 'customer#0002.lob', 'customer#0003.lob'
+	]
+	file_names = batch_writer.file_names + batch_writer.lob_file_names
+	assert batch_writer.file_size == sum(tmp_path.joinpath(file_name.split('/')[-1]).stat().st_size for file_name in file_names)
+
+	batch_rows = list()
+	for file_name, lob_file_name in zip(batch_writer.file_names, batch_writer.lob_file_names):
+		with open(lob_file_name, 'rb') as input_stream:
+			batch_rows.extend(read_lob_rows(file_name, input_stream.read()))
+	expected_rows = [[row[0], row[1], json.dumps(row[2]) if row[2] else None] for row in lob_rows]
+	assert batch_rows == expected_rows
+
+
+def run_with_timeout(target, timeout=10):
+	"""Run target on a thread; fail vs hang if it deadlocks."""
+	exceptions = list()
+
+	def run():
+		try:
+			target()
+		except Exception as e:
+			exceptions.append(e)
+
+	thread = threading.Thread(target=run, daemon=True)
+	thread.start()
+	thread.join(timeout)
+	assert not thread.is_alive(), 'package deadlocked'
+	if exceptions:
+		raise exceptions[0]
+
+
+def read_package_rows(file_name, table_name):
+	batch_rows = list()
+	with zipfile.ZipFile(file_name) as zip_file:
+		member_names = sorted(member_name for member_name in zip_file.namelist() if member_name.endswith('.json'))
+		for member_name in member_names:
+			if not member_name.startswith(f'{table_name}#'):
+				continue
+			batch_file_name = zip_file.extract(member_name, f'{file_name}.extract')
+			lob_data = zip_file.read(member_name.replace('.json', '.lob'))
+			batch_rows.extend(read_lob_rows(batch_file_name, lob_data))
+	return batch_rows
+
+
+def test_spooled_batch_with_streamed_sidecar(tmp_path):
+	package = CapturePackage(tmp_path / 'capture.zip', str(tmp_path))
+	batch_writer = BatchWriter(str(tmp_path), 'customer', 10, package, 'sha256', lob_columns=[1, 2])
+
+	# another worker's member is streaming when batch opens so batch is spooled; it finishes before the
+	# sidecar opens so the sidecar streams, and the spooled batch closes while the sidecar holds the package
+	blocking_member = package.open_member('other#0001.json', 'wb')
+	open_lob_output = batch_writer.open_lob_output
+
+	def open_lob_output_after_other_member():
+		if not blocking_member.closed:
+			blocking_member.close()
+		open_lob_output()
+
+	batch_writer.open_lob_output = open_lob_output_after_other_member
+
+	def write_package():
+		with batch_writer:
+			batch_writer.write_rows(lob_rows)
+		package.close()
+
+	run_with_timeout(write_package)
+	expected_rows = [[row[0], row[1], json.dumps(row[2]) if row[2] else None] for row in lob_rows]
+	assert read_package_rows(tmp_path / 'capture.zip', 'customer') == expected_rows
+
+
+def test_concurrent_batch_writers(tmp_path):
+	package = CapturePackage(tmp_path / 'capture.zip', str(tmp_path), spool_size=1024)
+	batch_writers = [
+		BatchWriter(str(tmp_path), f'table{table_number}', 10, package, lob_columns=[1, 2]) for table_number in range(4)
+	]
+
+	def write_batches(batch_writer):
+		with batch_writer:
+			batch_writer.write_rows(lob_rows)
+
+	def write_package():
+		threads = [threading.Thread(target=write_batches, args=(batch_writer,)) for batch_writer in batch_writers]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		package.close()
+
+	run_with_timeout(write_package)
+	expected_rows = [[row[0], row[1], json.dumps(row[2]) if row[2] else None] for row in lob_rows]
+	for table_number in range(4):
+		assert read_package_rows(tmp_path / 'capture.zip', f'table{table_number}') == expected_rows
+
+
+@pytest.mark.parametrize('memory_used', [0, 2 ** 40])
+def test_memory_limit(tmp_path, monkeypatch, memory_used):
+	monkeypatch.setattr(batch_writer_module, 'process_memory_used', lambda: memory_used)
+	with BatchWriter(str(tmp_path), 'customer', 100, memory_limit=2 ** 30) as batch_writer:
+		batch_writer.sample_rows = 5
+		batch_writer.write_rows(rows)
+
+	# streaming writers' batches roll over early while process memory is over memory_limit
+	if memory_used:
+		assert batch_writer.batch_sizes == [5, 5, 5, 5, 5]
+	else:
+		assert batch_writer.batch_sizes == [25]
+	assert len(read_batch_rows(batch_writer.file_names)) == len(rows)
+
+
+def test_copy_memory_limit(tmp_path, monkeypatch):
+	monkeypatch.setattr(batch_writer_module, 'process_memory_used', lambda: 2 ** 40)
+	with CopyBatchWriter(str(tmp_path), 'customer', 100, memory_limit=2 ** 30) as batch_writer:
+		batch_writer.sample_rows = 5
+		# copy data arrives in chunks of rows that needn't align with sample_rows
+		for _ in range(4):
+			batch_writer.write_data(''.join(f'{row_number}\tname {row_number}\n' for row_number in range(3)))
+
+	assert batch_writer.batch_sizes == [6, 6]
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_bulk_load.py
+"""
+
+
+# standard libs
+import datetime
+import decimal
+
+
+# udp classes
+from bulk_load import CopyStream
+from bulk_load import TableValuedParameterLoader
+from bulk_load import copy_value
+
+
+# 3rd party libs
+import pytest
+
+
+def test_copy_value():
+	assert copy_value(None) == '\\N'
+	assert copy_value(True) == 't'
+	assert copy_value(False) == 'f'
+	assert copy_value(42) == '42'
+	assert copy_value(decimal.Decimal('1.25')) == '1.25'
+	assert copy_value(datetime.datetime(2018, 9, 27, 12, 30, 15, 250)) == '2018-09-27T12:30:15.000250'
+	assert copy_value(datetime.date(2018, 9, 27)) == '2018-09-27'
+	assert copy_value(b'\x00\xff') == '\\\\x00ff'
+	assert copy_value({'name': 'a\tb'}) == '{"name": "a\\\\tb"}'
+
+
+def test_copy_value_escapes():
+	# copy's delimiter, row terminator and escape characters are backslash escaped; the text '\N' isn't null
+	assert copy_value('a\tb\nc\rd\\e') == 'a\\tb\\nc\\rd\\\\e'
+	assert copy_value('\\N') == '\\\\N'
+
+
+def test_copy_stream():
+	rows = [(1, 'name 1', None), (2, 'line 1\nline 2', True)]
+	expected = '1\tname 1\t\\N\n2\tline 1\\nline 2\tt\n'
+	assert CopyStream(rows).read() == expected
+
+	# sized reads return the same text in pieces and count rows as they're rendered
+	copy_stream = CopyStream(rows)
+	pieces = list()
+	while piece := copy_stream.read(5):
+		assert len(piece) <= 5
+		pieces.append(piece)
+	assert ''.join(pieces) == expected
+	assert copy_stream.row_count == 2
+	assert CopyStream([]).read(5) == ''
+
+
+class TableSchema:
+
+	columns = dict(id=None, name=None)
+
+	@staticmethod
+	def column_definitions():
+		return ['id int', 'name nvarchar(max)']
+
+
+class Cursor:
+
+	def __init__(self, db_conn):
+		self.db_conn = db_conn
+
+	def execute(self, sql_command, parameters=None):
+		self.db_conn.commands.append(sql_command)
+		if parameters and self.db_conn.fail_inserts:
+			raise RuntimeError('insert failed')
+
+
+class Conn:
+
+	def commit(self):
+		pass
+
+	def rollback(self):
+		pass
+
+
+class DBConn:
+
+	"""Database double recording rendered command names and their table type names."""
+
+	def __init__(self):
+		self.commands = list()
+		self.fail_inserts = False
+		self.cursor = Cursor(self)
+		self.conn = Conn()
+
+	def render(self, command_name, parameters):
+		return f"{command_name} {parameters.get('type_name', '')}".strip()
+
+	def log(self, command_name, sql_command):
+		pass
+
+
+def test_table_type_per_table():
+	db_conn = DBConn()
+	loader = TableValuedParameterLoader(db_conn, chunk_size=2)
+	rows = [(1, 'a'), (2, 'b'), (3, 'c')]
+	assert loader.load('dbo', 'customer', TableSchema, rows) == 3
+	assert loader.load('dbo', 'customer', TableSchema, rows) == 3
+
+	# type is created on table's first load, re-used by its later batches, and dropped when loader closes
+	assert db_conn.commands.count('create_table_type customer_tvp') == 1
+	assert db_conn.commands.count('insert_from_table_type customer_tvp') == 4
+	db_conn.commands.clear()
+	loader.close()
+	assert db_conn.commands == ['drop_table_type customer_tvp']
+	assert loader.table_types == dict()
+
+
+def test_failed_load_drops_table_type():
+	db_conn = DBConn()
+	db_conn.fail_inserts = True
+	loader = TableValuedParameterLoader(db_conn)
+	with pytest.raises(RuntimeError):
+		loader.load('dbo', 'customer', TableSchema, [(1, 'a')])
+	assert db_conn.commands[-1] == 'drop_table_type customer_tvp'
+	assert loader.table_types == dict()
@@ -0,0 +1,398 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_capture_2.py
+"""
+
+
+# standard libs
+import datetime
+import json
+import pickle
+import threading
+import types
+import zipfile
+
+
+# udp classes
+from batch_writer import BatchWriter
+from capture_package import CapturePackage
+import capture_package
+import cdc_select
+from capture_2 import CaptureDaemon
+from capture_2 import JobHistory
+from capture_2 import Stats
+from capture_2 import TableHistory
+from capture_2 import predict_run_time
+from section import SectionTable
+
+
+class QueryTimeout(Exception):
+	pass
+
+
+class Cursor:
+
+	def __init__(self, db):
+		self.db = db
+		self.rows = list()
+
+	def execute(self, sql):
+		self.db.sqls.append(sql)
+		if self.db.query_timeout and sql in self.db.slow_sqls:
+			raise QueryTimeout(sql)
+		self.rows = [(len(self.db.sqls), sql)]
+
+	def __iter__(self):
+		return iter(self.rows)
+
+	def close(self):
+		pass
+
+
+class DB:
+
+	"""Source connection double; selects of slow_sqls time out when a query timeout is set."""
+
+	def __init__(self, slow_sqls=()):
+		self.slow_sqls = set(slow_sqls)
+		self.sqls = list()
+		self.query_timeout = 0
+
+	def set_query_timeout(self, seconds):
+		self.query_timeout = seconds
+
+	def capture_cursor(self, cursor_name='', itersize=0):
+		return Cursor(self)
+
+	@staticmethod
+	def is_query_timeout(exception):
+		return isinstance(exception, QueryTimeout)
+
+	def reset_query(self):
+		pass
+
+
+class SelectCDC:
+
+	"""Renders a select as its window and partition condition."""
+
+	@staticmethod
+	def select(job_id, current_timestamp, last_timestamp, current_rowversion=None, last_rowversion=None, partition_condition=''):
+		return f'{last_timestamp:%H:%M}-{current_timestamp:%H:%M} {partition_condition}'.strip()
+
+
+def capture_daemon(db):
+	"""Return a capture daemon whose connections are db."""
+	capture = CaptureDaemon.__new__(CaptureDaemon)
+	capture.job_id = 1
+	capture.project = types.SimpleNamespace(server_cursor='0')
+	# stats without session info (eg. login name, unavailable without a terminal)
+	capture.stats = Stats.__new__(Stats)
+	capture.stats.stats = dict()
+	capture.stats.lock = threading.RLock()
+	capture.stats.start('customer', 'table')
+	capture.stats.save = lambda: None
+	capture.lock = threading.Lock()
+	capture.connect = lambda: (db, None)
+	capture.disconnect = lambda _: None
+	return capture
+
+
+table_object = types.SimpleNamespace(query_timeout='30', min_window_minutes='60', timestamp='updated', cdc='timestamp')
+cdc_window = (datetime.datetime(2018, 9, 27, 12), datetime.datetime(2018, 9, 27, 8), None, None)
+
+
+def test_partition_window_split(tmp_path):
+	# partition's 08:00-12:00 window times out and is split in half, keeping its partition condition
+	db = DB(slow_sqls=['08:00-12:00 id < 100'])
+	capture = capture_daemon(db)
+	batch_writer = BatchWriter(str(tmp_path), 'customer', 10)
+	capture.extract_partition('customer', table_object, 1, SelectCDC(), cdc_window, 'id < 100', batch_writer)
+
+	assert db.query_timeout == 30
+	assert db.sqls == ['08:00-12:00 id < 100', '08:00-10:00 id < 100', '10:00-12:00 id < 100']
+	assert batch_writer.row_count == 2
+	assert capture.stats.stats['customer'].timeout_count == 1
+	assert capture.stats.stats['customer'].split_count == 1
+
+
+def table_schema(**data_types):
+	columns = {column_name: types.SimpleNamespace(data_type=data_type) for column_name, data_type in data_types.items()}
+	return types.SimpleNamespace(columns=columns)
+
+
+def partition_table(**attributes):
+	return types.SimpleNamespace(**dict(dict(partitions='4', partition_key='', timestamp='updated'), **attributes))
+
+
+def test_partition_column():
+	schema = table_schema(ID='bigint', guid='uniqueidentifier', updated='datetime2')
+	assert CaptureDaemon.partition_column('customer', partition_table(), 'id', schema) == 'id'
+	assert CaptureDaemon.partition_column('customer', partition_table(), 'id, guid', schema) == 'updated'
+	assert CaptureDaemon.partition_column('customer', partition_table(partitions='1'), 'id', schema) == ''
+
+	# key types partition boundaries can't split are extracted via a single select without a range probe
+	assert CaptureDaemon.partition_column('customer', partition_table(), 'guid', schema) == ''
+	assert CaptureDaemon.partition_column('customer', partition_table(partition_key='s.guid'), '', schema) == ''
+
+
+class ProbeCursor:
+
+	def __init__(self, row_count):
+		self.row_count = row_count
+		self.sqls = list()
+
+	def execute(self, sql):
+		self.sqls.append(sql)
+
+	def fetchone(self):
+		return (min(self.row_count, 1),)
+
+
+class DBEngine:
+
+	def __init__(self, row_count=0):
+		self.cursor = ProbeCursor(row_count)
+
+	def log(self, command_name, sql_command):
+		pass
+
+
+def probe_capture(db_engine, **table_attributes):
+	"""Return (capture, table object) for a customer table whose cdc window is probed; checkpoints are recorded."""
+	capture = capture_daemon(DB())
+	capture.database = types.SimpleNamespace(platform='mssql')
+	capture.table_schemas = dict(customer=table_schema(id='int', name='nvarchar', updated='datetime2'))
+	capture.table_pks = dict(customer='id')
+	capture.current_rowversion = 3000
+	capture.checkpoints = list()
+	capture.checkpoint_table = lambda *args: capture.checkpoints.append(args)
+
+	table_object = SectionTable('customer')
+	table_object.change_probe = '1'
+	for name, value in table_attributes.items():
+		setattr(table_object, name, value)
+	return capture, table_object
+
+
+def test_rowversion_probe():
+	db_engine = DBEngine(row_count=0)
+	capture, table_object = probe_capture(db_engine, cdc='rowversion', rowversion='rv', first_rowversion='0x00000000000007D1')
+	table_history = TableHistory('customer')
+	capture.process_table(None, db_engine, 'dbo', 'customer', table_object, table_history, cdc_window[0])
+
+	# first rowversion (SQL Server hex display format) starts table's rowversion window
+	assert 'cast(cast(2001 as bigint) as binary(8))' in db_engine.cursor.sqls[0]
+	assert 'cast(cast(3000 as bigint) as binary(8))' in db_engine.cursor.sqls[0]
+
+	# unchanged window is checkpointed at job's rowversion bound without an extract
+	assert table_history.last_rowversion == 3000
+	assert table_history.run_time is not None
+	assert [checkpoint[2:6] for checkpoint in capture.checkpoints] == [(0, 0, 0, dict())]
+
+
+def test_recover_table(tmp_path, monkeypatch):
+	# failed run's partial package holds a checkpointed table's members
+	failed_package = CapturePackage(tmp_path / 'failed.zip', str(tmp_path))
+	for member_name in ('customer#0001.json', 'customer.table'):
+		with failed_package.open_member(member_name, 'wb') as output_stream:
+			output_stream.write(member_name.encode() * 100)
+	members = [
+		dict(failed_package.member_record(member_name), row_count=None) for member_name in ('customer#0001.json', 'customer.table')
+	]
+	failed_package.close()
+	table_checkpoint = dict(
+		last_timestamp=cdc_window[0], last_rowversion=None, last_filehash=None, row_count=10, file_size=1024,
+		batch_size=1000, members=members, schema_hash='', run_time=12.5
+	)
+
+	capture = capture_daemon(DB())
+	capture.package = CapturePackage(tmp_path / 'capture.zip', str(tmp_path))
+	capture.recover_file_name = tmp_path / 'failed.zip'
+	capture.job_row_count = capture.job_file_size = 0
+	capture.checkpoints = list()
+	capture.checkpoint_table = lambda *args: capture.checkpoints.append(args)
+
+	member_reads = list()
+	read_partial_member = capture_package.read_partial_member
+
+	def count_reads(file_name, member):
+		member_reads.append(member['member_name'])
+		return read_partial_member(file_name, member)
+
+	monkeypatch.setattr(capture_package, 'read_partial_member', count_reads)
+	table_history = TableHistory('customer')
+	assert capture.recover_table('customer', table_history, table_checkpoint)
+	capture.package.close()
+
+	# each member is read once; table's history gets its checkpointed run time for scheduling
+	assert member_reads == ['customer#0001.json', 'customer.table']
+	with zipfile.ZipFile(tmp_path / 'capture.zip') as zip_file:
+		assert zip_file.read('customer.table') == b'customer.table' * 100
+	assert table_history.last_timestamp == cdc_window[0]
+	assert table_history.run_time == 12.5
+	assert table_history.row_count == 10
+	assert capture.job_row_count == 10
+
+
+def test_timestamp_probe():
+	db_engine = DBEngine(row_count=0)
+	capture, table_object = probe_capture(db_engine, cdc='timestamp', timestamp='updated', first_timestamp='2018-09-27 08:00')
+	table_history = TableHistory('customer')
+	capture.process_table(None, db_engine, 'dbo', 'customer', table_object, table_history, cdc_window[0])
+
+	# probe checks for rows in table's timestamp window
+	[sql] = db_engine.cursor.sqls
+	assert 'exists' in sql
+	assert "'2018-09-27 08:00:00'" in sql
+	assert "'2018-09-27 12:00:00'" in sql
+
+	# unchanged window is checkpointed without an extract; next job's window starts at this job's timestamp
+	assert table_history.last_timestamp == cdc_window[0]
+	assert [checkpoint[2:6] for checkpoint in capture.checkpoints] == [(0, 0, 0, dict())]
+
+
+def probe_select_cdc(**table_attributes):
+	table_object = SectionTable('customer')
+	table_object.schema_name = 'dbo'
+	table_object.table_name = 'customer'
+	table_object.column_names = ['id', 'name', 'updated']
+	for name, value in table_attributes.items():
+		setattr(table_object, name, value)
+	return cdc_select.SelectCDC(table_object)
+
+
+def test_has_changes():
+	# windows with rows are extracted
+	db_engine = DBEngine(row_count=5)
+	select_cdc = probe_select_cdc(cdc='timestamp', timestamp='updated')
+	assert CaptureDaemon.has_changes(db_engine, select_cdc, cdc_window)
+	assert len(db_engine.cursor.sqls) == 1
+
+	# tables without a cdc window (eg. cdc=none snapshots) always have changes and aren't probed
+	db_engine = DBEngine(row_count=0)
+	select_cdc = probe_select_cdc(cdc='none')
+	assert select_cdc.select_probe(*cdc_window) == ''
+	assert CaptureDaemon.has_changes(db_engine, select_cdc, cdc_window)
+	assert db_engine.cursor.sqls == []
+
+
+def test_backfill_windows():
+	db_engine = DBEngine(row_count=0)
+	capture, table_object = probe_capture(
+		db_engine, cdc='timestamp', timestamp='updated', first_timestamp='2018-09-20', backfill_days='2'
+	)
+	capture.is_pending_work = False
+	table_history = TableHistory('customer')
+
+	# first-time load is captured in a backfill_days window and next job is requested without waiting for schedule
+	capture.process_table(None, db_engine, 'dbo', 'customer', table_object, table_history, cdc_window[0])
+	assert "'2018-09-20 00:00:00'" in db_engine.cursor.sqls[-1]
+	assert "'2018-09-22 00:00:00'" in db_engine.cursor.sqls[-1]
+	assert table_history.last_timestamp == datetime.datetime(2018, 9, 22)
+	assert capture.is_pending_work
+
+	# each job resumes at previous window's end; the final window ends at job's current timestamp
+	capture.is_pending_work = False
+	table_history.last_timestamp = datetime.datetime(2018, 9, 26)
+	capture.process_table(None, db_engine, 'dbo', 'customer', table_object, table_history, cdc_window[0])
+	assert "'2018-09-26 00:00:00'" in db_engine.cursor.sqls[-1]
+	assert "'2018-09-27 12:00:00'" in db_engine.cursor.sqls[-1]
+	assert table_history.last_timestamp == cdc_window[0]
+	assert not capture.is_pending_work
+
+
+def test_predict_run_time():
+	# each table starts on the first worker to finish
+	assert predict_run_time([], 4) == 0
+	assert predict_run_time([10, 20, 30], 1) == 60
+	assert predict_run_time([30, 20, 10], 2) == 30
+	assert predict_run_time([10, 20, 30], 2) == 40
+
+
+def job_history(**run_times):
+	history = JobHistory('capture_history')
+	for table_name, run_time in run_times.items():
+		history.get_table_history(table_name).run_time = run_time
+	return history
+
+
+def schedule_capture(*table_names):
+	capture = capture_daemon(DB())
+	capture.table_config = types.SimpleNamespace(sections={table_name: SectionTable(table_name) for table_name in table_names})
+	return capture
+
+
+def test_schedule_tables():
+	capture = schedule_capture('customer', 'orders', 'product', 'region')
+	history = job_history(customer=10, orders=30, region=20)
+
+	# tables without run time history first, then longest expected run time first
+	tables, predicted_run_time = capture.schedule_tables(history, 2)
+	assert [table_name for table_name, _ in tables] == ['product', 'orders', 'region', 'customer']
+	assert predicted_run_time == 30
+
+	# sequential jobs keep table config order
+	tables, predicted_run_time = capture.schedule_tables(history, 1)
+	assert [table_name for table_name, _ in tables] == ['customer', 'orders', 'product', 'region']
+	assert predicted_run_time == 60
+
+
+def test_table_history_run_time():
+	table_history = TableHistory('customer')
+	table_history.track_run_time(10, 100)
+	table_history.track_run_time(20, 200)
+	assert (table_history.run_time, table_history.row_count) == (15, 200)
+
+	# histories pickled before run times were tracked default to no run time history
+	state = dict(table_name='customer', last_timestamp=cdc_window[0], last_rowversion=None, last_filehash=None)
+	table_history = TableHistory.__new__(TableHistory)
+	table_history.__setstate__(state)
+	assert table_history.last_timestamp == cdc_window[0]
+	assert table_history.run_time is None
+	assert pickle.loads(pickle.dumps(table_history)).run_time is None
+
+
+def test_manifest(tmp_path):
+	capture = capture_daemon(DB())
+	capture.namespace = 'sales'
+	capture.work_folder_name = str(tmp_path / 'work')
+	capture.state_folder_name = str(tmp_path / 'state')
+	(tmp_path / 'work').mkdir()
+	capture.zip_file_name = str(tmp_path / 'capture.zip')
+	capture.package = CapturePackage(capture.zip_file_name, capture.work_folder_name)
+	capture.manifest_tables = dict()
+	capture.checkpoint = types.SimpleNamespace(save=lambda *args: None)
+
+	# completed table's batches and table files are described by manifest's tables and members
+	with BatchWriter(capture.work_folder_name, 'customer', 2, package=capture.package) as batch_writer:
+		batch_writer.write_rows([[1, 'a'], [2, 'b'], [3, 'c']])
+	for file_ext in ('table', 'schema', 'pk'):
+		(tmp_path / 'work' / f'customer.{file_ext}').write_text(file_ext)
+	batch_members = zip(batch_writer.file_names, batch_writer.batch_sizes)
+	capture.checkpoint_table('customer', TableHistory('customer'), 3, batch_writer.file_size, 2, batch_members, 'abc')
+	(tmp_path / 'work' / 'job.log').write_text('log')
+	capture.close_package()
+
+	with zipfile.ZipFile(tmp_path / 'capture.zip') as zip_file:
+		manifest = json.loads(zip_file.read('manifest.json'))
+		member_infos = zip_file.infolist()
+
+	assert (manifest['namespace'], manifest['job_id']) == ('sales', 1)
+	assert manifest['tables'] == dict(customer=dict(
+		schema_hash='abc', row_count=3, file_size=batch_writer.file_size,
+		members=['customer#0001.json', 'customer#0002.json', 'customer.table', 'customer.schema', 'customer.pk']
+	))
+
+	# manifest is package's last member and locates all others
+	assert member_infos[-1].filename == 'manifest.json'
+	assert [
+		(member['member_name'], member['header_offset'], member['compress_size'], member['file_size'], member['crc'])
+		for member in manifest['members']
+	] == [
+		(member_info.filename, member_info.header_offset, member_info.compress_size, member_info.file_size, member_info.CRC)
+		for member_info in member_infos[:-1]
+	]
+	assert 'job.log' in [member['member_name'] for member in manifest['members']]
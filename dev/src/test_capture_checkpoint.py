@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_capture_checkpoint.py
+"""
+
+
+# standard libs
+import datetime
+import shutil
+import sqlite3
+import zipfile
+
+
+# udp classes
+from capture_checkpoint import CaptureCheckpoint
+from capture_package import CapturePackage
+from capture_package import read_partial_member
+
+
+# 3rd party libs
+import pytest
+
+
+class TableHistory:
+
+	def __init__(self, table_name, last_timestamp=None, last_rowversion=None, last_filehash=None, run_time=None):
+		self.table_name = table_name
+		self.last_timestamp = last_timestamp
+		self.last_rowversion = last_rowversion
+		self.last_filehash = last_filehash
+		self.run_time = run_time
+
+
+def test_save_and_load(tmp_path):
+	checkpoint = CaptureCheckpoint(tmp_path / 'capture_checkpoint.db')
+	last_timestamp = datetime.datetime(2018, 9, 27, 12, 30, 15)
+	members = [dict(member_name='Customer#0001.json', row_count=10)]
+	checkpoint.save(7, TableHistory('Customer', last_timestamp, 2 ** 40, 'abc', 12.5), 10, 1024, 1000, members, 'schema')
+	checkpoint.save(7, TableHistory('Orders'), 0, 0, 0, list())
+	checkpoint.save(8, TableHistory('Other'), 0, 0, 0, list())
+	checkpoint.close()
+
+	# checkpoints survive a restart and are keyed by lowercase table name
+	checkpoint = CaptureCheckpoint(tmp_path / 'capture_checkpoint.db')
+	table_checkpoints = checkpoint.load(7)
+	assert sorted(table_checkpoints) == ['customer', 'orders']
+	assert table_checkpoints['customer'] == dict(
+		last_timestamp=last_timestamp, last_rowversion=2 ** 40, last_filehash='abc', row_count=10, file_size=1024,
+		batch_size=1000, members=members, schema_hash='schema', run_time=12.5
+	)
+	assert table_checkpoints['orders']['last_timestamp'] is None
+	assert table_checkpoints['orders']['last_rowversion'] is None
+
+	checkpoint.clear()
+	assert checkpoint.load(7) == dict()
+	checkpoint.close()
+
+
+def test_checkpoint_from_earlier_version(tmp_path):
+	# checkpoint files written before run times were checkpointed gain a run_time column
+	conn = sqlite3.connect(tmp_path / 'capture_checkpoint.db')
+	with conn:
+		conn.execute(
+			'create table table_checkpoint (job_id integer not null, table_name text not null, last_timestamp text, '
+			'last_rowversion text, last_filehash text, row_count integer, file_size integer, batch_size integer, '
+			'members text, schema_hash text, primary key (job_id, table_name))'
+		)
+		conn.execute("insert into table_checkpoint values (7, 'customer', null, null, null, 10, 1024, 1000, '[]', '')")
+	conn.close()
+
+	checkpoint = CaptureCheckpoint(tmp_path / 'capture_checkpoint.db')
+	assert checkpoint.load(7)['customer']['run_time'] is None
+	checkpoint.save(7, TableHistory('Orders', run_time=3.0), 0, 0, 0, list())
+	assert checkpoint.load(7)['orders']['run_time'] == 3.0
+	checkpoint.close()
+
+
+def test_resume_from_partial_package(tmp_path):
+	# failed run: a table's members are checkpointed but its package is never closed
+	package = CapturePackage(tmp_path / 'failed.zip', str(tmp_path))
+	with package.open_member('customer#0001.json', 'wb') as output_stream:
+		output_stream.write(b'[\n[1,"name 1"]\n]\n' * 100)
+	with package.open_member('customer#0001.lob', 'wb') as output_stream:
+		output_stream.write(b'large object')
+	members = [package.member_record(member_name) for member_name in ('customer#0001.json', 'customer#0001.lob')]
+
+	checkpoint = CaptureCheckpoint(tmp_path / 'capture_checkpoint.db')
+	checkpoint.save(7, TableHistory('customer'), 100, 1800, 1000, members)
+	checkpoint.close()
+
+	# simulate a crash by copying the package file before it's closed (no central directory)
+	package.zip_file.fp.flush()
+	shutil.copyfile(tmp_path / 'failed.zip', tmp_path / 'partial.zip')
+	package.close()
+
+	# next run recovers checkpointed members from the partial package into its own package
+	checkpoint = CaptureCheckpoint(tmp_path / 'capture_checkpoint.db')
+	table_checkpoint = checkpoint.load(7)['customer']
+	checkpoint.close()
+	package = CapturePackage(tmp_path / 'resumed.zip', str(tmp_path))
+	package.recover_members(tmp_path / 'partial.zip', table_checkpoint['members'])
+	package.close()
+
+	with zipfile.ZipFile(tmp_path / 'resumed.zip') as zip_file:
+		assert zip_file.read('customer#0001.json') == b'[\n[1,"name 1"]\n]\n' * 100
+		assert zip_file.read('customer#0001.lob') == b'large object'
+
+
+def test_corrupt_partial_member(tmp_path):
+	package = CapturePackage(tmp_path / 'failed.zip', str(tmp_path))
+	with package.open_member('customer#0001.json', 'wb') as output_stream:
+		output_stream.write(b'batch data' * 100)
+	member = package.member_record('customer#0001.json')
+	package.close()
+
+	# members that don't match their checkpoint are not recovered
+	with pytest.raises(ValueError):
+		list(read_partial_member(tmp_path / 'failed.zip', dict(member, crc=member['crc'] ^ 1)))
+	with pytest.raises(ValueError):
+		list(read_partial_member(tmp_path / 'failed.zip', dict(member, header_offset=member['header_offset'] + 1)))
+
+
+def test_recover_members_all_or_none(tmp_path):
+	package = CapturePackage(tmp_path / 'failed.zip', str(tmp_path))
+	for member_name in ('customer#0001.json', 'customer#0002.json'):
+		with package.open_member(member_name, 'wb') as output_stream:
+			output_stream.write(b'batch data' * 100)
+	members = [package.member_record(member_name) for member_name in ('customer#0001.json', 'customer#0002.json')]
+	package.close()
+
+	# a corrupt member leaves package without any of table's members
+	members[1] = dict(members[1], crc=members[1]['crc'] ^ 1)
+	package = CapturePackage(tmp_path / 'resumed.zip', str(tmp_path))
+	with pytest.raises(ValueError):
+		package.recover_members(tmp_path / 'failed.zip', members)
+	package.close()
+	with zipfile.ZipFile(tmp_path / 'resumed.zip') as zip_file:
+		assert zip_file.namelist() == []
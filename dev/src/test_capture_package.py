@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_capture_package.py
+"""
+
+
+# standard libs
+import os
+import threading
+import zipfile
+
+
+# udp classes
+from capture_package import CapturePackage
+from capture_package import PackageUploader
+
+
+def read_members(file_name):
+	with zipfile.ZipFile(file_name) as zip_file:
+		return {member_name: zip_file.read(member_name) for member_name in zip_file.namelist()}
+
+
+def run_with_timeout(target, timeout=10):
+	"""Run target on a thread; fail vs hang if it deadlocks."""
+	exceptions = list()
+
+	def run():
+		try:
+			target()
+		except Exception as e:
+			exceptions.append(e)
+
+	thread = threading.Thread(target=run, daemon=True)
+	thread.start()
+	thread.join(timeout)
+	assert not thread.is_alive(), 'package deadlocked'
+	if exceptions:
+		raise exceptions[0]
+
+
+def test_stream_and_spool(tmp_path):
+	package = CapturePackage(tmp_path / 'capture.zip', str(tmp_path))
+
+	# first member streams into package, members opened while it's open are spooled
+	streamed = package.open_member('streamed.json', 'wb')
+	spooled = package.open_member('spooled.json', 'wb')
+	assert not streamed.is_spooled
+	assert spooled.is_spooled
+
+	streamed.write(b'streamed data')
+	spooled.write(b'spooled data')
+
+	def close_members():
+		# a spooled member closed while package is busy is handed off to streaming member
+		spooled.close()
+		streamed.close()
+
+		# members opened once package is free stream again
+		with package.open_member('text.json') as output_stream:
+			output_stream.write('text data')
+		package.close()
+
+	run_with_timeout(close_members)
+	assert read_members(tmp_path / 'capture.zip') == {
+		'streamed.json': b'streamed data', 'spooled.json': b'spooled data', 'text.json': b'text data'
+	}
+
+
+def test_write_file_while_streaming(tmp_path):
+	package = CapturePackage(tmp_path / 'capture.zip', str(tmp_path))
+	file_name = tmp_path / 'customer.schema'
+	file_name.write_bytes(b'schema data')
+
+	def write_members():
+		with package.open_member('customer#0001.json', 'wb') as output_stream:
+			output_stream.write(b'batch data')
+
+			# file is spooled since package is busy, so it can be deleted once added
+			package.write(file_name)
+			file_name.unlink()
+			output_stream.write(b' more batch data')
+
+		assert package.member_info('customer.schema').file_size == len(b'schema data')
+		package.close()
+
+	run_with_timeout(write_members)
+	assert read_members(tmp_path / 'capture.zip') == {
+		'customer#0001.json': b'batch data more batch data', 'customer.schema': b'schema data'
+	}
+
+
+def test_concurrent_members(tmp_path):
+	package = CapturePackage(tmp_path / 'capture.zip', str(tmp_path), spool_size=1024)
+
+	def write_member(member_number):
+		with package.open_member(f'table{member_number}#0001.json', 'wb') as output_stream:
+			for _ in range(100):
+				output_stream.write(f'{member_number},'.encode() * 10)
+
+	def write_members():
+		threads = [threading.Thread(target=write_member, args=(member_number,)) for member_number in range(8)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		package.close()
+
+	run_with_timeout(write_members)
+	members = read_members(tmp_path / 'capture.zip')
+	assert len(members) == 8
+	for member_number in range(8):
+		assert members[f'table{member_number}#0001.json'] == f'{member_number},'.encode() * 1000
+
+
+def test_member_records(tmp_path):
+	package = CapturePackage(tmp_path / 'capture.zip', str(tmp_path))
+	with package.open_member('customer#0001.json', 'wb') as output_stream:
+		output_stream.write(b'batch data')
+	member_records = package.member_records()
+	package.close()
+
+	assert [member['member_name'] for member in member_records] == ['customer#0001.json']
+	assert member_records[0]['file_size'] == len(b'batch data')
+	assert member_records[0]['compress_type'] == zipfile.ZIP_DEFLATED
+
+
+class Objectstore:
+
+	"""Multipart upload objectstore double that keeps uploaded parts in memory."""
+
+	def __init__(self):
+		self.parts = dict()
+		self.is_complete = False
+		self.is_aborted = False
+
+	def create_multipart_upload(self, object_key):
+		return 'upload_id'
+
+	def upload_part(self, object_key, upload_id, part_number, data):
+		self.parts[part_number] = data
+		return f'etag{part_number}'
+
+	def complete_multipart_upload(self, object_key, upload_id, parts):
+		self.is_complete = [part['PartNumber'] for part in parts] == sorted(self.parts)
+		return self.is_complete
+
+	def abort_multipart_upload(self, object_key, upload_id):
+		self.is_aborted = True
+
+
+def test_pipelined_upload(tmp_path):
+	objectstore = Objectstore()
+	uploader = PackageUploader(objectstore, 'capture.zip', part_size=1024, queue_size=2)
+	package = CapturePackage(tmp_path / 'capture.zip', str(tmp_path), uploader=uploader)
+
+	def write_package():
+		for member_number in range(4):
+			with package.open_member(f'table{member_number}#0001.json', 'wb') as output_stream:
+				# incompressible data so package spans several parts
+				output_stream.write(os.urandom(4096))
+		package.close()
+		uploader.finish()
+
+	run_with_timeout(write_package)
+
+	# uploaded parts are the package file's bytes
+	assert objectstore.is_complete
+	assert len(objectstore.parts) > 1
+	uploaded = b''.join(objectstore.parts[part_number] for part_number in sorted(objectstore.parts))
+	assert uploaded == (tmp_path / 'capture.zip').read_bytes()
+	assert len(read_members(tmp_path / 'capture.zip')) == 4
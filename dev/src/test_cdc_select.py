@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_cdc_select.py
+"""
+
+
+# standard libs
+import datetime
+
+
+# udp classes
+from cdc_select import SelectCDC
+from cdc_select import Table
+from cdc_select import is_partition_type
+from cdc_select import parse_rowversion
+from cdc_select import partition_boundaries
+from cdc_select import partition_conditions
+
+
+def test_partition_boundaries():
+	assert partition_boundaries(0, 100, 4) == [25, 50, 75]
+	assert partition_boundaries(datetime.date(2018, 9, 1), datetime.date(2018, 9, 3), 4) == [
+		datetime.datetime(2018, 9, 1, 12), datetime.datetime(2018, 9, 2), datetime.datetime(2018, 9, 2, 12)
+	]
+
+
+def test_partition_boundaries_negative_range():
+	assert partition_boundaries(-100, -1, 4) == [-76, -51, -26]
+	assert partition_boundaries(-50, 50, 2) == [0]
+
+
+def test_partition_boundaries_not_split():
+	# empty windows (nulls), single values, a single partition, and types that can't be split
+	assert partition_boundaries(None, None, 4) == []
+	assert partition_boundaries(1, None, 4) == []
+	assert partition_boundaries(42, 42, 4) == []
+	assert partition_boundaries(0, 100, 1) == []
+	assert partition_boundaries('a', 'z', 4) == []
+	assert partition_boundaries(False, True, 4) == []
+
+
+def test_partition_boundaries_count_over_range():
+	# more partitions than values; duplicate boundaries are dropped
+	assert partition_boundaries(1, 3, 10) == [2]
+	assert partition_boundaries(0, 3, 10) == [1, 2]
+
+
+def test_partition_conditions():
+	assert partition_conditions('id', []) == ['']
+	assert partition_conditions('id', [25, 50]) == [
+		's.id < 25 or s.id is null',
+		's.id >= 25 and s.id < 50',
+		's.id >= 50',
+	]
+	assert partition_conditions('updated', [datetime.datetime(2018, 9, 27, 12)]) == [
+		's.updated < \'2018-09-27 12:00:00\' or s.updated is null',
+		's.updated >= \'2018-09-27 12:00:00\'',
+	]
+
+
+def test_is_partition_type():
+	assert is_partition_type('bigint')
+	assert is_partition_type('DateTime2')
+	assert not is_partition_type('uniqueidentifier')
+	assert not is_partition_type('nvarchar')
+	assert not is_partition_type(None)
+
+
+def test_parse_rowversion():
+	assert parse_rowversion(2001) == 2001
+	assert parse_rowversion('2001') == 2001
+	assert parse_rowversion('0x00000000000007D1') == 2001
+	assert parse_rowversion(' 0X7d1 ') == 2001
+	assert parse_rowversion(b'\x00\x00\x00\x00\x00\x00\x07\xd1') == 2001
+	assert parse_rowversion('') == 0
+	assert parse_rowversion(None) == 0
+
+
+def rowversion_table():
+	table = Table('dbo', 'customer', 'id, name')
+	table.cdc = 'rowversion'
+	table.rowversion = 'rv'
+	table.join = ''
+	return table
+
+
+def test_rowversion_select():
+	select_cdc = SelectCDC(rowversion_table())
+	sql = select_cdc.select(7, datetime.datetime(2018, 9, 27, 12), datetime.datetime(2018, 9, 27), 3000, 2001)
+
+	# rowversion range replaces timestamp conditions; literals are cast via bigint so they compare as rowversions
+	assert 's.rv >= cast(cast(2001 as bigint) as binary(8)) and' in sql
+	assert 's.rv < cast(cast(3000 as bigint) as binary(8))' in sql
+	assert "'2018-09-27 12:00:00' as \"udp_timestamp\"" in sql
+
+
+def test_rowversion_partition_select():
+	select_cdc = SelectCDC(rowversion_table())
+	sql = select_cdc.select(7, datetime.datetime(2018, 9, 27, 12), None, 3000, 2001, partition_condition='s.id < 100')
+	assert 'cast(cast(2001 as bigint) as binary(8))' in sql
+	assert '(s.id < 100)' in sql
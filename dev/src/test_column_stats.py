@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_column_stats.py
+"""
+
+
+# standard libs
+import datetime
+import json
+
+
+# udp classes
+from column_stats import ColumnStats
+from column_stats import DistinctSketch
+from column_stats import mix_hash
+
+
+def sketch(values, k=256):
+	distinct_sketch = DistinctSketch(k)
+	for value in values:
+		distinct_sketch.add(mix_hash(value))
+	return distinct_sketch
+
+
+def test_distinct_count_exact_below_k():
+	# fewer than k distinct values are counted exactly; repeated values count once
+	assert sketch([]).distinct_count == 0
+	assert sketch(list(range(100)) * 3).distinct_count == 100
+
+
+def test_distinct_count_estimate():
+	# KMV standard error is ~1/sqrt(k); 256 values keeps estimates well within 20%
+	for distinct_count in (1_000, 10_000, 100_000):
+		estimate = sketch(range(distinct_count)).distinct_count
+		assert abs(estimate - distinct_count) / distinct_count < 0.2
+	estimate = sketch(f'customer {value}' for value in range(50_000)).distinct_count
+	assert abs(estimate - 50_000) / 50_000 < 0.2
+
+
+def test_distinct_count_merge():
+	# merged partition sketches estimate the union's distinct values, not the sum of partitions'
+	union = sketch(range(20_000))
+	merged = sketch(range(0, 12_000))
+	merged.merge(sketch(range(8_000, 20_000)))
+	assert merged.distinct_count == union.distinct_count
+
+
+rows = [
+	(row_number, f'name {row_number % 10}', None if row_number % 2 else datetime.date(2018, 9, row_number % 28 + 1))
+	for row_number in range(1, 101)
+]
+
+
+def test_column_stats(tmp_path):
+	column_stats = ColumnStats(['id', 'name', 'created'], is_distinct=True)
+	assert list(column_stats.observe(row + (7,) for row in rows)) == [row + (7,) for row in rows]
+	column_stats.save(tmp_path / 'customer.stats')
+	with open(tmp_path / 'customer.stats') as input_stream:
+		table_stats = json.load(input_stream)
+
+	assert table_stats['row_count'] == 100
+	assert table_stats['columns']['id'] == dict(
+		null_count=0, min_value=1, max_value=100, max_length=None, distinct_count=100
+	)
+	assert table_stats['columns']['name']['max_length'] == 6
+	assert table_stats['columns']['name']['distinct_count'] == 10
+	assert table_stats['columns']['created']['null_count'] == 50
+	assert table_stats['columns']['created']['min_value'] == '2018-09-01'
+
+
+def test_column_stats_without_distinct_counts():
+	# values aren't hashed unless distinct counts are requested; other statistics are unchanged
+	column_stats = ColumnStats(['id', 'name', 'created'])
+	partition_stats = ColumnStats(['id', 'name', 'created'])
+	list(column_stats.observe(rows[:50]))
+	list(partition_stats.observe(rows[50:]))
+	column_stats.merge(partition_stats)
+
+	assert all(column_stat.sketch is None for column_stat in column_stats.column_stats)
+	id_stat, name_stat, _ = (column_stat.row() for column_stat in column_stats.column_stats)
+	assert id_stat == dict(null_count=0, min_value=1, max_value=100, max_length=None, distinct_count=None)
+	assert name_stat['max_length'] == 6
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_columnar.py
+"""
+
+
+# standard libs
+import datetime
+import decimal
+
+
+# common lib
+from common import hash_files
+
+
+# udp classes
+from columnar import ColumnarBatchWriter
+from columnar import load_columnar
+from columnar import table_columns
+import tableschema
+
+
+def column(column_name, data_type, numeric_precision=None, numeric_scale=None):
+	table_column = tableschema.Column()
+	table_column.column_name = column_name
+	table_column.data_type = data_type
+	table_column.numeric_precision = numeric_precision
+	table_column.numeric_scale = numeric_scale
+	return table_column
+
+
+table_schema = tableschema.TableSchema('customer', [
+	column('id', 'bigint'),
+	column('rate', 'float'),
+	column('balance', 'numeric', 12, 2),
+	column('amount', 'numeric'),
+	column('created', 'timestamp without time zone'),
+	column('birth_date', 'date'),
+	column('call_time', 'time'),
+	column('name', 'character varying'),
+	column('photo', 'bytea'),
+])
+
+rows = [
+	[
+		row_number, row_number / 4, decimal.Decimal(f'{row_number}.25'), decimal.Decimal('3.14159265358979323846'),
+		datetime.datetime(2018, 9, 27, 12, 30, row_number % 60, 250), datetime.date(1990, 1, row_number % 28 + 1),
+		datetime.time(9, row_number % 60, 15, 500), f'name {row_number} é', bytes([row_number % 256]) * 3
+	]
+	for row_number in range(1, 26)
+]
+
+# every column has nulls, including fixed width kinds stored as 0
+rows[1] = [None] * len(rows[1])
+
+
+def test_table_columns():
+	columns = table_columns(table_schema, [('udp_job', 'int')])
+	assert [(column['kind'], column['scale']) for column in columns] == [
+		('int', 0), ('float', 0), ('decimal', 2), ('string', 0), ('datetime', 0), ('date', 0), ('time', 0),
+		('string', 0), ('binary', 0), ('int', 0)
+	]
+
+
+def test_round_trip(tmp_path):
+	columns = table_columns(table_schema)
+	with ColumnarBatchWriter(str(tmp_path), 'customer', 10, columns, hash_method_name='sha256') as batch_writer:
+		batch_writer.write_rows(rows)
+
+	assert batch_writer.batch_sizes == [10, 10, 5]
+	assert batch_writer.file_hash == hash_files(f'{tmp_path}/customer#*.col', 'sha256')
+
+	loaded_rows = list()
+	for file_name in batch_writer.file_names:
+		header, batch_rows = load_columnar(file_name)
+		assert header['table_name'] == 'customer'
+		assert header['row_count'] == len(batch_rows)
+		loaded_rows.extend(batch_rows)
+
+	# values decode to their native types; unsized numerics round trip as text
+	expected_rows = [list(row) for row in rows]
+	for row in expected_rows:
+		if row[3] is not None:
+			row[3] = str(row[3])
+	assert loaded_rows == expected_rows
+
+
+def test_datetime_values(tmp_path):
+	columns = [dict(column_name='udp_timestamp', kind='datetime', scale=0)]
+	eastern = datetime.timezone(datetime.timedelta(hours=-5))
+	values = [
+		datetime.datetime(2018, 9, 27, 12, 30, 15, 250),
+		datetime.datetime(2018, 9, 27, 12, 30, 15, 250, tzinfo=eastern),
+		datetime.datetime(2018, 9, 27, 12, 30, 15, 250, tzinfo=datetime.timezone.utc),
+		datetime.date(2018, 9, 27),
+		'2018-09-27T12:30:15+02:00',
+		None,
+	]
+	with ColumnarBatchWriter(str(tmp_path), 'customer', 10, columns) as batch_writer:
+		batch_writer.write_rows([value] for value in values)
+	header, batch_rows = load_columnar(batch_writer.file_names[0])
+
+	# naive values are unchanged, aware values are normalized to (naive) UTC, and dates are midnight
+	assert [row[0] for row in batch_rows] == [
+		datetime.datetime(2018, 9, 27, 12, 30, 15, 250),
+		datetime.datetime(2018, 9, 27, 17, 30, 15, 250),
+		datetime.datetime(2018, 9, 27, 12, 30, 15, 250),
+		datetime.datetime(2018, 9, 27),
+		datetime.datetime(2018, 9, 27, 10, 30, 15),
+		None,
+	]
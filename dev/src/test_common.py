@@ -9,6 +9,7 @@ test_common.py
 # standard libs
 import datetime
 import filecmp
+import hashlib
 import logging
 import os
 import psutil
@@ -63,6 +64,9 @@ from common import just_file_stem
 from common import just_file_ext
 from common import parent_path
 from common import save_text
+from common import hash_str
+from common import hash_file
+from common import hash_files
 
 # 3rd party libs
 import pytest
@@ -300,6 +304,22 @@ def test_delete_files():
     teardown_test_files()
 
 
+def test_hash_file():
+    setup_test_files()
+
+    # hash of a file matches hash of its content
+    readwrite_file_name = f'{test_folder_path}/readwrite.txt'
+    assert hash_file(readwrite_file_name) == hashlib.sha256(b'Hello world').hexdigest()
+    assert hash_file(readwrite_file_name, 'md5') == hashlib.md5(b'Hello world').hexdigest()
+    assert hash_str('Hello world') == hash_file(readwrite_file_name)
+
+    # hash of files is a hash of each file's hash ordered by file name
+    file_hash = hash_file(readwrite_file_name)
+    assert hash_files(f'{test_folder_path}/*.txt') == hash_str(file_hash + file_hash)
+
+    teardown_test_files()
+
+
 def test_move_file():
     setup_test_files()
 
@@ -611,7 +631,7 @@ def script_path():
 # serializer operations ...
 
 
-def _json_serializer(obj):
+def json_serializer(obj):
     pass
 
 
@@ -0,0 +1,438 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_database.py
+"""
+
+
+# standard libs
+import collections
+import datetime
+import pathlib
+import threading
+import time
+
+
+# udp classes
+from database import ConnectionPool
+from database import Database
+from database import PostgreSQL
+from database import SQLTemplate
+from database import TimedCursor
+from database import sql_templates
+from sql_log import statement_log
+
+
+# 3rd party libs
+import pytest
+
+
+class Conn:
+
+	def __init__(self):
+		self.is_closed = False
+		self.rollback_count = 0
+
+	def rollback(self):
+		self.rollback_count += 1
+
+	def commit(self):
+		pass
+
+	def close(self):
+		self.is_closed = True
+
+
+class DB:
+
+	"""Connection double with Connection's pool interface."""
+
+	def __init__(self):
+		self.conn = Conn()
+		self.connect_time = time.monotonic()
+		self.query_timeout = None
+		self.is_healthy_result = True
+
+	def set_query_timeout(self, seconds):
+		self.query_timeout = seconds
+
+	def is_healthy(self):
+		return self.is_healthy_result
+
+
+class Pool(ConnectionPool):
+
+	def connect(self):
+		return DB()
+
+
+def test_borrow_and_release():
+	pool = Pool(None)
+	db = pool.borrow()
+	db.set_query_timeout(30)
+	pool.release(db)
+
+	# released connections are reset and re-used
+	assert db.conn.rollback_count == 1
+	assert db.query_timeout == 0
+	assert pool.borrow() is db
+	assert pool.size == 1
+
+
+def test_connection_context_manager():
+	pool = Pool(None)
+	with pool.connection() as db:
+		assert isinstance(db, DB)
+		assert pool.idle == []
+
+	# connection is returned to pool when with block exits, including on exceptions
+	assert [idle_db for idle_db, _ in pool.idle] == [db]
+	with pytest.raises(ZeroDivisionError):
+		with pool.connection() as db:
+			1 / 0
+	assert [idle_db for idle_db, _ in pool.idle] == [db]
+
+
+def test_replace_unhealthy_and_expired():
+	pool = Pool(None, max_idle=300, max_lifetime=3600)
+	db = pool.borrow()
+	pool.release(db)
+	db.is_healthy_result = False
+	replacement = pool.borrow()
+	assert replacement is not db
+	assert db.conn.is_closed
+	assert pool.size == 1
+
+	pool.release(replacement)
+	replacement.connect_time -= 3601
+	assert pool.borrow() is not replacement
+	assert replacement.conn.is_closed
+
+
+def test_reuse_across_jobs(monkeypatch):
+	pool = Pool(None)
+	now = time.monotonic()
+	monkeypatch.setattr(time, 'monotonic', lambda: now)
+	with pool.connection() as first_job_db:
+		pass
+
+	# next job on a 10 min poll schedule re-uses previous job's connection
+	now += 600
+	with pool.connection() as second_job_db:
+		pass
+	assert second_job_db is first_job_db
+	assert pool.size == 1
+
+
+def test_reap_on_release(monkeypatch):
+	pool = Pool(None, max_idle=300)
+	now = time.monotonic()
+	monkeypatch.setattr(time, 'monotonic', lambda: now)
+	expired_db, db = pool.borrow(), pool.borrow()
+	pool.release(expired_db)
+
+	# idle connections past max_idle are closed when another connection is released vs waiting for a borrow
+	now += 301
+	pool.release(db)
+	assert [idle_db for idle_db, _ in pool.idle] == [db]
+	assert expired_db.conn.is_closed
+	assert not db.conn.is_closed
+	assert pool.size == 1
+
+
+def test_max_size_waits_for_release():
+	pool = Pool(None, max_size=1, timeout=10)
+	db = pool.borrow()
+	threading.Timer(0.1, pool.release, args=(db,)).start()
+
+	# borrower waits for a connection to be returned vs exceeding max_size
+	assert pool.borrow() is db
+	assert pool.size == 1
+
+
+def test_borrow_timeout():
+	pool = Pool(None, max_size=1, timeout=0.1)
+	pool.borrow()
+	with pytest.raises(TimeoutError):
+		pool.borrow()
+
+
+def test_reserve():
+	pool = Pool(None, max_size=2, timeout=0.1)
+	pool.reserve(3)
+	assert pool.max_size == 3
+	assert len([pool.borrow() for _ in range(3)]) == 3
+
+	# unlimited pools stay unlimited
+	pool = Pool(None)
+	pool.reserve(3)
+	assert pool.max_size == 0
+
+
+def test_connection_config():
+	# pool's connection section doesn't shadow its connection() context manager
+	pool = ConnectionPool('connection section')
+	assert pool.connection_config == 'connection section'
+	assert callable(pool.connection)
+
+
+class ServerCursor:
+
+	"""psycopg2 cursor double recording fetch round trips."""
+
+	def __init__(self, name=None, row_count=0):
+		self.name = name
+		self.itersize = 2000
+		self.arraysize = 1
+		self.rows = [(row_number, f'name {row_number}') for row_number in range(row_count)]
+		self.fetch_sizes = list()
+		self.is_closed = False
+
+	def execute(self, sql, *args):
+		pass
+
+	def fetchmany(self, size):
+		self.fetch_sizes.append(size)
+		rows, self.rows = self.rows[:size], self.rows[size:]
+		return rows
+
+	def close(self):
+		self.is_closed = True
+
+
+class ServerConn:
+
+	def __init__(self, row_count):
+		self.row_count = row_count
+		self.cursors = list()
+
+	def cursor(self, name=None):
+		self.cursors.append(ServerCursor(name, self.row_count))
+		return self.cursors[-1]
+
+
+class Server:
+
+	def __init__(self, row_count):
+		self.conn = ServerConn(row_count)
+
+
+def test_named_capture_cursor():
+	server = Server(row_count=2500)
+	cursor = PostgreSQL.capture_cursor(server, 'capture_customer', 1000)
+	server_cursor = server.conn.cursors[-1]
+	assert server_cursor.name == 'capture_customer'
+	assert server_cursor.itersize == 1000
+
+	# rows stream from server in itersize fetches vs loading the result set on execute
+	cursor.execute('select * from customer')
+	assert sum(1 for _ in cursor) == 2500
+	assert server_cursor.fetch_sizes == [1000, 1000, 1000, 1000]
+	cursor.close()
+	assert server_cursor.is_closed
+
+
+def test_client_capture_cursor():
+	server = Server(row_count=10)
+	cursor = PostgreSQL.capture_cursor(server)
+	assert server.conn.cursors[-1].name is None
+	cursor.execute('select * from customer')
+	assert list(cursor) == [(row_number, f'name {row_number}') for row_number in range(10)]
+
+
+class Clock:
+
+	"""perf_counter double; cursor calls advance time by a fixed amount."""
+
+	def __init__(self):
+		self.now = 100.0
+
+	def __call__(self):
+		return self.now
+
+
+class TimedServerCursor(ServerCursor):
+
+	def __init__(self, clock, row_count):
+		super().__init__(row_count=row_count)
+		self.clock = clock
+
+	def execute(self, sql, *args):
+		self.clock.now += 0.5
+
+	def fetchmany(self, size):
+		self.clock.now += 0.25
+		return super().fetchmany(size)
+
+
+def test_timed_cursor(monkeypatch):
+	clock = Clock()
+	monkeypatch.setattr(time, 'perf_counter', clock)
+	statement_log.clear()
+
+	cursor = TimedCursor(TimedServerCursor(clock, row_count=2500), 'select_customer')
+	cursor.execute('select * from customer where id > 0')
+	assert sum(1 for _ in cursor) == 2500
+
+	# execute, first row and fetch times are recorded per statement when its rows are exhausted
+	[stat] = statement_log.top()
+	assert stat.command_name == 'select_customer'
+	assert stat.count == 1
+	assert stat.execute_time == 0.5
+	assert stat.fetch_time == 0.25 * 3
+	assert stat.row_count == 2500
+
+	# bytes are estimated per fetch from its first row: (0, 'name 0') and (2000, 'name 2000')
+	assert stat.byte_count == (8 + 6) * 2000 + (8 + 9) * 500
+	statement_log.clear()
+
+
+def test_sql_template_render():
+	sql_template = SQLTemplate('does_table_exist', "select object_id(N'{schema_name}.{table_name}', N'u');")
+	assert sql_template.parameters == ('schema_name', 'table_name')
+
+	# extra parameters (eg. caller's other locals) are ignored
+	parameters = dict(schema_name='dbo', table_name='customer', self=object())
+	assert sql_template.render(parameters) == "select object_id(N'dbo.customer', N'u');"
+
+
+def test_sql_template_missing_parameters():
+	sql_template = SQLTemplate('does_table_exist', "select object_id(N'{schema_name}.{table_name}', N'u');")
+	with pytest.raises(KeyError) as e:
+		sql_template.render(dict(schema_name='dbo'))
+	assert 'does_table_exist' in str(e.value)
+	assert 'table_name' in str(e.value)
+
+
+def test_sql_template_parameters():
+	# builtins and names bound within expressions (comprehension, walrus, lambda variables) are not parameters
+	template = "select {', '.join(name for name in column_names if name != skip)} limit {len(column_names)} {(lambda x: x)(1)}"
+	sql_template = SQLTemplate('select_columns', template)
+	assert sql_template.parameters == ('column_names', 'skip')
+	assert sql_template.render(dict(column_names=['a', 'b', 'c'], skip='b')) == 'select a, c limit 3 1'
+
+
+def test_sql_template_memoization():
+	sql_template = SQLTemplate('select_value', 'select {value};')
+
+	# scalar renders are memoized by value and type
+	for value in (1, 1.0, True, 'text', None, datetime.date(2018, 9, 27)):
+		assert sql_template.render(dict(value=value)) == f'select {value};'
+	assert sql_template.render(dict(value=1)) == 'select 1;'
+	assert len(sql_template.renders) == 6
+
+	# mutable (and unhashable) values are rendered every time
+	column_names = ['a']
+	assert sql_template.render(dict(value=column_names)) == "select ['a'];"
+	column_names.append('b')
+	assert sql_template.render(dict(value=column_names)) == "select ['a', 'b'];"
+	assert len(sql_template.renders) == 6
+
+	# least recently used renders are evicted once cache is full; value 1 was used after value 1.0
+	sql_template.cache_size = 6
+	sql_template.render(dict(value=2))
+	assert len(sql_template.renders) == 6
+	assert ((int, 1),) in sql_template.renders
+	assert ((float, 1.0),) not in sql_template.renders
+
+
+def test_sql_template_concurrent_renders():
+	sql_template = SQLTemplate('select_value', 'select {value};')
+	sql_template.cache_size = 8
+	errors = list()
+
+	def render_values(offset):
+		try:
+			for value in range(2000):
+				assert sql_template.render(dict(value=(value + offset) % 20)) == f'select {(value + offset) % 20};'
+		except Exception as e:
+			errors.append(e)
+
+	# threads share a template's cache while it's evicting
+	threads = [threading.Thread(target=render_values, args=(offset,)) for offset in range(8)]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+	assert errors == []
+	assert len(sql_template.renders) <= 8
+
+
+def test_sql_templates(monkeypatch):
+	# <platform>.cfg files are loaded from conf folder of current directory
+	monkeypatch.chdir(pathlib.Path(__file__).parent.parent)
+	templates = sql_templates('mssql')
+	assert sql_templates('mssql') is templates
+	assert templates('does_table_exist') is templates('does_table_exist')
+	with pytest.raises(KeyError):
+		templates('undefined_command')
+
+
+class CatalogCursor:
+
+	"""Catalog query cursor double returning named tuple rows with a DB API description."""
+
+	def __init__(self, column_names, rows):
+		self.description = [(column_name,) for column_name in column_names]
+		self.row_type = collections.namedtuple('Row', column_names)
+		self.rows = rows
+		self.sql = None
+
+	def execute(self, sql, *args):
+		self.sql = sql
+
+	def fetchall(self):
+		return [self.row_type(*row) for row in self.rows]
+
+
+class CatalogConn:
+
+	def __init__(self, column_names, rows):
+		self.catalog_cursor = CatalogCursor(column_names, rows)
+
+	def cursor(self):
+		return self.catalog_cursor
+
+
+def catalog_database(column_names, rows):
+	return Database('postgresql', CatalogConn(column_names, rows))
+
+
+def test_select_schema_table_schemas(monkeypatch):
+	monkeypatch.chdir(pathlib.Path(__file__).parent.parent)
+	catalog_columns = [
+		'table_name', 'column_name', 'data_type', 'is_nullable', 'character_maximum_length', 'numeric_precision',
+		'numeric_scale', 'datetime_precision', 'character_set_name', 'collation_name'
+	]
+	db = catalog_database(catalog_columns, [
+		('Customer', 'id', 'int', 'NO', None, 32, 0, None, None, None),
+		('Customer', 'name', 'varchar', 'YES', 50, None, None, None, 'UTF8', None),
+		('orders', 'order_id', 'bigint', 'NO', None, 64, 0, None, None, None),
+	])
+
+	# one catalog query for all of a schema's tables, grouped by table and keyed by lowercase table name
+	table_schemas = db.select_schema_table_schemas('sales')
+	assert "'sales'" in db.cursor.sql
+	assert sorted(table_schemas) == ['customer', 'orders']
+
+	# columns are in catalog order with select_table_schema()'s attributes
+	customer = table_schemas['customer']
+	assert customer.table_name == 'Customer'
+	assert list(customer.columns) == ['id', 'name']
+	assert customer.columns['name'].data_type == 'varchar'
+	assert customer.columns['name'].character_maximum_length == 50
+	assert customer.columns['id'].numeric_precision == 32
+	assert list(table_schemas['orders'].columns) == ['order_id']
+
+
+def test_select_schema_table_pks(monkeypatch):
+	monkeypatch.chdir(pathlib.Path(__file__).parent.parent)
+	db = catalog_database(['table_name', 'column_name'], [
+		('Customer', 'id'),
+		('order_line', 'order_id'),
+		('order_line', 'line_number'),
+	])
+
+	# pk columns sorted and comma delimited as select_table_pk() returns them
+	assert db.select_schema_table_pks('sales') == dict(customer='id', order_line='line_number, order_id')
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_row_delta.py
+"""
+
+
+# udp classes
+from row_delta import RowDelta
+
+
+def capture_rows(rows, job_id):
+	"""Return rows with capture's udp_jobid and udp_timestamp columns appended."""
+	return [row + (job_id, f'2018-09-27T12:00:{job_id:02}') for row in rows]
+
+
+def test_first_run_is_full_snapshot(tmp_path):
+	row_delta = RowDelta(tmp_path / 'customer.rowhash')
+	rows = capture_rows([(1, 'a'), (2, 'b')], 1)
+	inserted_rows = list(row_delta.filter(rows))
+
+	# all rows are inserted with their fingerprint appended as udp_rowhash
+	assert row_delta.is_full
+	assert [row[:-1] for row in inserted_rows] == rows
+	assert row_delta.deleted_hashes() == []
+	assert row_delta.row_count == row_delta.inserted_count == 2
+
+
+def test_inserted_and_deleted_rows(tmp_path):
+	index_file_name = tmp_path / 'customer.rowhash'
+	row_delta = RowDelta(index_file_name)
+	first_rows = list(row_delta.filter(capture_rows([(1, 'a'), (2, 'b'), (3, 'c'), (3, 'c')], 1)))
+	row_delta.save(index_file_name)
+
+	# next run: row 2 updated, one of two identical rows deleted, row 4 inserted; job columns don't change fingerprints
+	row_delta = RowDelta(index_file_name)
+	inserted_rows = list(row_delta.filter(capture_rows([(1, 'a'), (2, 'B'), (3, 'c'), (4, 'd')], 2)))
+	assert not row_delta.is_full
+	assert [row[:2] for row in inserted_rows] == [(2, 'B'), (4, 'd')]
+	assert sorted(row_delta.deleted_hashes()) == sorted([first_rows[1][-1], first_rows[3][-1]])
+	assert row_delta.row_count == 4
+	assert row_delta.inserted_count == 2
+
+
+def test_unchanged_rows(tmp_path):
+	index_file_name = tmp_path / 'customer.rowhash'
+	rows = [(row_number, f'name {row_number}') for row_number in range(100)]
+	row_delta = RowDelta(index_file_name)
+	list(row_delta.filter(capture_rows(rows, 1)))
+	row_delta.save(index_file_name)
+
+	# unchanged snapshot in a different order sends no rows
+	row_delta = RowDelta(index_file_name)
+	assert list(row_delta.filter(capture_rows(list(reversed(rows)), 2))) == []
+	assert row_delta.deleted_hashes() == []
+	assert index_file_name.stat().st_size == 8 * len(rows)
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_sql_log.py
+"""
+
+
+# standard libs
+import json
+
+
+# udp classes
+from sql_log import StatementLog
+from sql_log import StatementRecord
+from sql_log import fingerprint
+
+
+def test_fingerprint():
+	# statements differing only by literals, case, and whitespace share a fingerprint
+	sql = "select * from customer where id = 42 and name = 'O''Brien' and rv >= 0x00000000000007D1 and rate > 1.5"
+	same_sql = "SELECT *\n  FROM customer WHERE id = 7 and name = 'x' and rv >= 0xFF and rate > 2 "
+	assert fingerprint(sql) == fingerprint(same_sql)
+	assert len(fingerprint(sql)) == 16
+
+	# identifiers containing digits aren't literals
+	assert fingerprint('select * from customer') != fingerprint('select * from orders')
+	assert fingerprint('select col1 from t') != fingerprint('select col2 from t')
+
+
+def test_statement_log(tmp_path):
+	statement_log = StatementLog()
+	for sql in ('select 1', 'select 2', 'delete from customer'):
+		record = StatementRecord('', sql)
+		record.execute_time = 0.5
+		record.row_count = 1
+		statement_log.record(record)
+
+	# statements are aggregated by command name (leading keyword when unnamed) and fingerprint
+	top = statement_log.top()
+	assert [(stat.command_name, stat.count, stat.execute_time) for stat in top] == [('select', 2, 1.0), ('delete', 1, 0.5)]
+	statement_log.clear()
+	assert statement_log.top() == []
+
+
+def test_statement_log_rotation(tmp_path):
+	statement_log = StatementLog()
+	file_name = tmp_path / 'capture_sql.log'
+	statement_log.setup(str(file_name), max_bytes=1000, backup_count=2)
+	for row_number in range(100):
+		statement_log.record(StatementRecord('select_customer', f'select * from customer where id = {row_number}'))
+
+	# log rotates at max_bytes keeping backup_count older files of json lines
+	assert sorted(path.name for path in tmp_path.iterdir()) == ['capture_sql.log', 'capture_sql.log.1', 'capture_sql.log.2']
+	for path in tmp_path.iterdir():
+		assert path.stat().st_size <= 1000
+		rows = [json.loads(line) for line in path.read_text().splitlines()]
+		assert rows and all(row['command_name'] == 'select_customer' for row in rows)
+
+	# re-setup replaces previous handler; statement records logger is process wide so remove it when done
+	statement_log.setup(str(tmp_path / 'other_sql.log'))
+	assert len(statement_log.record_logger.handlers) == 1
+	for handler in list(statement_log.record_logger.handlers):
+		statement_log.record_logger.removeHandler(handler)
+		handler.close()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+test_stage_2.py
+"""
+
+
+# standard libs
+import decimal
+
+
+# udp classes
+from batch_writer import CopyBatchWriter
+from bulk_load import copy_value
+from stage_2 import copy_decoders
+from stage_2 import copy_unescape
+from stage_2 import max_nvarchar_length
+from stage_2 import nvarchar_length
+from stage_2 import read_copy_rows
+import tableschema
+
+
+def column(column_name, data_type, character_maximum_length=None):
+	table_column = tableschema.Column()
+	table_column.column_name = column_name
+	table_column.data_type = data_type
+	table_column.character_maximum_length = character_maximum_length
+	return table_column
+
+
+def column_stats(max_length):
+	return dict(name=dict(null_count=0, max_length=max_length))
+
+
+def test_nvarchar_length_declared():
+	# declared lengths that fit an nvarchar are kept; stats only size undeclared (or max) columns
+	assert nvarchar_length(column('name', 'varchar', 50), column_stats(10), 255) == 50
+	assert nvarchar_length(column('name', 'varchar', max_nvarchar_length), column_stats(10), 255) == max_nvarchar_length
+	assert nvarchar_length(column('name', 'varchar', -1), column_stats(10), 255) == 32
+	assert nvarchar_length(column('name', 'varchar', max_nvarchar_length + 1), column_stats(10), 255) == 32
+
+
+def test_nvarchar_length_from_stats():
+	# twice longest value rounded up to a power of 2, with a minimum of 32
+	name = column('name', 'character varying')
+	assert nvarchar_length(name, column_stats(0), 255) == 32
+	assert nvarchar_length(name, column_stats(16), 255) == 32
+	assert nvarchar_length(name, column_stats(17), 255) == 64
+	assert nvarchar_length(name, column_stats(1000), 255) == 2048
+
+
+def test_nvarchar_length_max_boundary():
+	# lengths are capped at max_nvarchar_length while the longest value fits; longer values require max (-1)
+	name = column('name', 'character varying')
+	assert nvarchar_length(name, column_stats(1025), 255) == max_nvarchar_length
+	assert nvarchar_length(name, column_stats(max_nvarchar_length), 255) == max_nvarchar_length
+	assert nvarchar_length(name, column_stats(max_nvarchar_length + 1), 255) == -1
+
+
+def test_nvarchar_length_without_stats():
+	# persistent tables (no stats), columns without stats, and all-null columns keep default length
+	name = column('name', 'character varying')
+	assert nvarchar_length(name, None, 255) == 255
+	assert nvarchar_length(name, dict(), 255) == 255
+	assert nvarchar_length(name, column_stats(None), 255) == 255
+
+
+def test_copy_unescape():
+	assert copy_unescape('a\\tb\\nc\\rd\\\\e') == 'a\tb\nc\rd\\e'
+	# escaped backslash followed by n is a backslash and an n, not a newline
+	assert copy_unescape('\\\\n') == '\\n'
+	assert copy_unescape('\\\\N') == '\\N'
+
+
+copy_table_schema = tableschema.TableSchema('customer', [
+	column('id', 'int'),
+	column('name', 'nvarchar'),
+	column('is_active', 'tinyint'),
+	column('balance', 'decimal'),
+	column('photo', 'varbinary'),
+])
+
+# values copy must escape: delimiter, row terminator, escape character, and text that looks like a null
+copy_rows = [
+	[1, 'tab\there', True, decimal.Decimal('1.25'), b'\x00\xff'],
+	[2, 'line 1\nline 2\r\n', False, None, None],
+	[3, 'back\\slash \\N \\n', None, decimal.Decimal('-3'), b''],
+	[4, '\\N', True, decimal.Decimal('0'), b'\n'],
+	[5, None, None, None, None],
+	[6, '', False, None, None],
+]
+
+
+def test_copy_decoders():
+	assert [column_index for column_index, _ in copy_decoders(copy_table_schema)] == [0, 2, 3, 4]
+
+
+def test_copy_round_trip(tmp_path):
+	# copy data written via copy batch writer (as psycopg2 delivers it) reads back as original values
+	with CopyBatchWriter(str(tmp_path), 'customer', 100) as batch_writer:
+		for row in copy_rows:
+			batch_writer.write_data('\t'.join(copy_value(value) for value in row) + '\n')
+
+	# embedded newlines are escaped so each newline ends a row; batch writers count rows by newlines
+	batch_data = (tmp_path / 'customer#0001.tsv').read_bytes()
+	assert batch_data.count(b'\n') == len(copy_rows)
+	assert b'line 1\\nline 2\\r\\n' in batch_data
+	assert batch_writer.row_count == len(copy_rows)
+
+	# postgresql booleans stage as tinyint
+	expected_rows = [[row[0], row[1], None if row[2] is None else int(row[2]), row[3], row[4]] for row in copy_rows]
+	assert list(read_copy_rows(tmp_path / 'customer#0001.tsv', copy_table_schema)) == expected_rows
@@ -63,6 +63,7 @@ def setup(config):
 	db_conn.create_named_table(udp_catalog_schema, 'nst_lookup')
 	db_conn.create_named_table(udp_catalog_schema, 'job_log')
 	db_conn.create_named_table(udp_catalog_schema, 'stat_log')
+	db_conn.migrate_named_table(udp_catalog_schema, 'stat_log')
 	db_conn.create_named_table(udp_catalog_schema, 'table_log')
 	db_conn.create_named_table(udp_catalog_schema, 'stage_arrival_queue')
 	db_conn.create_named_table(udp_catalog_schema, 'stage_pending_queue')